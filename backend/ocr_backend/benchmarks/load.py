@@ -0,0 +1,298 @@
+"""
+Open-loop load generator for the HTTP API.
+
+Requests arrive as a Poisson process at `rate` per second, each one
+an endpoint drawn from a weighted mix, with documents from a
+synthetic corpus. Latency is measured from the scheduled arrival
+time, so a saturated client or server shows up as latency rather
+than as a lower offered rate.
+"""
+import math
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from . import synthetic
+
+DEFAULT_MIX = {
+    "quality_score": 4,
+    "aadhaar_detect": 2,
+    "handwritten_ocr": 1,
+    "verify_documents": 1,
+    "passport_create": 1,
+    "passport_ids": 2,
+    "passport_detail": 2,
+    "passport_status": 1,
+}
+
+
+def parse_mix(text):
+    """
+    "quality_score=4,passport_ids=2" -> {"quality_score": 4, ...}
+    """
+    mix = {}
+    for part in filter(None, (p.strip() for p in text.split(","))):
+        name, _, weight = part.partition("=")
+        if name not in SCENARIOS:
+            raise ValueError(f"Unknown endpoint '{name}' (choose from {', '.join(sorted(SCENARIOS))})")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+class Corpus:
+    """
+    Synthetic documents as upload-ready bytes.
+    """
+
+    def __init__(self, size=8, with_pdf=True):
+        self.documents = []
+        for seed in range(size):
+            image, _, _ = synthetic.render_form(rows=10, columns=1 + seed % 2, seed=seed)
+            self.documents.append(("form.png", synthetic.to_png(image), "image/png"))
+            if with_pdf:
+                self.documents.append(("form.pdf", synthetic.to_pdf(image), "application/pdf"))
+
+    def pick(self, rng, images_only=False):
+        choices = [d for d in self.documents if d[0].endswith(".png")] if images_only else self.documents
+        return rng.choice(choices)
+
+
+# -------------------------------------------------------
+#               SCENARIOS
+# -------------------------------------------------------
+
+PERSON = {
+    "first_name": "ELHAN",
+    "middle_name": "BENNY",
+    "last_name": "THOMAS",
+    "gender": "M",
+    "dob": "2005-04-05",
+    "phone": "9876543210",
+    "email": "elhan.thomas@example.com",
+    "present_address_line": "12 MG Road Indiranagar",
+    "present_city": "Bengaluru",
+    "present_state": "Karnataka",
+    "present_pincode": "560038",
+    "present_country": "India",
+    "permanent_address_same_as_present": "true",
+}
+
+# /verify-documents/ takes the form as the user typed it
+USER_DETAILS = {
+    "first_name": "ELHAN",
+    "middle_name": "BENNY",
+    "last_name": "THOMAS",
+    "gender": "Male",
+    "dob": "05/04/2005",
+    "permanent_address_line": "12 MG Road Indiranagar",
+    "permanent_city": "Bengaluru",
+    "permanent_state": "Karnataka",
+    "permanent_pincode": "560038",
+    "permanent_country": "India",
+}
+
+
+def _proofs(ctx):
+    # verify/create are run on images only: PDF proofs need poppler
+    return {
+        field: ctx.corpus.pick(ctx.rng, images_only=True)
+        for field in ("dob_proof", "name_gender_proof", "address_proof")
+    }
+
+
+def quality_score(ctx):
+    return ctx.post("/api/quality-score/", files={"file": ctx.corpus.pick(ctx.rng)})
+
+
+def aadhaar_detect(ctx):
+    return ctx.post("/api/aadhaar-detect/", files={"file": ctx.corpus.pick(ctx.rng)})
+
+
+def handwritten_ocr(ctx):
+    return ctx.post("/api/handwritten/ocr/", files={"file": ctx.corpus.pick(ctx.rng, images_only=True)})
+
+
+def verify_documents(ctx):
+    return ctx.post("/api/verify-documents/", data=USER_DETAILS, files=_proofs(ctx))
+
+
+def passport_create(ctx):
+    response = ctx.post("/api/passport/create/", data=PERSON, files=_proofs(ctx))
+    if response.status_code == 201:
+        ctx.remember(response.json().get("id"))
+    return response
+
+
+def passport_ids(ctx):
+    response = ctx.get("/api/passport/ids/")
+    if response.ok:
+        ctx.remember(*response.json().get("ids", [])[-100:])
+    return response
+
+
+def passport_detail(ctx):
+    return ctx.get(f"/api/passport/{ctx.some_id()}/")
+
+
+def passport_status(ctx):
+    status = ctx.rng.choice(["PENDING", "VERIFIED"])
+    return ctx.patch(f"/api/passport/{ctx.some_id()}/toggle-status/", json={"status": status})
+
+
+SCENARIOS = {
+    "quality_score": quality_score,
+    "aadhaar_detect": aadhaar_detect,
+    "handwritten_ocr": handwritten_ocr,
+    "verify_documents": verify_documents,
+    "passport_create": passport_create,
+    "passport_ids": passport_ids,
+    "passport_detail": passport_detail,
+    "passport_status": passport_status,
+}
+
+
+class _Context:
+    """
+    What a scenario sees: the corpus, an RNG, HTTP helpers and the
+    passport ids seen so far (shared between requests).
+    """
+
+    def __init__(self, run, rng):
+        self.corpus = run.corpus
+        self.rng = rng
+        self._run = run
+
+    def _request(self, method, path, **kwargs):
+        return self._run.session.request(method, self._run.base_url + path, timeout=self._run.timeout, **kwargs)
+
+    def get(self, path, **kwargs):
+        return self._request("GET", path, **kwargs)
+
+    def post(self, path, **kwargs):
+        return self._request("POST", path, **kwargs)
+
+    def patch(self, path, **kwargs):
+        return self._request("PATCH", path, **kwargs)
+
+    def remember(self, *ids):
+        with self._run.lock:
+            self._run.known_ids.update(i for i in ids if i is not None)
+
+    def some_id(self):
+        with self._run.lock:
+            # an id that does not exist still exercises the 404 path
+            return self.rng.choice(sorted(self._run.known_ids)) if self._run.known_ids else 0
+
+
+# -------------------------------------------------------
+#               RUN
+# -------------------------------------------------------
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return None
+    # nearest rank
+    rank = math.ceil(q / 100 * len(sorted_values))
+    return sorted_values[min(len(sorted_values), max(rank, 1)) - 1]
+
+
+class LoadRun:
+    def __init__(self, base_url, mix, rate, duration, concurrency=32, corpus=None, timeout=120, seed=0):
+        self.base_url = base_url.rstrip("/")
+        self.mix = mix
+        self.rate = rate
+        self.duration = duration
+        self.concurrency = concurrency
+        self.corpus = corpus or Corpus()
+        self.timeout = timeout
+        self.seed = seed
+
+        self.lock = threading.Lock()
+        self.known_ids = set()
+        self.samples = []  # (endpoint, latency s, status or None, error)
+
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=concurrency)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def _one(self, name, scheduled, rng):
+        status, error = None, None
+        try:
+            status = SCENARIOS[name](_Context(self, rng)).status_code
+        except Exception as e:
+            # connection errors, timeouts, unparseable responses
+            error = type(e).__name__
+        latency = time.monotonic() - scheduled
+        with self.lock:
+            self.samples.append((name, latency, status, error))
+
+    def run(self):
+        rng = random.Random(self.seed)
+        # ids for the detail/status scenarios before any create lands
+        try:
+            passport_ids(_Context(self, rng))
+        except Exception:
+            pass
+        names = list(self.mix)
+        weights = [self.mix[n] for n in names]
+
+        started = time.monotonic()
+        scheduled = started
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="load") as pool:
+            while True:
+                scheduled += rng.expovariate(self.rate)
+                if scheduled - started >= self.duration:
+                    break
+                time.sleep(max(0.0, scheduled - time.monotonic()))
+                name = rng.choices(names, weights)[0]
+                pool.submit(self._one, name, scheduled, random.Random(rng.random()))
+        elapsed = time.monotonic() - started
+        return self.report(elapsed)
+
+    def report(self, elapsed):
+        by_endpoint = {}
+        for name, latency, status, error in self.samples:
+            by_endpoint.setdefault(name, []).append((latency, status, error))
+
+        endpoints = {}
+        for name, samples in sorted(by_endpoint.items()):
+            latencies = sorted(s[0] for s in samples)
+            shed = sum(1 for _, status, _ in samples if status in (429, 503))
+            errors = sum(
+                1 for _, status, error in samples
+                if error or (status is not None and status >= 400 and status not in (429, 503))
+            )
+            statuses = {}
+            for _, status, error in samples:
+                key = str(status) if status is not None else error
+                statuses[key] = statuses.get(key, 0) + 1
+            endpoints[name] = {
+                "requests": len(samples),
+                "throughput_rps": round(len(samples) / elapsed, 3),
+                "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+                "p95_ms": round(percentile(latencies, 95) * 1000, 1),
+                "p99_ms": round(percentile(latencies, 99) * 1000, 1),
+                "error_rate": round(errors / len(samples), 4),
+                "shed_rate": round(shed / len(samples), 4),
+                "statuses": statuses,
+            }
+
+        total = len(self.samples)
+        return {
+            "config": {
+                "base_url": self.base_url,
+                "mix": self.mix,
+                "rate": self.rate,
+                "duration": self.duration,
+                "concurrency": self.concurrency,
+                "seed": self.seed,
+            },
+            "elapsed_s": round(elapsed, 3),
+            "requests": total,
+            "throughput_rps": round(total / elapsed, 3) if elapsed else 0,
+            "endpoints": endpoints,
+        }
@@ -0,0 +1,108 @@
+"""
+The benchmarked pipeline stages. Each setup function prepares its
+input once and returns the callable to time; raising Skip marks the
+stage as not runnable here (e.g. poppler or torch missing).
+"""
+import os
+
+import cv2
+
+from . import synthetic
+
+
+class Skip(Exception):
+    pass
+
+
+def _handwritten_ocr():
+    # the stages run against the deterministic stub models
+    os.environ["OCR_STUB_MODELS"] = "True"
+    try:
+        from ml import handwritten_ocr
+    except ImportError as e:
+        raise Skip(f"handwritten_ocr not importable: {e}")
+    if not handwritten_ocr.STUB_MODELS:
+        raise Skip("handwritten_ocr already loaded with real models")
+    return handwritten_ocr
+
+
+def merge_boxes_into_lines():
+    # merge_boxes_into_lines is a thin wrapper over group_lines; this
+    # stage does not need the model module
+    from ml.line_layout import group_lines
+
+    boxes = synthetic.word_boxes(rows=200, columns=2)
+    return lambda: group_lines(boxes)
+
+
+def craft_postprocess():
+    from ml.line_layout import craft_boxes, group_lines
+
+    polys = synthetic.craft_polygons(synthetic.word_boxes(rows=200, columns=2))
+    return lambda: group_lines(craft_boxes(polys))
+
+
+def extract_fields_with_coords():
+    # the regex rules, as the cheapest tier runs them
+    from ml.field_extraction import extract_fields_with_coords as extract
+
+    _, _, lines = synthetic.render_form(rows=15, columns=2)
+    # a form's worth of lines takes microseconds; time a batch of forms
+    return lambda: [extract(lines) for _ in range(200)]
+
+
+def calc_scores():
+    from ml.quality_score import calc_scores as score
+
+    image, _, _ = synthetic.render_form()
+    bgr = cv2.cvtColor(image, cv2.COLOR_RGB2BGR)
+    return lambda: score(bgr)
+
+
+def pdf_rasterization():
+    from ml.quality_score import pdf_to_image
+
+    pdf = synthetic.to_pdf(synthetic.render_form()[0])
+    try:
+        pdf_to_image(pdf)
+    except Exception as e:
+        raise Skip(f"PDF rasterization unavailable: {e}")
+    return lambda: pdf_to_image(pdf)
+
+
+def recognition_loop():
+    hw = _handwritten_ocr()
+    image, _, lines = synthetic.render_form(rows=10, columns=2)
+    boxes = [
+        (x1, y1, x2 - x1, y2 - y1)
+        for x1, x2, y1, y2 in (line["coordinates"] for line in lines)
+    ]
+    return lambda: list(hw.recognize_lines(image, boxes, "greedy"))
+
+
+def calibration():
+    """
+    Fixed work unrelated to the pipeline (sorting, regex, small matrix
+    products), timed next to every stage: how fast the machine is at
+    the moment, so a slow machine is not reported as a slow stage.
+    """
+    import random
+    import re
+
+    import numpy as np
+
+    rng = random.Random(0)
+    numbers = [rng.random() for _ in range(20000)]
+    text = " ".join(f"line {i} pin {rng.randrange(10 ** 6):06d}" for i in range(2000))
+    matrix = np.random.default_rng(0).random((64, 64))
+    return lambda: (sorted(numbers), re.findall(r"\b\d{6}\b", text), [matrix @ matrix for _ in range(20)])
+
+
+STAGES = {
+    "merge_boxes_into_lines": merge_boxes_into_lines,
+    "craft_postprocess": craft_postprocess,
+    "extract_fields_with_coords": extract_fields_with_coords,
+    "calc_scores": calc_scores,
+    "pdf_rasterization": pdf_rasterization,
+    "recognition_loop": recognition_loop,
+}
@@ -0,0 +1,110 @@
+"""
+Synthetic form pages for benchmarks and load tests: rendered
+"Label: value" rows in one or more columns, with the word boxes,
+CRAFT-style polygons and OCR lines that go with them. Deterministic
+for a given seed.
+"""
+import io
+
+import cv2
+import numpy as np
+from PIL import Image
+
+FIELDS = [
+    ("Name", "ELHAN BENNY THOMAS"),
+    ("Date of Birth", "05/04/2005"),
+    ("Gender", "Male"),
+    ("Phone", "+91 98765 43210"),
+    ("Email", "elhan.thomas@example.com"),
+    ("Address", "12 MG Road Indiranagar"),
+    ("City", "Bengaluru"),
+    ("State", "Karnataka"),
+    ("Pincode", "560038"),
+    ("Blood Group", "O+ve"),
+]
+
+FONT = cv2.FONT_HERSHEY_SIMPLEX
+
+
+def render_form(rows=12, columns=2, width=1700, height=2200, font_scale=1.1, seed=0):
+    """
+    A white RGB page with `columns` columns of `rows` field rows.
+    Returns (image, word_boxes, lines): word boxes are (x, y, w, h),
+    lines are {"text", "coordinates": [x1, x2, y1, y2], "ocr_confidence"}
+    as run_ocr_pipeline returns them.
+    """
+    rng = np.random.default_rng(seed)
+    image = np.full((height, width, 3), 255, dtype=np.uint8)
+    word_boxes = []
+    lines = []
+
+    column_width = width // columns
+    row_height = (height - 200) // rows
+    space = cv2.getTextSize(" ", FONT, font_scale, 2)[0][0]
+
+    for c in range(columns):
+        for r in range(rows):
+            label, value = FIELDS[(c * rows + r) % len(FIELDS)]
+            x = 60 + c * column_width
+            y = 150 + r * row_height + int(rng.integers(-4, 5))
+            line_start, line_top, line_bottom = x, y, y
+            for word in f"{label}: {value}".split():
+                (tw, th), baseline = cv2.getTextSize(word, FONT, font_scale, 2)
+                cv2.putText(image, word, (x, y), FONT, font_scale, (20, 20, 20), 2, cv2.LINE_AA)
+                word_boxes.append((x, y - th, tw, th + baseline))
+                line_top = min(line_top, y - th)
+                line_bottom = max(line_bottom, y + baseline)
+                x += tw + space
+            lines.append({
+                "text": f"{label}: {value}",
+                "coordinates": [line_start, x - space, line_top, line_bottom],
+                "ocr_confidence": round(float(rng.uniform(0.7, 0.99)), 4),
+            })
+
+    return image, word_boxes, lines
+
+
+def word_boxes(rows=200, columns=2, words_per_row=10, seed=0):
+    """
+    Geometry only: a dense page of (x, y, w, h) word boxes, in
+    shuffled order, for the grouping stages.
+    """
+    rng = np.random.default_rng(seed)
+    boxes = []
+    for r in range(rows):
+        for c in range(columns):
+            x = c * (words_per_row * 120 + 300)
+            for _ in range(words_per_row):
+                w = int(rng.integers(40, 110))
+                boxes.append((x + int(rng.integers(0, 5)), r * 40 + int(rng.integers(0, 6)), w, 22))
+                x += w + int(rng.integers(8, 20))
+    order = rng.permutation(len(boxes))
+    return [boxes[i] for i in order]
+
+
+def craft_polygons(boxes, seed=0):
+    """
+    4-point float polygons around (x, y, w, h) boxes, slightly
+    jittered, like craft_text_detector returns.
+    """
+    rng = np.random.default_rng(seed)
+    b = np.asarray(boxes, dtype=np.float32)
+    x1, y1, x2, y2 = b[:, 0], b[:, 1], b[:, 0] + b[:, 2], b[:, 1] + b[:, 3]
+    polys = np.stack([
+        np.stack([x1, y1], 1), np.stack([x2, y1], 1),
+        np.stack([x2, y2], 1), np.stack([x1, y2], 1),
+    ], axis=1)
+    polys += rng.uniform(-1.5, 1.5, polys.shape).astype(np.float32)
+    return list(polys)
+
+
+def to_pdf(image, dpi=200):
+    buf = io.BytesIO()
+    Image.fromarray(image).save(buf, format="PDF", resolution=dpi)
+    return buf.getvalue()
+
+
+def to_png(image):
+    buf = io.BytesIO()
+    Image.fromarray(image).save(buf, format="PNG")
+    return buf.getvalue()
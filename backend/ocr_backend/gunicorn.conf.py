@@ -0,0 +1,70 @@
+"""
+gunicorn launcher for model-serving workers.
+
+    gunicorn -c gunicorn.conf.py ocr_backend.wsgi:application
+    gunicorn -c gunicorn.conf.py -k uvicorn.workers.UvicornWorker ocr_backend.asgi:application
+
+OCR_WORKERS (default: cores / OCR_CORES_PER_WORKER) sets the worker
+count; each worker is pinned to its own cores with a matching torch /
+OpenCV / BLAS thread budget (see ocr_backend/cpu_layout.py).
+
+OCR_PRELOAD_MODELS=True loads the models once in the master and shares
+them copy-on-write with the workers (see ocr_backend/model_sharing.py);
+`manage.py worker_memory` reports what each worker really uses, finding
+the master through its pidfile: OCR_PIDFILE, by default in
+$XDG_RUNTIME_DIR or the temp directory.
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from ocr_backend.cpu_layout import apply_thread_budget, describe, plan_layout  # noqa: E402
+from ocr_backend.model_sharing import memory_usage, pidfile_path, preload_models  # noqa: E402
+
+LAYOUT = plan_layout(int(os.environ["OCR_WORKERS"]) if os.getenv("OCR_WORKERS") else None)
+
+bind = os.getenv("OCR_BIND", "0.0.0.0:8000")
+workers = len(LAYOUT)
+timeout = int(os.getenv("OCR_WORKER_TIMEOUT", "120"))
+pidfile = pidfile_path()
+
+PRELOAD_MODELS = os.getenv("OCR_PRELOAD_MODELS", "False") == "True"
+
+
+def on_starting(server):
+    if not PRELOAD_MODELS:
+        return
+    # one thread while loading: a forked child must not inherit a
+    # running OpenMP pool. post_fork sets the real budget.
+    apply_thread_budget(1)
+    preload_models(log=server.log.info)
+    usage = memory_usage()
+    if usage:
+        server.log.info("master after preload: rss=%.0f MB", usage["rss"] / 2**20)
+
+
+def when_ready(server):
+    server.log.info(describe(LAYOUT))
+
+
+def pre_fork(server, worker):
+    # give the new worker a slot no live worker holds (respawns reuse
+    # the slot of the worker they replace); beyond the layout (TTIN, a
+    # respawn while the old worker is still exiting) there is none
+    used = {getattr(w, "cpu_slot", None) for w in server.WORKERS.values()}
+    worker.cpu_slot = next((i for i in range(len(LAYOUT)) if i not in used), None)
+
+
+def post_fork(server, worker):
+    if worker.cpu_slot is None:
+        # unpinned, and one thread so it does not crowd out the others
+        apply_thread_budget(1)
+        server.log.warning("worker (pid %s) has no free CPU slot: running unpinned", worker.pid)
+        return
+    slot = LAYOUT[worker.cpu_slot]
+    apply_thread_budget(slot["threads"], slot["cpus"])
+    server.log.info(
+        "worker %s (pid %s): cpus=%s threads=%s",
+        slot["worker"], worker.pid, slot["cpus"], slot["threads"],
+    )
@@ -1,14 +1,25 @@
 import os
-import uuid
-from ultralytics import YOLO
-from pdf2image import convert_from_path
+import cv2
+import numpy as np
+from pdf2image import convert_from_path, convert_from_bytes
 from PIL import Image
 
+from .profiling import stage
+
 # ---------------------------------------------------------
 # Load YOLO model ONCE (important for performance)
 # ---------------------------------------------------------
 MODEL_PATH = os.path.join(os.path.dirname(__file__), "model_cache/best.pt")
-model = YOLO(MODEL_PATH)
+
+# Deterministic stand-in (benchmarks, load tests); see stub_models.py
+STUB_MODELS = os.getenv("OCR_STUB_MODELS", "False") == "True"
+
+if STUB_MODELS:
+    from .stub_models import StubYOLO
+    model = StubYOLO()
+else:
+    from ultralytics import YOLO
+    model = YOLO(MODEL_PATH)
 
 # Confidence threshold (balanced for recall)
 YOLO_CONF = 0.45
@@ -18,16 +29,18 @@ YOLO_IMGSZ = 640
 # ---------------------------------------------------------
 # YOLO inference on a single image
 # ---------------------------------------------------------
-def _detect_aadhaar_in_image(image_path: str) -> bool:
+def _detect_aadhaar_in_image(image) -> bool:
     """
     Returns True if YOLO detects *any* Aadhaar-related object.
+    `image` is a path, a BGR array or a PIL image.
     """
-    results = model.predict(
-        source=image_path,
-        conf=YOLO_CONF,
-        imgsz=YOLO_IMGSZ,
-        verbose=False
-    )[0]
+    with stage("yolo"):
+        results = model.predict(
+            source=image,
+            conf=YOLO_CONF,
+            imgsz=YOLO_IMGSZ,
+            verbose=False
+        )[0]
 
     # If model predicts at least one box → Aadhaar detected
     return results.boxes is not None and len(results.boxes) > 0
@@ -36,38 +49,55 @@ def _detect_aadhaar_in_image(image_path: str) -> bool:
 # ---------------------------------------------------------
 # Public function used by Django view
 # ---------------------------------------------------------
-def is_aadhaar(file_path: str) -> bool:
+def _detect_aadhaar_in_pages(pages) -> bool:
+    # PDF pages go to YOLO as PIL images; no temp JPEGs
+    return any(_detect_aadhaar_in_image(page) for page in pages)
+
+
+def is_aadhaar(source) -> bool:
     """
     Detect Aadhaar card from image or PDF.
+    `source` is a file path, the raw file bytes or a BGR array.
     """
 
-    file_path = str(file_path).lower()
+    # ---------------- ARRAY ----------------
+    if isinstance(source, np.ndarray):
+        return _detect_aadhaar_in_image(source)
+
+    # ---------------- BYTES ----------------
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        data = bytes(source)
+        if b"%PDF" in data[:1024]:
+            try:
+                with stage("rasterize"):
+                    pages = convert_from_bytes(data, dpi=300)
+            except Exception:
+                # PDF unreadable
+                return False
+            return _detect_aadhaar_in_pages(pages)
+
+        image = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+        if image is None:
+            # Not an image we can read
+            return False
+        return _detect_aadhaar_in_image(image)
+
+    file_path = str(source).lower()
 
     # ---------------- IMAGE ----------------
     if file_path.endswith((".jpg", ".jpeg", ".png")):
-        return _detect_aadhaar_in_image(file_path)
+        return _detect_aadhaar_in_image(str(source))
 
     # ---------------- PDF ------------------
     if file_path.endswith(".pdf"):
         try:
-            pages = convert_from_path(file_path, dpi=300)
+            with stage("rasterize"):
+                pages = convert_from_path(str(source), dpi=300)
         except Exception:
             # PDF unreadable
             return False
 
-        for page in pages:
-            temp_img = f"/tmp/aadhaar_{uuid.uuid4().hex}.jpg"
-            page.save(temp_img, "JPEG")
-
-            try:
-                if _detect_aadhaar_in_image(temp_img):
-                    return True
-            finally:
-                # Cleanup temp file
-                if os.path.exists(temp_img):
-                    os.remove(temp_img)
-
-        return False
+        return _detect_aadhaar_in_pages(pages)
 
     # Unsupported file type
     return False
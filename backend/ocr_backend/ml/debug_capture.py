@@ -0,0 +1,165 @@
+"""
+Debug artifacts of sampled OCR requests.
+
+The web layer puts a DebugCapture in `current_capture` for the few
+requests it samples; the pipeline records what it did into it (page,
+CRAFT word boxes, merged lines, recognised text) and nothing else
+happens on the normal path. DebugStore then writes, per document, a
+box overlay and the line crops, plus one trace.json, into a directory
+per request, and prunes the store to its count, size and age limits.
+"""
+import contextvars
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+
+import cv2
+import numpy as np
+
+from .line_crops import pad_box
+
+current_capture = contextvars.ContextVar("current_capture", default=None)
+
+WORD_COLOR = (0, 160, 255)  # BGR
+LINE_COLOR = (0, 200, 0)
+
+
+class DocumentTrace:
+    """
+    What the pipeline did with one document.
+    """
+
+    def __init__(self, index):
+        self.index = index
+        self.image = None
+        self.word_boxes = []
+        self.line_boxes = []
+        self.lines = []
+        self.events = []
+        self._started = time.perf_counter()
+
+    def event(self, name, **data):
+        self.events.append({"event": name, "t_ms": round((time.perf_counter() - self._started) * 1000, 1), **data})
+
+    def to_json(self):
+        return {
+            "index": self.index,
+            "image_size": None if self.image is None else list(self.image.shape[1::-1]),
+            "word_boxes": [[int(v) for v in box] for box in self.word_boxes],
+            "line_boxes": [[int(v) for v in box] for box in self.line_boxes],
+            "lines": self.lines,
+            "events": self.events,
+        }
+
+
+class DebugCapture:
+    def __init__(self, label="", reason=""):
+        self.name = f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        self.label = label
+        self.reason = reason
+        self.documents = []
+        self._lock = threading.Lock()
+
+    def document(self):
+        # documents of one request may be OCR'd concurrently
+        with self._lock:
+            trace = DocumentTrace(len(self.documents))
+            self.documents.append(trace)
+        return trace
+
+
+def overlay(trace):
+    """
+    BGR copy of the page with word boxes (orange) and numbered line
+    boxes (green).
+    """
+    canvas = cv2.cvtColor(trace.image, cv2.COLOR_RGB2BGR)
+    for x, y, w, h in trace.word_boxes:
+        cv2.rectangle(canvas, (x, y), (x + w, y + h), WORD_COLOR, 1)
+    for i, (x, y, w, h) in enumerate(trace.line_boxes):
+        cv2.rectangle(canvas, (x, y), (x + w, y + h), LINE_COLOR, 2)
+        cv2.putText(canvas, str(i + 1), (x, max(y - 4, 12)), cv2.FONT_HERSHEY_SIMPLEX, 0.6, LINE_COLOR, 2)
+    return canvas
+
+
+class DebugStore:
+    """
+    One directory per capture under `root`. After every save the store
+    is cut back to the newest `max_captures`, to captures younger than
+    `max_age` seconds and to `max_bytes` in total.
+    """
+
+    def __init__(self, root, max_captures=200, max_bytes=512 * 1024 * 1024, max_age=72 * 3600):
+        self.root = root
+        self.max_captures = max_captures
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self._lock = threading.Lock()
+
+    def save(self, capture):
+        """
+        Write `capture`; returns its directory, or None if no document
+        reached the pipeline.
+        """
+        if not capture.documents:
+            return None
+        path = os.path.join(self.root, capture.name)
+        os.makedirs(path, exist_ok=True)
+
+        for trace in capture.documents:
+            if trace.image is None:
+                continue
+            cv2.imwrite(os.path.join(path, f"doc{trace.index}_overlay.png"), overlay(trace))
+            crops = os.path.join(path, f"doc{trace.index}_crops")
+            os.makedirs(crops, exist_ok=True)
+            img_h, img_w = trace.image.shape[:2]
+            for i, box in enumerate(trace.line_boxes):
+                x, y, w, h = pad_box(box, img_w, img_h)
+                crop = np.ascontiguousarray(trace.image[y:y + h, x:x + w, ::-1])
+                cv2.imwrite(os.path.join(crops, f"line{i + 1:03d}.png"), crop)
+
+        with open(os.path.join(path, "trace.json"), "w") as f:
+            json.dump(
+                {
+                    "name": capture.name,
+                    "label": capture.label,
+                    "reason": capture.reason,
+                    "documents": [trace.to_json() for trace in capture.documents],
+                },
+                f,
+                indent=1,
+            )
+        self.prune()
+        return path
+
+    def captures(self):
+        """
+        (name, bytes, mtime) of every capture, oldest first.
+        """
+        if not os.path.isdir(self.root):
+            return []
+        found = []
+        for name in sorted(os.listdir(self.root)):
+            path = os.path.join(self.root, name)
+            if not os.path.isdir(path):
+                continue
+            size = 0
+            for folder, _, files in os.walk(path):
+                size += sum(os.path.getsize(os.path.join(folder, f)) for f in files)
+            found.append((name, size, os.path.getmtime(path)))
+        return found
+
+    def prune(self):
+        with self._lock:
+            found = self.captures()
+            total = sum(size for _, size, _ in found)
+            cutoff = time.time() - self.max_age
+            # names start with the timestamp, so oldest first
+            for i, (name, size, mtime) in enumerate(found):
+                if len(found) - i <= self.max_captures and total <= self.max_bytes and mtime >= cutoff:
+                    break
+                shutil.rmtree(os.path.join(self.root, name), ignore_errors=True)
+                total -= size
@@ -0,0 +1,173 @@
+import contextvars
+import os
+import re
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+
+from thefuzz import fuzz
+
+# ---------------------------------------------------------
+# Worker pool shared by every verification request.
+# Threads (not processes) so all workers reuse the models
+# already loaded by handwritten_ocr; torch releases the GIL
+# while it runs.
+# ---------------------------------------------------------
+OCR_DOC_WORKERS = int(os.getenv("OCR_DOC_WORKERS", min(3, os.cpu_count() or 1)))
+_executor = ThreadPoolExecutor(max_workers=OCR_DOC_WORKERS, thread_name_prefix="doc-ocr")
+
+MATCH_THRESHOLD = 65
+
+GENDER_ALIASES = {
+    "MALE": {"MALE", "M"},
+    "FEMALE": {"FEMALE", "F"},
+    "OTHER": {"OTHER", "O", "TRANSGENDER", "T"},
+}
+
+
+# ---------------------------------------------------------
+# Helpers
+# ---------------------------------------------------------
+def content_hash(source):
+    """
+    SHA-256 of a document (path or raw bytes), used to spot the
+    same upload sent twice.
+    """
+    digest = hashlib.sha256()
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        digest.update(source)
+        return digest.hexdigest()
+
+    with open(source, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _to_box(coordinates):
+    # run_ocr_pipeline returns [x1, x2, y1, y2]; reports use [x1, y1, x2, y2]
+    if not coordinates:
+        return []
+    x1, x2, y1, y2 = coordinates
+    return [x1, y1, x2, y2]
+
+
+def _match(line, score):
+    return {
+        "coordinates": _to_box(line["coordinates"]),
+        "match_score": score,
+        "detected_text": line["text"],
+    }
+
+
+def _best_fuzzy(lines, target):
+    target = (target or "").strip().upper()
+    if not target:
+        return None
+
+    best, best_score = None, 0
+    for line in lines:
+        score = fuzz.partial_ratio(target, line["text"].upper())
+        if score > best_score:
+            best, best_score = line, score
+
+    if best is None or best_score < MATCH_THRESHOLD:
+        return None
+    return _match(best, best_score)
+
+
+def _best_digits(lines, target):
+    target_digits = re.sub(r"\D", "", target or "")
+    if not target_digits:
+        return None
+
+    best, best_score = None, 0
+    for line in lines:
+        line_digits = re.sub(r"\D", "", line["text"])
+        if len(line_digits) < len(target_digits) // 2:
+            continue
+        score = fuzz.partial_ratio(target_digits, line_digits)
+        if score > best_score:
+            best, best_score = line, score
+
+    if best is None or best_score < MATCH_THRESHOLD:
+        return None
+    return _match(best, best_score)
+
+
+def _match_gender(lines, target):
+    target = (target or "").strip().upper()
+    aliases = GENDER_ALIASES.get(target)
+    if aliases is None:
+        aliases = next((a for a in GENDER_ALIASES.values() if target in a), {target})
+
+    for line in lines:
+        tokens = set(re.findall(r"[A-Z]+", line["text"].upper()))
+        if tokens & aliases:
+            return _match(line, 100)
+    return _best_fuzzy(lines, target)
+
+
+# ---------------------------------------------------------
+# Verifier
+# ---------------------------------------------------------
+class DocumentVerifier:
+    """
+    OCRs the DOB, ID and address proofs and matches them against
+    the details the applicant typed into the form.
+    """
+
+    def extract_lines(self, documents, tier="full", decoding=None):
+        """
+        OCR every distinct document once, concurrently.
+
+        `documents` are file paths or raw file bytes. Byte-identical
+        documents (e.g. one Aadhaar used as both ID and address proof)
+        are recognised only once. Returns the lines of each document,
+        in input order. `tier` is a handwritten_ocr.QUALITY_TIERS key,
+        `decoding` a handwritten_ocr.DECODING_PROFILES key.
+        """
+        hashes = [content_hash(doc) for doc in documents]
+
+        futures = {}
+        for digest, doc in zip(hashes, documents):
+            if digest not in futures:
+                # copied context: the request's profile (ml.profiling) follows the work
+                futures[digest] = _executor.submit(contextvars.copy_context().run, self.ocr, doc, tier, decoding)
+
+        return [futures[digest].result() for digest in hashes]
+
+    def ocr(self, document, tier="full", decoding=None):
+        """
+        Lines of one document; runs on the worker pool.
+        """
+        # Lazy import: matching alone must not load the OCR models
+        from .handwritten_ocr import run_ocr_pipeline
+
+        return run_ocr_pipeline(document, tier, decoding)
+
+    def match_details(self, dob_lines, id_lines, address_lines, user_details):
+        """
+        Match the user's details against already-recognised lines.
+        """
+        return {
+            "date_of_birth": _best_digits(dob_lines, user_details.get("dob")),
+            "first_name": _best_fuzzy(id_lines, user_details.get("first_name")),
+            "middle_name": _best_fuzzy(id_lines, user_details.get("middle_name")),
+            "last_name": _best_fuzzy(id_lines, user_details.get("last_name")),
+            "gender": _match_gender(id_lines, user_details.get("gender")),
+            "address_line": _best_fuzzy(address_lines, user_details.get("address_line")),
+            "city": _best_fuzzy(address_lines, user_details.get("city")),
+            "state": _best_fuzzy(address_lines, user_details.get("state")),
+            "pincode": _best_digits(address_lines, user_details.get("pincode")),
+            "country": _best_fuzzy(address_lines, user_details.get("country")),
+        }
+
+    def verify_documents(self, birth_doc_path, id_doc_path, address_doc_path, user_details):
+        """
+        Verify user details against the three proofs.
+        """
+        dob_lines, id_lines, address_lines = self.extract_lines(
+            [birth_doc_path, id_doc_path, address_doc_path]
+        )
+
+        return self.match_details(dob_lines, id_lines, address_lines, user_details)
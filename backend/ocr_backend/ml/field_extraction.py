@@ -0,0 +1,181 @@
+"""
+Field extraction from recognised lines: pincode, phone, email, blood
+group and gender by regex, names, dates of birth and addresses from
+the NER model when there is one. No model imports, so the rules run
+(and are benchmarked) without torch.
+"""
+import re
+
+
+def extract_fields_with_coords(lines_data, ner_model=None):
+    """
+    Fields of a form from its OCR lines, each with the coordinates
+    and confidence of the line it was found on. Regex rules only
+    without `ner_model` (a GLiNER model or stand-in).
+    """
+    full_text_block = "\n".join([line['text'] for line in lines_data])
+    final_output = {}
+    
+    def map_to_line(value_text):
+        if not value_text:
+            return [], 0.0
+        for line in lines_data:
+            if value_text in line['text']:
+                return line['coordinates'], line['ocr_confidence']
+        for line in lines_data:
+            if value_text in line['text'] or line['text'] in value_text:
+                if len(line['text']) > 3:
+                    return line['coordinates'], line['ocr_confidence']
+        return [], 0.0
+    
+    pincode_found = False
+    for line in lines_data:
+        clean_text = line['text'].replace(" ", "").strip()
+        if clean_text.isdigit() and len(clean_text) == 6:
+            final_output["Pincode"] = {
+                "value": clean_text,
+                "coordinates": line['coordinates'],
+                "confidence_score": line['ocr_confidence']
+            }
+            pincode_found = True
+            break
+        if "pin" in line['text'].lower():
+            digits = "".join(filter(str.isdigit, line['text']))
+            if len(digits) == 6:
+                final_output["Pincode"] = {
+                    "value": digits,
+                    "coordinates": line['coordinates'],
+                    "confidence_score": line['ocr_confidence']
+                }
+                pincode_found = True
+                break
+    
+    if not pincode_found:
+        pin_match = re.search(r'\b\d{6}\b', full_text_block)
+        if pin_match:
+            val = pin_match.group(0)
+            coords, conf = map_to_line(val)
+            final_output["Pincode"] = {"value": val, "coordinates": coords, "confidence_score": conf if conf else 1.0}
+    
+    phone_val = None
+    phone_coords = []
+    phone_conf = 0.0
+    
+    labeled_match = re.search(r'(?:Ph|Phone|Mob|Mobile|Cell|Tel)\s*[:\.]?\s*([+\d\s\-]{10,15})', full_text_block, re.IGNORECASE)
+    if labeled_match:
+        raw_val = labeled_match.group(1)
+        phone_val = re.sub(r'[^\d+]', '', raw_val)
+        coords, conf = map_to_line(raw_val.strip())
+        phone_coords, phone_conf = coords, conf
+    
+    if not phone_val:
+        candidates = re.finditer(r'\b(?:\+?[\d\s\-]{10,15})\b', full_text_block)
+        for cand in candidates:
+            raw_text = cand.group(0).strip()
+            clean_text = re.sub(r'[^\d]', '', raw_text)
+            if len(clean_text) < 10 or len(clean_text) > 13:
+                continue
+            
+            if raw_text.count('-') >= 2 or raw_text.count('/') >= 2:
+                continue
+            
+            if "Pincode" in final_output and clean_text == final_output["Pincode"]["value"]:
+                continue
+            
+            phone_val = clean_text
+            coords, conf = map_to_line(raw_text)
+            if not coords:
+                coords, conf = map_to_line(clean_text)
+            
+            phone_coords, phone_conf = coords, conf
+            break
+    
+    if phone_val:
+        final_output["Phone"] = {"value": phone_val, "coordinates": phone_coords, "confidence_score": phone_conf if phone_conf else 0.8}
+    
+    email_match = re.search(r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b', full_text_block)
+    if email_match:
+        val = email_match.group(0)
+        coords, conf = map_to_line(val)
+        final_output["Email"] = {"value": val, "coordinates": coords, "confidence_score": conf if conf else 1.0}
+    
+    bg_found = False
+    for line in lines_data:
+        t = line['text']
+        bg_match = re.search(r'\b(A|B|AB|O)[-\s]?(?:positive|negative|\+ve|\-ve|[\+\-])', t, re.IGNORECASE)
+        if bg_match:
+            raw_val = bg_match.group(0)
+            norm_val = raw_val.upper().replace('POSITIVE','+').replace('NEGATIVE','-').replace('VE','').replace(' ','').strip()
+            final_output["Blood Group"] = {"value": norm_val, "coordinates": line['coordinates'], "confidence_score": line['ocr_confidence']}
+            bg_found = True
+            break
+    
+    if not bg_found:
+        bg_match = re.search(r'\b(A|B|AB|O)[\+\-]', full_text_block, re.IGNORECASE)
+        if bg_match:
+            val = bg_match.group(0).upper()
+            coords, conf = map_to_line(val)
+            final_output["Blood Group"] = {"value": val, "coordinates": coords, "confidence_score": conf}
+    
+    gender_match = re.search(r'\b(Male|Female|M|F)\b', full_text_block, re.IGNORECASE)
+    if gender_match:
+        val = gender_match.group(0)
+        norm_val = "Male" if val.lower() in ['m','male'] else "Female"
+        coords, conf = map_to_line(val)
+        final_output["Gender"] = {"value": norm_val, "coordinates": coords, "confidence_score": conf if conf else 1.0}
+    
+    labels = ["person name", "phone number", "date of birth", "full address", "city", "state", "country"]
+    entities = ner_model.predict_entities(full_text_block, labels, threshold=0.3) if ner_model is not None else []
+    
+    for ent in entities:
+        lbl = ent["label"]
+        txt = ent["text"].strip()
+        score = round(ent["score"], 2)
+        coords, conf = map_to_line(txt)
+        final_conf = conf if conf > 0 else score
+        
+        key_map = {
+            "person name": "Name",
+            "phone number": "Phone",
+            "date of birth": "DOB",
+            "city": "City",
+            "state": "State",
+            "country": "Country"
+        }
+        
+        if lbl in key_map:
+            key = key_map[lbl]
+            if key not in final_output:
+                final_output[key] = {"value": txt, "coordinates": coords, "confidence_score": final_conf}
+        elif lbl == "full address":
+            if "Address" in final_output:
+                if txt not in final_output["Address"]["value"]:
+                    final_output["Address"]["value"] += ", " + txt
+            else:
+                final_output["Address"] = {"value": txt, "coordinates": coords, "confidence_score": final_conf}
+    
+    if "Name" in final_output:
+        full_name = final_output["Name"]["value"].strip()
+        coords = final_output["Name"]["coordinates"]
+        conf = final_output["Name"]["confidence_score"]
+        parts = full_name.split()
+        first_name = ""
+        middle_name = ""
+        last_name = ""
+        if len(parts) == 1:
+            first_name = parts[0]
+            last_name = ""
+        elif len(parts) == 2:
+            first_name = parts[0]
+            last_name = parts[1]
+        elif len(parts) >= 3:
+            first_name = parts[0]
+            last_name = parts[-1]
+            middle_name = " ".join(parts[1:-1])
+        
+        final_output["First Name"] = {"value": first_name, "coordinates": coords, "confidence_score": conf}
+        final_output["Middle Name"] = {"value": middle_name, "coordinates": coords, "confidence_score": conf}
+        final_output["Last Name"] = {"value": last_name, "coordinates": coords, "confidence_score": conf}
+        del final_output["Name"]
+    
+    return final_output
@@ -1,19 +1,31 @@
+import io
+import math
 import os
 import cv2
 import torch
 import numpy as np
-import re
 from PIL import Image
-from pdf2image import convert_from_path
-from transformers import TrOCRProcessor, VisionEncoderDecoderModel
-from gliner import GLiNER
+from pdf2image import convert_from_path, convert_from_bytes
+from transformers import LogitsProcessor, LogitsProcessorList, TrOCRProcessor, VisionEncoderDecoderModel
 
-from craft_text_detector import (
-    load_craftnet_model,
-    load_refinenet_model,
-    get_prediction,
-    empty_cuda_cache
-)
+from . import field_extraction
+from .debug_capture import current_capture
+from .line_crops import LinePreprocessor, pad_box
+from .line_layout import craft_boxes, group_lines
+from .profiling import stage
+
+# Deterministic stand-ins instead of the real models (benchmarks,
+# load tests); see stub_models.py
+STUB_MODELS = os.getenv("OCR_STUB_MODELS", "False") == "True"
+
+if not STUB_MODELS:
+    from gliner import GLiNER
+    from craft_text_detector import (
+        load_craftnet_model,
+        load_refinenet_model,
+        get_prediction,
+        empty_cuda_cache
+    )
 
 FILE_PATH = 'doc7.jpg'
 USE_GPU = torch.cuda.is_available()
@@ -27,8 +39,17 @@ print(f"Running on: {device.upper()}")
 #FOR KARN
 MODEL_CACHE = r"C:\Users\adity\Downloads\backend_ocr\ocr_extract\backend\ocr_backend\ML\model_cache\models--microsoft--trocr-large-handwritten\snapshots\e68501f437cd2587ae5d68ee457964cac824ddee"
 
-processor = TrOCRProcessor.from_pretrained(MODEL_CACHE, local_files_only=True)
-model = VisionEncoderDecoderModel.from_pretrained(MODEL_CACHE, local_files_only=True).to(device)
+if STUB_MODELS:
+    from .stub_models import StubCraftNet, StubNER, StubTrOCRModel, StubTrOCRProcessor, get_prediction
+    processor = StubTrOCRProcessor()
+    model = StubTrOCRModel()
+else:
+    processor = TrOCRProcessor.from_pretrained(MODEL_CACHE, local_files_only=True)
+    model = VisionEncoderDecoderModel.from_pretrained(MODEL_CACHE, local_files_only=True).to(device)
+line_preprocessor = LinePreprocessor.from_processor(processor.image_processor)
+
+# lines cropped + preprocessed together per chunk (one batch array each)
+RECOGNITION_CHUNK = 8
 
 from pathlib import Path
 
@@ -36,19 +57,66 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 
 
 
-print("Loading GLiNER model...")
-ner_model = GLiNER.from_pretrained("urchade/gliner_small-v2.1")
+if STUB_MODELS:
+    ner_model = StubNER()
+    craft_net = refine_net = StubCraftNet()
+else:
+    print("Loading GLiNER model...")
+    ner_model = GLiNER.from_pretrained("urchade/gliner_small-v2.1")
+
+    print("Loading CRAFT models...")
+    craft_net = load_craftnet_model(cuda=USE_GPU)
+    refine_net = load_refinenet_model(cuda=USE_GPU)
 
-print("Loading CRAFT models...")
-craft_net = load_craftnet_model(cuda=USE_GPU)
-refine_net = load_refinenet_model(cuda=USE_GPU)
+# TrOCR decoding profiles. The token budget of a line follows the
+# aspect ratio of its crop (a short word cannot need 96 tokens), so
+# noise crops stop early instead of generating garbage to the limit.
+DECODING_PROFILES = {
+    "beam": {
+        "generation": {"num_beams": 4, "early_stopping": True},
+        "base_tokens": 6, "tokens_per_aspect": 2.0, "min_new_tokens": 8, "max_new_tokens": 96,
+    },
+    "greedy": {
+        "generation": {"num_beams": 1},
+        "base_tokens": 6, "tokens_per_aspect": 2.0, "min_new_tokens": 8, "max_new_tokens": 96,
+    },
+}
+DEFAULT_DECODING = "beam"
+
+# Pipeline settings per quality tier. The server switches to the
+# cheaper tiers under load (verify_user/degradation.py). "decoding"
+# overrides the endpoint's profile, "token_cap" caps its budget.
+QUALITY_TIERS = {
+    "full": {"craft_long_size": 1500, "decoding": None, "token_cap": None, "use_ner": True},
+    "reduced": {"craft_long_size": 1280, "decoding": "greedy", "token_cap": 48, "use_ner": True},
+    "minimal": {"craft_long_size": 960, "decoding": "greedy", "token_cap": 32, "use_ner": False},
+}
+
+def load_file_as_numpy_image(source):
+    """
+    RGB array from a file path, raw file bytes or an RGB array.
+    """
+    if isinstance(source, np.ndarray):
+        return np.ascontiguousarray(source)
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        data = bytes(source)
+        if b"%PDF" in data[:1024]:
+            try:
+                pages = convert_from_bytes(data, dpi=300, last_page=1)
+                return np.ascontiguousarray(np.array(pages[0].convert("RGB"))) if pages else None
+            except Exception as e:
+                print(f"PDF Error: {e}")
+                return None
+        try:
+            return np.ascontiguousarray(np.array(Image.open(io.BytesIO(data)).convert("RGB")))
+        except:
+            return None
 
-def load_file_as_numpy_image(file_path):
+    file_path = source
     if not os.path.exists(file_path):
         return None
     ext = os.path.splitext(file_path)[1].lower()
     if ext == '.pdf':
-        print(f"Detected PDF. Converting...")
         try:
             pages = convert_from_path(file_path, dpi=300, poppler_path=POPPLER_PATH, last_page=1)
             return np.ascontiguousarray(np.array(pages[0].convert("RGB"))) if pages else None
@@ -60,44 +128,19 @@ def load_file_as_numpy_image(file_path):
     except:
         return None
 
-def merge_boxes_into_lines(boxes, y_threshold=30):
-    if not boxes:
-        return []
-    
-    boxes = sorted(boxes, key=lambda b: b[1])
-    lines = []
-    current_line = [boxes[0]]
-    
-    for i in range(1, len(boxes)):
-        box = boxes[i]
-        last_box = current_line[-1]
-        
-        cy_box = box[1] + (box[3] / 2)
-        cy_last = last_box[1] + (last_box[3] / 2)
-        
-        if abs(cy_box - cy_last) < y_threshold:
-            current_line.append(box)
-        else:
-            lines.append(current_line)
-            current_line = [box]
-    lines.append(current_line)
-    
-    merged_results = []
-    for line_boxes in lines:
-        line_boxes = sorted(line_boxes, key=lambda b: b[0])
-        x_min = min(b[0] for b in line_boxes)
-        y_min = min(b[1] for b in line_boxes)
-        x_max = max(b[0] + b[2] for b in line_boxes)
-        y_max = max(b[1] + b[3] for b in line_boxes)
-        w = x_max - x_min
-        h = y_max - y_min
-        merged_results.append((x_min, y_min, w, h))
-    
-    return merged_results
+def merge_boxes_into_lines(boxes, min_overlap=0.5, gap_factor=3.0):
+    """
+    (x, y, w, h) word boxes -> line boxes in reading order; columns
+    separated by more than `gap_factor` box heights stay apart.
+    See line_layout.group_lines.
+    """
+    return group_lines(boxes, min_overlap=min_overlap, gap_factor=gap_factor)
 
-def detect_text_craft(image_rgb):
-    print("Running CRAFT prediction...")
-    
+def detect_text_craft(image_rgb, long_size=1500, trace=None):
+    """
+    Line boxes (x, y, w, h) in reading order. `trace` is the
+    debug_capture.DocumentTrace of a captured request, if any.
+    """
     prediction_result = get_prediction(
         image=image_rgb,
         craft_net=craft_net,
@@ -106,286 +149,224 @@ def detect_text_craft(image_rgb):
         link_threshold=0.1,
         low_text=0.2,
         cuda=USE_GPU,
-        long_size=1500
+        long_size=long_size
     )
     
-    print("---- RAW CRAFT BOXES ----")
-    print(prediction_result.get("boxes"))
-    print("--------------------------")
-    
     raw_boxes = prediction_result["boxes"]
     
     if raw_boxes is None or len(raw_boxes) == 0:
-        print("CRAFT DETECTED ZERO BOXES ❌")
+        if trace is not None:
+            trace.event("craft", long_size=long_size, raw_boxes=0)
         return []
     
-    formatted_boxes = []
-    
-    for box in raw_boxes:
-        box_np = np.array(box).astype(int)
-        x_min = np.min(box_np[:, 0])
-        x_max = np.max(box_np[:, 0])
-        y_min = np.min(box_np[:, 1])
-        y_max = np.max(box_np[:, 1])
-        w = x_max - x_min
-        h = y_max - y_min
-        if w > 5 and h > 5:
-            formatted_boxes.append((x_min, y_min, w, h))
-    
-    print("RAW boxes:", len(raw_boxes), "Filtered:", len(formatted_boxes))
-    
-    final_lines = merge_boxes_into_lines(formatted_boxes, y_threshold=40)
-    
-    print("Merged lines:", len(final_lines))
-    print("Final line boxes:", final_lines)
+    formatted_boxes = craft_boxes(raw_boxes)
+    final_lines = merge_boxes_into_lines(formatted_boxes)
     
+    if trace is not None:
+        trace.word_boxes = formatted_boxes
+        trace.line_boxes = final_lines
+        trace.event(
+            "craft", long_size=long_size, raw_boxes=len(raw_boxes),
+            word_boxes=len(formatted_boxes), lines=len(final_lines)
+        )
     return final_lines
 
-def run_ocr_pipeline(file_path):
-    print("HI")
-    image_numpy_rgb = load_file_as_numpy_image(file_path)
-    if image_numpy_rgb is None:
-        return []
-    
-    boxes = detect_text_craft(image_numpy_rgb)
-    
-    print("========= DEBUG CRAFT =========")
-    print("Detected raw boxes count:", len(boxes))
-    print("Boxes:", boxes)
-    print("================================")
-    
-    pil_image = Image.fromarray(image_numpy_rgb)
-    lines_data = []
-    
-    for i, (x, y, w, h) in enumerate(boxes):
-        pad = 8
-        img_h, img_w, _ = image_numpy_rgb.shape
-        x_new = max(0, int(x) - pad)
-        y_new = max(0, int(y) - pad)
-        w_new = min(img_w - x_new, int(w) + 2*pad)
-        h_new = min(img_h - y_new, int(h) + 2*pad)
-        
-        cropped = pil_image.crop((x_new, y_new, x_new+w_new, y_new+h_new))
-        pixel_values = processor(images=cropped, return_tensors="pt").pixel_values.to(device)
-        
-        with torch.no_grad():
-            outputs = model.generate(
-                pixel_values,
-                return_dict_in_generate=True,
-                output_scores=True
-            )
-            generated_ids = outputs.sequences
-            text = processor.batch_decode(generated_ids, skip_special_tokens=True)[0]
-            try:
-                transition_scores = model.compute_transition_scores(
-                    sequences=generated_ids, scores=outputs.scores, normalize_logits=True
-                )
-                conf = torch.exp(transition_scores.mean()).item()
-            except:
-                conf = 0.0
-        
-        lines_data.append({
-            "text": text,
-            "coordinates": [int(x), int(x+w), int(y), int(y+h)],
-            "ocr_confidence": round(conf, 4)
-        })
-        print(f" Line {i+1}: {text} (Conf: {conf:.2f})")
-    
-    print("Running CRAFT...")
-    boxes = detect_text_craft(image_numpy_rgb)
-    print("CRAFT returned boxes:", len(boxes), boxes)
-    
-    return lines_data
+def max_new_tokens_for(width, height, profile, token_cap=None):
+    """
+    Token budget for a crop of the given size under a decoding profile.
+    """
+    tokens = profile["base_tokens"] + profile["tokens_per_aspect"] * width / max(height, 1)
+    limit = profile["max_new_tokens"] if token_cap is None else min(token_cap, profile["max_new_tokens"])
+    return int(min(limit, max(profile["min_new_tokens"], math.ceil(tokens))))
 
-def extract_fields_with_coords(lines_data):
-    full_text_block = "\n".join([line['text'] for line in lines_data])
-    final_output = {}
-    
-    def map_to_line(value_text):
-        if not value_text:
-            return [], 0.0
-        for line in lines_data:
-            if value_text in line['text']:
-                return line['coordinates'], line['ocr_confidence']
-        for line in lines_data:
-            if value_text in line['text'] or line['text'] in value_text:
-                if len(line['text']) > 3:
-                    return line['coordinates'], line['ocr_confidence']
-        return [], 0.0
-    
-    pincode_found = False
-    for line in lines_data:
-        clean_text = line['text'].replace(" ", "").strip()
-        if clean_text.isdigit() and len(clean_text) == 6:
-            final_output["Pincode"] = {
-                "value": clean_text,
-                "coordinates": line['coordinates'],
-                "confidence_score": line['ocr_confidence']
-            }
-            pincode_found = True
-            break
-        if "pin" in line['text'].lower():
-            digits = "".join(filter(str.isdigit, line['text']))
-            if len(digits) == 6:
-                final_output["Pincode"] = {
-                    "value": digits,
-                    "coordinates": line['coordinates'],
-                    "confidence_score": line['ocr_confidence']
-                }
-                pincode_found = True
-                break
-    
-    if not pincode_found:
-        pin_match = re.search(r'\b\d{6}\b', full_text_block)
-        if pin_match:
-            val = pin_match.group(0)
-            coords, conf = map_to_line(val)
-            final_output["Pincode"] = {"value": val, "coordinates": coords, "confidence_score": conf if conf else 1.0}
-    
-    phone_val = None
-    phone_coords = []
-    phone_conf = 0.0
-    
-    labeled_match = re.search(r'(?:Ph|Phone|Mob|Mobile|Cell|Tel)\s*[:\.]?\s*([+\d\s\-]{10,15})', full_text_block, re.IGNORECASE)
-    if labeled_match:
-        raw_val = labeled_match.group(1)
-        phone_val = re.sub(r'[^\d+]', '', raw_val)
-        coords, conf = map_to_line(raw_val.strip())
-        phone_coords, phone_conf = coords, conf
-    
-    if not phone_val:
-        candidates = re.finditer(r'\b(?:\+?[\d\s\-]{10,15})\b', full_text_block)
-        for cand in candidates:
-            raw_text = cand.group(0).strip()
-            clean_text = re.sub(r'[^\d]', '', raw_text)
-            if len(clean_text) < 10 or len(clean_text) > 13:
-                continue
-            
-            if raw_text.count('-') >= 2 or raw_text.count('/') >= 2:
-                continue
-            
-            if "Pincode" in final_output and clean_text == final_output["Pincode"]["value"]:
-                continue
-            
-            phone_val = clean_text
-            coords, conf = map_to_line(raw_text)
-            if not coords:
-                coords, conf = map_to_line(clean_text)
-            
-            phone_coords, phone_conf = coords, conf
-            break
-    
-    if phone_val:
-        final_output["Phone"] = {"value": phone_val, "coordinates": phone_coords, "confidence_score": phone_conf if phone_conf else 0.8}
-    
-    email_match = re.search(r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b', full_text_block)
-    if email_match:
-        val = email_match.group(0)
-        coords, conf = map_to_line(val)
-        final_output["Email"] = {"value": val, "coordinates": coords, "confidence_score": conf if conf else 1.0}
-    
-    bg_found = False
-    for line in lines_data:
-        t = line['text']
-        bg_match = re.search(r'\b(A|B|AB|O)[-\s]?(?:positive|negative|\+ve|\-ve|[\+\-])', t, re.IGNORECASE)
-        if bg_match:
-            raw_val = bg_match.group(0)
-            norm_val = raw_val.upper().replace('POSITIVE','+').replace('NEGATIVE','-').replace('VE','').replace(' ','').strip()
-            final_output["Blood Group"] = {"value": norm_val, "coordinates": line['coordinates'], "confidence_score": line['ocr_confidence']}
-            bg_found = True
-            break
-    
-    if not bg_found:
-        bg_match = re.search(r'\b(A|B|AB|O)[\+\-]', full_text_block, re.IGNORECASE)
-        if bg_match:
-            val = bg_match.group(0).upper()
-            coords, conf = map_to_line(val)
-            final_output["Blood Group"] = {"value": val, "coordinates": coords, "confidence_score": conf}
-    
-    gender_match = re.search(r'\b(Male|Female|M|F)\b', full_text_block, re.IGNORECASE)
-    if gender_match:
-        val = gender_match.group(0)
-        norm_val = "Male" if val.lower() in ['m','male'] else "Female"
-        coords, conf = map_to_line(val)
-        final_output["Gender"] = {"value": norm_val, "coordinates": coords, "confidence_score": conf if conf else 1.0}
-    
-    labels = ["person name", "phone number", "date of birth", "full address", "city", "state", "country"]
-    entities = ner_model.predict_entities(full_text_block, labels, threshold=0.3)
-    
-    for ent in entities:
-        lbl = ent["label"]
-        txt = ent["text"].strip()
-        score = round(ent["score"], 2)
-        coords, conf = map_to_line(txt)
-        final_conf = conf if conf > 0 else score
-        
-        key_map = {
-            "person name": "Name",
-            "phone number": "Phone",
-            "date of birth": "DOB",
-            "city": "City",
-            "state": "State",
-            "country": "Country"
-        }
-        
-        if lbl in key_map:
-            key = key_map[lbl]
-            if key not in final_output:
-                final_output[key] = {"value": txt, "coordinates": coords, "confidence_score": final_conf}
-        elif lbl == "full address":
-            if "Address" in final_output:
-                if txt not in final_output["Address"]["value"]:
-                    final_output["Address"]["value"] += ", " + txt
-            else:
-                final_output["Address"] = {"value": txt, "coordinates": coords, "confidence_score": final_conf}
-    
-    if "Name" in final_output:
-        full_name = final_output["Name"]["value"].strip()
-        coords = final_output["Name"]["coordinates"]
-        conf = final_output["Name"]["confidence_score"]
-        parts = full_name.split()
-        first_name = ""
-        middle_name = ""
-        last_name = ""
-        if len(parts) == 1:
-            first_name = parts[0]
-            last_name = ""
-        elif len(parts) == 2:
-            first_name = parts[0]
-            last_name = parts[1]
-        elif len(parts) >= 3:
-            first_name = parts[0]
-            last_name = parts[-1]
-            middle_name = " ".join(parts[1:-1])
-        
-        final_output["First Name"] = {"value": first_name, "coordinates": coords, "confidence_score": conf}
-        final_output["Middle Name"] = {"value": middle_name, "coordinates": coords, "confidence_score": conf}
-        final_output["Last Name"] = {"value": last_name, "coordinates": coords, "confidence_score": conf}
-        del final_output["Name"]
-    
-    return final_output
 
-def handwritten_extract(file_path):
-    print("==== USING UPDATED HANDWRITTEN OCR FILE ====")
-    print("file path is: ", file_path)
-    
-    print("File exists:", os.path.exists(file_path))
-    print("File size:", os.path.getsize(file_path))
-    
-    try:
-        img = Image.open(file_path)
-        print("Image loaded successfully. Size:", img.size)
-    except Exception as e:
-        print("PIL ERROR:", e)
-        return {"error": "File could not be opened by PIL"}
+class ConfidenceTracker(LogitsProcessor):
+    """
+    Running log-probability of every hypothesis generate() extends,
+    so a sequence's confidence (exp of its mean token log-prob, as
+    compute_transition_scores gave) is known at the end without
+    output_scores, which keeps a vocab-sized tensor per step and beam.
+    Only the last step's log-probs are held; the per-row sums stay
+    tensors until confidence() reads one.
+
+    Works for greedy and beam search: a row's parent is the row of the
+    previous step holding its prefix. Leaves the scores unchanged.
+    """
+
+    def __init__(self, eos_token_id):
+        self.eos = eos_token_id
+        # per step: (input_ids, sum of log-probs of each row's tokens,
+        # log-prob of EOS following each row)
+        self._steps = []
+        self._last = None  # log-probs of the last step
+
+    def __call__(self, input_ids, scores):
+        logp = scores.float().log_softmax(-1)
+        if self._steps:
+            prev_ids, prev_sums, _ = self._steps[-1]
+            same = (input_ids[:, None, :-1] == prev_ids[None, :, :]).all(-1)
+            parent = same.int().argmax(1)
+            sums = prev_sums[parent] + self._last[parent, input_ids[:, -1]]
+        else:
+            sums = logp.new_zeros(len(input_ids))
+        self._steps.append((input_ids, sums, logp[:, self.eos]))
+        self._last = logp
+        return scores
+
+    def _row(self, step, prefix):
+        if step >= len(self._steps):
+            return None
+        ids = self._steps[step][0]
+        if ids.shape[1] != len(prefix):
+            return None
+        rows = (ids == prefix.to(ids.device)).all(-1).nonzero()
+        return int(rows[0, 0]) if len(rows) else None
+
+    def confidence(self, sequence):
+        # position 0 is the decoder start token, which may equal EOS
+        eos = (sequence[1:] == self.eos).nonzero()
+        if len(eos):
+            end = int(eos[0, 0]) + 1
+            step = end - 1
+            row = self._row(step, sequence[:end])
+            if row is None:
+                return 0.0
+            _, sums, eos_logp = self._steps[step]
+            total = sums[row] + eos_logp[row]
+        else:
+            # stopped at the token budget: last token came from the last step
+            step = len(sequence) - 2
+            row = self._row(step, sequence[:-1]) if step == len(self._steps) - 1 else None
+            if row is None:
+                return 0.0
+            total = self._steps[step][1][row] + self._last[row, sequence[-1]]
+        # `step` tokens before the last one
+        return math.exp(total.item() / (step + 1))
+
+
+def recognize_line(pixel_values, box, rect, decoding=None, token_cap=None):
+    """
+    Recognise one line from its preprocessed crop (1, 3, H, W).
+    `rect` is the padded crop the budget is sized from. `decoding` is
+    a DECODING_PROFILES key (default DEFAULT_DECODING); `token_cap`
+    further limits the budget.
+    """
+    profile = DECODING_PROFILES[decoding or DEFAULT_DECODING]
+    x, y, w, h = box
+    _, _, w_new, h_new = rect
+    
+    tracker = ConfidenceTracker(processor.tokenizer.eos_token_id)
+    with stage("recognize"), torch.no_grad():
+        generated_ids = model.generate(
+            pixel_values,
+            max_new_tokens=max_new_tokens_for(w_new, h_new, profile, token_cap),
+            eos_token_id=processor.tokenizer.eos_token_id,
+            pad_token_id=processor.tokenizer.pad_token_id,
+            logits_processor=LogitsProcessorList([tracker]),
+            **profile["generation"]
+        )
+        text = processor.batch_decode(generated_ids, skip_special_tokens=True)[0]
+        try:
+            conf = tracker.confidence(generated_ids[0])
+        except:
+            conf = 0.0
     
-    ocr_lines = run_ocr_pipeline(file_path)
+    return {
+        "text": text,
+        "coordinates": [int(x), int(x+w), int(y), int(y+h)],
+        "ocr_confidence": round(conf, 4)
+    }
+
+def recognize_lines(image_rgb, boxes, decoding=None, token_cap=None):
+    """
+    Yield the recognised line for each box, in order. Crops are
+    preprocessed RECOGNITION_CHUNK at a time into one batch array.
+    """
+    img_h, img_w = image_rgb.shape[:2]
+    rects = [pad_box(box, img_w, img_h) for box in boxes]
+    
+    for start in range(0, len(rects), RECOGNITION_CHUNK):
+        chunk = rects[start:start + RECOGNITION_CHUNK]
+        with stage("preprocess"):
+            pixel_values = torch.from_numpy(line_preprocessor(image_rgb, chunk)).to(device)
+        for i, rect in enumerate(chunk):
+            yield recognize_line(pixel_values[i:i + 1], boxes[start + i], rect, decoding, token_cap)
+
+def iter_ocr_pipeline(source, tier="full", decoding=None):
+    """
+    Generator form of run_ocr_pipeline: yields ("boxes", line_boxes)
+    as soon as CRAFT is done, then ("line", line) per recognised line.
+    `decoding` is the caller's DECODING_PROFILES key; cheaper tiers
+    override it.
+    """
+    config = QUALITY_TIERS[tier]
+    capture = current_capture.get()
+    trace = capture.document() if capture is not None else None
+    
+    with stage("load"):
+        image_numpy_rgb = load_file_as_numpy_image(source)
+    if image_numpy_rgb is None:
+        if trace is not None:
+            trace.event("unreadable")
+        return
+    if trace is not None:
+        trace.image = image_numpy_rgb
+        trace.event("loaded", tier=tier, decoding=config["decoding"] or decoding)
+    
+    with stage("detect"):
+        boxes = detect_text_craft(image_numpy_rgb, long_size=config["craft_long_size"], trace=trace)
+    
+    yield "boxes", [[int(v) for v in box] for box in boxes]
+    
+    lines = recognize_lines(image_numpy_rgb, boxes, config["decoding"] or decoding, config["token_cap"])
+    for line in lines:
+        if trace is not None:
+            trace.lines.append(line)
+        yield "line", line
+    if trace is not None:
+        trace.event("recognized", lines=len(trace.lines))
+
+def run_ocr_pipeline(source, tier="full", decoding=None):
+    return [line for kind, line in iter_ocr_pipeline(source, tier, decoding) if kind == "line"]
+
+def extract_fields_with_coords(lines_data, use_ner=True):
+    # regex-only extraction when GLiNER is skipped (cheapest tier)
+    return field_extraction.extract_fields_with_coords(lines_data, ner_model if use_ner else None)
+
+def handwritten_extract(source, tier="full", decoding=None):
+    """
+    `source` is a file path, the raw file bytes or an RGB array.
+    `tier` is a key of QUALITY_TIERS, `decoding` of DECODING_PROFILES.
+    """
+    # an unreadable file yields no lines (load_file_as_numpy_image)
+    ocr_lines = run_ocr_pipeline(source, tier, decoding)
     if not ocr_lines:
         return {"error": "OCR failed or image unreadable 1"}
     
-    structured_result = extract_fields_with_coords(ocr_lines)
+    with stage("fields"):
+        structured_result = extract_fields_with_coords(ocr_lines, use_ner=QUALITY_TIERS[tier]["use_ner"])
     
     return {
         "lines": ocr_lines,
         "fields": structured_result
     }
+
+def iter_handwritten_extract(source, tier="full", decoding=None):
+    """
+    Streaming form of handwritten_extract. Yields (event, payload):
+    "boxes" after detection, one "line" per recognised line, then
+    "fields" (or "error").
+    """
+    lines = []
+    for kind, payload in iter_ocr_pipeline(source, tier, decoding):
+        if kind == "line":
+            lines.append(payload)
+        yield kind, payload
+    
+    if not lines:
+        yield "error", {"error": "OCR failed or image unreadable 1"}
+        return
+    
+    with stage("fields"):
+        fields = extract_fields_with_coords(lines, use_ner=QUALITY_TIERS[tier]["use_ner"])
+    yield "fields", fields
@@ -0,0 +1,79 @@
+"""
+Batched crop + preprocessing of text-line regions for TrOCR.
+
+Same numerics as TrOCRProcessor (ViTImageProcessor): PIL resize with
+the processor's resample filter, rescale in float64, normalize in
+float32. The resized crop is uint8, so rescale + normalize collapse
+into a 256-entry lookup per channel, written straight into one
+preallocated (N, 3, H, W) float32 batch. Crops are slices (views) of
+the page array; nothing goes through PIL except the resize itself.
+"""
+import numpy as np
+from PIL import Image
+
+LINE_PAD = 8
+
+
+def pad_box(box, img_w, img_h, pad=LINE_PAD):
+    """
+    (x, y, w, h) line box grown by `pad` on every side, clipped to
+    the image.
+    """
+    x, y, w, h = box
+    x_new = max(0, int(x) - pad)
+    y_new = max(0, int(y) - pad)
+    w_new = min(img_w - x_new, int(w) + 2 * pad)
+    h_new = min(img_h - y_new, int(h) + 2 * pad)
+    return x_new, y_new, w_new, h_new
+
+
+class LinePreprocessor:
+    def __init__(self, size=(384, 384), resample=Image.BILINEAR, rescale_factor=1 / 255,
+                 image_mean=(0.5, 0.5, 0.5), image_std=(0.5, 0.5, 0.5),
+                 do_rescale=True, do_normalize=True):
+        self.height, self.width = size
+        self.resample = resample
+
+        values = np.arange(256, dtype=np.float64)
+        if do_rescale:
+            values = values * rescale_factor
+        values = values.astype(np.float32)
+
+        self.tables = np.empty((3, 256), dtype=np.float32)
+        for c in range(3):
+            if do_normalize:
+                self.tables[c] = (values - np.float32(image_mean[c])) / np.float32(image_std[c])
+            else:
+                self.tables[c] = values
+
+    @classmethod
+    def from_processor(cls, image_processor):
+        """
+        Settings of a transformers image processor (TrOCRProcessor's
+        `.image_processor`).
+        """
+        size = image_processor.size
+        return cls(
+            size=(size["height"], size["width"]),
+            resample=image_processor.resample,
+            rescale_factor=image_processor.rescale_factor,
+            image_mean=image_processor.image_mean,
+            image_std=image_processor.image_std,
+            do_rescale=image_processor.do_rescale,
+            do_normalize=image_processor.do_normalize,
+        )
+
+    def __call__(self, image_rgb, rects, out=None):
+        """
+        Pixel values for each (x, y, w, h) rect of an RGB uint8 array,
+        as one contiguous float32 array of shape (len(rects), 3, H, W).
+        """
+        if out is None:
+            out = np.empty((len(rects), 3, self.height, self.width), dtype=np.float32)
+
+        for i, (x, y, w, h) in enumerate(rects):
+            crop = image_rgb[y:y + h, x:x + w]
+            resized = np.asarray(Image.fromarray(crop).resize((self.width, self.height), resample=self.resample))
+            for c in range(3):
+                np.take(self.tables[c], resized[..., c], out=out[i, c], mode="clip")
+        return out
@@ -0,0 +1,150 @@
+"""
+Grouping of word boxes into text lines, in reading order.
+
+Boxes join a line when they overlap it vertically and sit within a
+horizontal gap of its right end, so the columns of a two-column form
+become separate lines instead of one page-wide box. Lines are then
+ordered by recursive XY-cut: the widest whitespace gap (between
+columns or between blocks) is cut first, so a column is read top to
+bottom before the next one and a full-width title or footer stays
+where it is.
+
+Boxes are (x, y, w, h); NumPy throughout, pure functions.
+"""
+import numpy as np
+
+
+def _as_array(boxes):
+    b = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+    # to x1, y1, x2, y2
+    return np.column_stack((b[:, 0], b[:, 1], b[:, 0] + b[:, 2], b[:, 1] + b[:, 3]))
+
+
+def craft_boxes(raw_boxes, min_size=5):
+    """
+    Axis-aligned (x, y, w, h) int boxes around CRAFT's polygons,
+    dropping those no more than `min_size` pixels wide or high.
+    """
+    if len(raw_boxes) == 0:
+        return []
+    try:
+        points = np.asarray(raw_boxes, dtype=np.float64).reshape(len(raw_boxes), -1, 2).astype(int)
+        lo, hi = points.min(axis=1), points.max(axis=1)
+    except ValueError:
+        # polygons with different point counts
+        lo = np.array([np.asarray(box).astype(int).min(axis=0) for box in raw_boxes])
+        hi = np.array([np.asarray(box).astype(int).max(axis=0) for box in raw_boxes])
+
+    size = hi - lo
+    keep = (size[:, 0] > min_size) & (size[:, 1] > min_size)
+    return [
+        (int(x), int(y), int(w), int(h))
+        for (x, y), (w, h) in zip(lo[keep], size[keep])
+    ]
+
+
+def _group(b, min_overlap, max_gap):
+    """
+    Line id of every box. Sweep left to right; each box joins the
+    active line whose last box it overlaps most, if the overlap is at
+    least `min_overlap` of the smaller height and the gap to the line's
+    right end is at most `max_gap`. Lines the sweep has moved past are
+    dropped from the active set, so each box is only compared with the
+    lines around it.
+    """
+    n = len(b)
+    heights = b[:, 3] - b[:, 1]
+    labels = np.empty(n, dtype=np.int64)
+
+    # per line: right end and the y-range / height of its last box
+    right = np.empty(n)
+    top = np.empty(n)
+    bottom = np.empty(n)
+    height = np.empty(n)
+    active = np.empty(0, dtype=np.int64)
+    count = 0
+
+    for i in np.argsort(b[:, 0], kind="stable"):
+        x1, y1, x2, y2 = b[i]
+        active = active[right[active] >= x1 - max_gap]
+
+        if len(active):
+            overlap = np.minimum(y2, bottom[active]) - np.maximum(y1, top[active])
+            ok = overlap >= min_overlap * np.minimum(heights[i], height[active])
+            if ok.any():
+                line = active[np.argmax(np.where(ok, overlap, -np.inf))]
+                labels[i] = line
+                right[line] = max(right[line], x2)
+                top[line], bottom[line], height[line] = y1, y2, heights[i]
+                continue
+
+        line = count
+        count += 1
+        labels[i] = line
+        right[line], top[line], bottom[line], height[line] = x2, y1, y2, heights[i]
+        active = np.append(active, line)
+
+    return labels, count
+
+
+def _segments(start, end, idx, cut_ratio=0.8):
+    """
+    Split `idx` at the gaps left by the intervals [start, end) that
+    are nearly as wide as the widest one (evenly spaced rows are all
+    cut at once). Returns the index groups in order and the widest gap.
+    """
+    order = idx[np.argsort(start[idx], kind="stable")]
+    reach = np.maximum.accumulate(end[order])
+    gaps = start[order][1:] - reach[:-1]
+    widest = gaps.max() if len(gaps) else 0.0
+    if widest <= 0:
+        return [order], 0.0
+    cuts = np.flatnonzero(gaps >= cut_ratio * widest) + 1
+    return np.split(order, cuts), widest
+
+
+def reading_order(lines):
+    """
+    Indices of `lines` ((n, 4) x1, y1, x2, y2) in reading order.
+    """
+    ordered = []
+    stack = [np.arange(len(lines))]
+    while stack:
+        idx = stack.pop()
+        rows, row_gap = _segments(lines[:, 1], lines[:, 3], idx)
+        cols, col_gap = _segments(lines[:, 0], lines[:, 2], idx)
+
+        if len(rows) == 1 and len(cols) == 1:
+            ordered.extend(idx[np.lexsort((lines[idx, 0], lines[idx, 1]))])
+            continue
+
+        parts = cols if len(cols) > 1 and (len(rows) == 1 or col_gap >= row_gap) else rows
+        stack.extend(reversed(parts))
+    return ordered
+
+
+def group_lines(boxes, min_overlap=0.5, gap_factor=3.0):
+    """
+    Merge word boxes into line boxes, returned in reading order as
+    (x, y, w, h) ints. A box is kept on a line across horizontal gaps
+    of up to `gap_factor` times the median box height.
+    """
+    if len(boxes) == 0:
+        return []
+
+    b = _as_array(boxes)
+    max_gap = gap_factor * float(np.median(b[:, 3] - b[:, 1]))
+    labels, count = _group(b, min_overlap, max_gap)
+
+    lines = np.empty((count, 4))
+    lines[:, :2] = np.inf
+    lines[:, 2:] = -np.inf
+    np.minimum.at(lines[:, 0], labels, b[:, 0])
+    np.minimum.at(lines[:, 1], labels, b[:, 1])
+    np.maximum.at(lines[:, 2], labels, b[:, 2])
+    np.maximum.at(lines[:, 3], labels, b[:, 3])
+
+    return [
+        (int(x1), int(y1), int(x2 - x1), int(y2 - y1))
+        for x1, y1, x2, y2 in lines[reading_order(lines)]
+    ]
@@ -0,0 +1,111 @@
+"""
+Fingerprint of a document image: a 64-bit perceptual hash (DCT
+pHash), plus the chunking used to search hashes by Hamming distance.
+
+The hash keeps the signs of the lowest 8x8 DCT frequencies of a
+32x32 grey thumbnail relative to their median, so recompression,
+rescaling and small crops change only a few bits. It describes the
+page layout, not the text: two applicants' copies of the same form,
+or one form with a field changed, can hash alike. A match is a lead
+for a reviewer, never a reason to reuse OCR results.
+
+Multi-index hashing: the hash is split into CHUNKS chunks. If two
+hashes are within distance r, at least one chunk pair is within
+r // CHUNKS of each other (pigeonhole), so a search only has to look
+up the chunk values that close to the query's, one indexed lookup
+per chunk, and check the full distance of what comes back.
+"""
+import itertools
+
+import cv2
+import numpy as np
+
+HASH_BITS = 64
+CHUNKS = 4
+CHUNK_BITS = HASH_BITS // CHUNKS
+CHUNK_MASK = (1 << CHUNK_BITS) - 1
+# beyond this the per-chunk candidate sets stop being small
+MAX_RADIUS = 4 * CHUNKS - 1
+
+
+def phash(image):
+    """
+    Hash of a grey, RGB or BGR uint8 array (colour order does not
+    matter much at this size).
+    """
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+    small = cv2.resize(gray, (32, 32), interpolation=cv2.INTER_AREA).astype(np.float32)
+    low = cv2.dct(small)[:8, :8].flatten()
+    # DC term is the mean brightness, not structure
+    bits = low > np.median(low[1:])
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+def document_phash(source):
+    """
+    phash() of an uploaded proof (raw bytes or a path): the image, or
+    the first page of a PDF. None if it cannot be read.
+    """
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        data = bytes(source)
+    else:
+        with open(source, "rb") as f:
+            data = f.read()
+
+    if b"%PDF" in data[:1024]:
+        from pdf2image import convert_from_bytes
+        try:
+            # a thumbnail is all the hash needs
+            pages = convert_from_bytes(data, dpi=50, last_page=1, grayscale=True)
+        except Exception:
+            return None
+        return phash(np.asarray(pages[0])) if pages else None
+
+    # decoded at half size: the hash only looks at 32x32
+    image = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_REDUCED_GRAYSCALE_2)
+    return None if image is None else phash(image)
+
+
+def distance(a, b):
+    return bin(a ^ b).count("1")
+
+
+def chunks(h):
+    """
+    The CHUNKS chunk values of hash `h`, most significant first.
+    """
+    return tuple(
+        (h >> (CHUNK_BITS * (CHUNKS - 1 - i))) & CHUNK_MASK
+        for i in range(CHUNKS)
+    )
+
+
+def _neighbours(value, bits):
+    # every chunk value within `bits` flips of `value`
+    found = [value]
+    for k in range(1, bits + 1):
+        for positions in itertools.combinations(range(CHUNK_BITS), k):
+            flipped = value
+            for p in positions:
+                flipped ^= 1 << p
+            found.append(flipped)
+    return found
+
+
+def candidate_chunks(h, radius):
+    """
+    Per chunk, the values a hash within `radius` of `h` can have in
+    at least one chunk. A hash matching none of them is further away.
+    """
+    if not 0 <= radius <= MAX_RADIUS:
+        raise ValueError(f"radius must be between 0 and {MAX_RADIUS}")
+    return [_neighbours(value, radius // CHUNKS) for value in chunks(h)]
+
+
+def to_signed(h):
+    # for a signed 64-bit database column
+    return h - (1 << HASH_BITS) if h >= 1 << (HASH_BITS - 1) else h
+
+
+def from_signed(h):
+    return h + (1 << HASH_BITS) if h < 0 else h
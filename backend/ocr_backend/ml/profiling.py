@@ -0,0 +1,213 @@
+"""
+Per-request resource profile of the OCR pipeline.
+
+The web layer puts a Profiler in `current_profile` for the requests it
+samples; pipeline code marks its stages with `stage(name)`, which costs
+one ContextVar lookup when nothing is being profiled. Work handed to a
+thread pool keeps the profile only if it is submitted through
+contextvars.copy_context().run.
+
+Measured per stage: wall time, CPU time of the thread running it and
+RSS change. Per request: process CPU time, RSS at start and end, growth
+of the process's peak RSS, and (optionally) tracemalloc's top
+allocators and the CUDA allocator's counters. Process-wide numbers
+include whatever else the worker was doing at the same time.
+"""
+import contextvars
+import os
+import sys
+import sysconfig
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+current_profile = contextvars.ContextVar("current_profile", default=None)
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+# tracemalloc is process-wide: it runs while any sampled request wants it
+_tracing_lock = threading.Lock()
+_tracing_users = 0
+# deep enough to get from numpy/PIL/torch internals back to our code
+TRACE_FRAMES = 12
+
+# frames that are the profiler's own bookkeeping
+_IGNORED_FILES = (tracemalloc.__file__, "<frozen importlib._bootstrap>", "<frozen importlib._bootstrap_external>", "<unknown>")
+_LIBRARY_DIRS = tuple({sysconfig.get_paths()[key] for key in ("stdlib", "platstdlib", "purelib", "platlib")})
+
+
+def _rss():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except OSError:
+        return None
+
+
+def _max_rss():
+    if resource is None:
+        return None
+    # kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def _start_tracing():
+    global _tracing_users
+    with _tracing_lock:
+        _tracing_users += 1
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(TRACE_FRAMES)
+
+
+def _stop_tracing():
+    global _tracing_users
+    with _tracing_lock:
+        _tracing_users -= 1
+        if _tracing_users == 0:
+            tracemalloc.stop()
+
+
+def _short_path(filename, parts=3):
+    return "/".join(filename.replace("\\", "/").split("/")[-parts:])
+
+
+def _own_frame(traceback):
+    """
+    Innermost frame outside the standard library and installed
+    packages: the line of ours that asked for the memory.
+    """
+    for frame in reversed(traceback):
+        if not frame.filename.startswith(_LIBRARY_DIRS):
+            return frame
+    return traceback[-1]
+
+
+def _torch_stats(reset=False):
+    """
+    CUDA caching-allocator counters, or None when torch was never
+    imported or runs on CPU (the CPU allocator keeps no statistics).
+    """
+    torch = sys.modules.get("torch")
+    if torch is None or not torch.cuda.is_available() or not torch.cuda.is_initialized():
+        return None
+    if reset:
+        torch.cuda.reset_peak_memory_stats()
+        return None
+    return {
+        "allocated_bytes": torch.cuda.memory_allocated(),
+        "peak_allocated_bytes": torch.cuda.max_memory_allocated(),
+        "reserved_bytes": torch.cuda.memory_reserved(),
+        "peak_reserved_bytes": torch.cuda.max_memory_reserved(),
+    }
+
+
+class Profiler:
+    def __init__(self, top_allocators=10):
+        self.top_allocators = top_allocators
+        self._lock = threading.Lock()
+        self._stages = {}  # name -> [calls, wall s, cpu s, rss delta]
+
+    def start(self):
+        if self.top_allocators:
+            _start_tracing()
+            self._baseline = tracemalloc.take_snapshot()
+        _torch_stats(reset=True)
+        self._rss = _rss()
+        self._max_rss = _max_rss()
+        self._cpu = time.process_time()
+        self._wall = time.perf_counter()
+        return self
+
+    def add_stage(self, name, wall, cpu, rss_delta):
+        with self._lock:
+            totals = self._stages.setdefault(name, [0, 0.0, 0.0, 0])
+            totals[0] += 1
+            totals[1] += wall
+            totals[2] += cpu
+            totals[3] += rss_delta or 0
+
+    def _allocators(self):
+        snapshot = tracemalloc.take_snapshot().filter_traces(
+            [tracemalloc.Filter(False, name) for name in _IGNORED_FILES]
+        )
+        _, traced_peak = tracemalloc.get_traced_memory()
+        growth = {}  # own frame -> [bytes, blocks]
+        for stat in snapshot.compare_to(self._baseline, "traceback"):
+            frame = _own_frame(stat.traceback)
+            totals = growth.setdefault(f"{_short_path(frame.filename)}:{frame.lineno}", [0, 0])
+            totals[0] += stat.size_diff
+            totals[1] += stat.count_diff
+        top = sorted(growth.items(), key=lambda item: item[1][0], reverse=True)[:self.top_allocators]
+        return [
+            {"where": where, "size_bytes": size, "count": count}
+            for where, (size, count) in top if size > 0
+        ], traced_peak
+
+    def finish(self):
+        """
+        The compact record: totals for the request and per stage.
+        """
+        wall = time.perf_counter() - self._wall
+        cpu = time.process_time() - self._cpu
+        rss = _rss()
+
+        top, traced_peak = [], None
+        if self.top_allocators:
+            try:
+                top, traced_peak = self._allocators()
+            finally:
+                self._baseline = None
+                _stop_tracing()
+
+        with self._lock:
+            stages = {
+                name: {
+                    "calls": calls,
+                    "wall_ms": round(w * 1000, 2),
+                    "cpu_ms": round(c * 1000, 2),
+                    "rss_delta_bytes": r,
+                }
+                for name, (calls, w, c, r) in self._stages.items()
+            }
+        return {
+            "wall_ms": round(wall * 1000, 2),
+            "cpu_ms": round(cpu * 1000, 2),
+            "rss_start_bytes": self._rss,
+            "rss_end_bytes": rss,
+            "peak_rss_growth_bytes": None if self._max_rss is None else _max_rss() - self._max_rss,
+            "traced_peak_bytes": traced_peak,
+            "stages": stages,
+            "top_allocators": top,
+            "torch": _torch_stats(),
+        }
+
+
+@contextmanager
+def stage(name):
+    """
+    Attribute the enclosed work to pipeline stage `name` of the
+    request being profiled, if any. Repeated stages add up.
+    """
+    profile = current_profile.get()
+    if profile is None:
+        yield
+        return
+    rss = _rss()
+    cpu = time.thread_time()
+    wall = time.perf_counter()
+    try:
+        yield
+    finally:
+        end_rss = _rss()
+        profile.add_stage(
+            name,
+            time.perf_counter() - wall,
+            time.thread_time() - cpu,
+            end_rss - rss if rss is not None and end_rss is not None else None,
+        )
@@ -1,20 +1,17 @@
 import cv2
 import numpy as np
-from pdf2image import convert_from_path
-import tempfile
+from pdf2image import convert_from_bytes
 
 
 # -----------------------
 # PDF → IMAGE using poppler (via pdf2image)
 # -----------------------
-def pdf_to_image(django_file):
-    # Save PDF temporarily
-    with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp:
-        tmp.write(django_file.read())
-        tmp_path = tmp.name
+def pdf_to_image(source):
+    # Raw PDF bytes or a file-like object; nothing is written to disk
+    data = source if isinstance(source, (bytes, bytearray)) else source.read()
 
     # Convert first page to image
-    pages = convert_from_path(tmp_path, dpi=200)
+    pages = convert_from_bytes(bytes(data), dpi=200, first_page=1, last_page=1)
     page = pages[0]  # first page only
 
     # Convert PIL image → OpenCV BGR
@@ -0,0 +1,175 @@
+"""
+Deterministic stand-ins for the OCR models, used when
+OCR_STUB_MODELS=True. They have the call surface the pipeline uses,
+no weights and no network, and always give the same output for the
+same input. For benchmarks and load tests only; the text they
+"recognise" is not real.
+"""
+import hashlib
+
+import cv2
+import numpy as np
+
+EOS_TOKEN_ID = 2
+PAD_TOKEN_ID = 1
+_FIRST_CHAR_ID = 3
+_ALPHABET = "ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789 "
+
+
+# -------------------------------------------------------
+#               CRAFT
+# -------------------------------------------------------
+
+def get_prediction(image, craft_net=None, refine_net=None, long_size=1280, **kwargs):
+    """
+    Word polygons from dark-ink blobs: threshold, close horizontally
+    so the letters of a word join, take component bounding boxes.
+    Same result shape as craft_text_detector.get_prediction.
+    """
+    gray = cv2.cvtColor(image, cv2.COLOR_RGB2GRAY) if image.ndim == 3 else image
+    scale = min(1.0, long_size / max(gray.shape[:2]))
+    if scale < 1.0:
+        gray = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+
+    _, ink = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY_INV | cv2.THRESH_OTSU)
+    ink = cv2.morphologyEx(ink, cv2.MORPH_CLOSE, cv2.getStructuringElement(cv2.MORPH_RECT, (9, 3)))
+    count, _, stats, _ = cv2.connectedComponentsWithStats(ink)
+
+    boxes = []
+    for x, y, w, h, _ in stats[1:count]:
+        x1, y1, x2, y2 = np.array([x, y, x + w, y + h]) / scale
+        boxes.append(np.array([[x1, y1], [x2, y1], [x2, y2], [x1, y2]], dtype=np.float32))
+    return {"boxes": boxes, "polys": boxes, "heatmaps": {}}
+
+
+class StubCraftNet:
+    def eval(self):
+        return self
+
+    def requires_grad_(self, flag=True):
+        return self
+
+
+# -------------------------------------------------------
+#               TrOCR
+# -------------------------------------------------------
+
+class StubImageProcessor:
+    size = {"height": 384, "width": 384}
+    resample = 2  # PIL bilinear, as TrOCR
+    rescale_factor = 1 / 255
+    image_mean = [0.5, 0.5, 0.5]
+    image_std = [0.5, 0.5, 0.5]
+    do_rescale = True
+    do_normalize = True
+
+
+class StubTokenizer:
+    eos_token_id = EOS_TOKEN_ID
+    pad_token_id = PAD_TOKEN_ID
+
+
+class StubTrOCRProcessor:
+    def __init__(self):
+        self.image_processor = StubImageProcessor()
+        self.tokenizer = StubTokenizer()
+
+    def batch_decode(self, sequences, skip_special_tokens=True):
+        texts = []
+        for ids in sequences.tolist():
+            chars = [
+                _ALPHABET[(i - _FIRST_CHAR_ID) % len(_ALPHABET)]
+                for i in ids if i >= _FIRST_CHAR_ID or not skip_special_tokens
+            ]
+            texts.append("".join(chars).strip())
+        return texts
+
+
+class StubTrOCRModel:
+    """
+    Greedy decoder over a tiny vocabulary. Sequence length and tokens
+    derive from a hash of the pixels; logits processors (confidence
+    tracking) are called at every step like generate() does.
+    """
+    vocab_size = _FIRST_CHAR_ID + len(_ALPHABET)
+
+    def eval(self):
+        return self
+
+    def requires_grad_(self, flag=True):
+        return self
+
+    def to(self, device):
+        return self
+
+    def generate(self, pixel_values, max_new_tokens=20, eos_token_id=EOS_TOKEN_ID,
+                 pad_token_id=PAD_TOKEN_ID, logits_processor=None, **kwargs):
+        import torch
+
+        rows = []
+        for values in pixel_values:
+            digest = hashlib.sha1(values.cpu().numpy().tobytes()).digest()
+            length = min(max_new_tokens, 4 + digest[0] % 12)
+            rows.append([_FIRST_CHAR_ID + b % len(_ALPHABET) for b in digest[1:length]] + [eos_token_id])
+
+        ids = torch.full((len(rows), 1), eos_token_id, dtype=torch.long)  # decoder start
+        done = torch.zeros(len(rows), dtype=torch.bool)
+        for step in range(max(len(r) for r in rows)):
+            scores = torch.zeros(len(rows), self.vocab_size)
+            for r, row in enumerate(rows):
+                scores[r, row[min(step, len(row) - 1)]] = 4.0
+            if logits_processor is not None:
+                scores = logits_processor(ids, scores)
+            next_ids = scores.argmax(-1)
+            next_ids[done] = pad_token_id
+            ids = torch.cat([ids, next_ids[:, None]], dim=1)
+            done |= next_ids == eos_token_id
+            if done.all():
+                break
+        return ids
+
+
+# -------------------------------------------------------
+#               YOLO (Aadhaar detector)
+# -------------------------------------------------------
+
+class _StubResult:
+    def __init__(self, boxes):
+        self.boxes = boxes
+
+
+class StubYOLO:
+    """
+    "Detects" an Aadhaar on images whose pixel hash is even, so a
+    corpus gets a stable mix of positives and negatives.
+    """
+
+    def eval(self):
+        return self
+
+    def requires_grad_(self, flag=True):
+        return self
+
+    def predict(self, source, conf=0.25, imgsz=640, verbose=True, **kwargs):
+        pixels = np.asarray(source)
+        found = hashlib.sha1(pixels.tobytes()).digest()[0] % 2 == 0
+        return [_StubResult([[0, 0, pixels.shape[1], pixels.shape[0]]] if found else [])]
+
+
+# -------------------------------------------------------
+#               GLiNER
+# -------------------------------------------------------
+
+class StubNER:
+    """
+    No entities: field extraction falls back to its regex rules.
+    """
+
+    def eval(self):
+        return self
+
+    def requires_grad_(self, flag=True):
+        return self
+
+    def predict_entities(self, text, labels, threshold=0.5):
+        return []
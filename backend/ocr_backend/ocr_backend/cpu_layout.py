@@ -0,0 +1,134 @@
+"""
+CPU layout for model-serving workers.
+
+Each worker gets a disjoint set of physical cores (with their SMT
+siblings), is pinned to them, and runs torch / OpenCV / BLAS with one
+intra-op thread per physical core it owns. Without this every worker
+starts one thread per core of the whole node and they fight over them.
+
+Used by gunicorn.conf.py (multi-worker) and by wsgi.py / asgi.py
+(single process). Must not import Django.
+"""
+import os
+import sys
+
+THREAD_ENV_VARS = (
+    "OMP_NUM_THREADS",
+    "MKL_NUM_THREADS",
+    "OPENBLAS_NUM_THREADS",
+    "NUMEXPR_NUM_THREADS",
+    "VECLIB_MAXIMUM_THREADS",
+)
+
+# set by the launcher for each worker, read back by wsgi/asgi
+WORKER_CPUS_ENV = "OCR_WORKER_CPUS"
+WORKER_THREADS_ENV = "OCR_WORKER_THREADS"
+
+
+def available_cpus():
+    try:
+        return sorted(os.sched_getaffinity(0))
+    except AttributeError:
+        return list(range(os.cpu_count() or 1))
+
+
+def physical_cores(cpus):
+    """
+    Group logical CPUs into physical cores using the SMT sibling
+    lists in sysfs; without sysfs every CPU is its own core.
+    """
+    cores = {}
+    for cpu in cpus:
+        path = f"/sys/devices/system/cpu/cpu{cpu}/topology/thread_siblings_list"
+        try:
+            with open(path) as f:
+                key = f.read().strip()
+        except OSError:
+            key = str(cpu)
+        cores.setdefault(key, []).append(cpu)
+    return list(cores.values())
+
+
+def plan_layout(workers=None, cores_per_worker=None, cpus=None):
+    """
+    Split the available physical cores across `workers` workers
+    (default: one worker per `cores_per_worker` cores, from
+    OCR_CORES_PER_WORKER, default 4). Returns one
+    {"worker", "cpus", "threads"} dict per worker.
+    """
+    cores = physical_cores(cpus or available_cpus())
+    if workers is None:
+        cores_per_worker = cores_per_worker or int(os.getenv("OCR_CORES_PER_WORKER", "4"))
+        workers = max(1, len(cores) // cores_per_worker)
+
+    layout = []
+    if workers > len(cores):
+        # more workers than cores: share every core, one thread each
+        all_cpus = sorted(c for core in cores for c in core)
+        return [{"worker": i, "cpus": all_cpus, "threads": 1} for i in range(workers)]
+
+    base, extra = divmod(len(cores), workers)
+    start = 0
+    for i in range(workers):
+        n = base + (1 if i < extra else 0)
+        share = cores[start:start + n]
+        start += n
+        layout.append({
+            "worker": i,
+            "cpus": sorted(c for core in share for c in core),
+            "threads": len(share),
+        })
+    return layout
+
+
+def describe(layout):
+    lines = [f"OCR worker layout: {len(layout)} worker(s) on {len(available_cpus())} CPU(s)"]
+    for slot in layout:
+        lines.append(f"  worker {slot['worker']}: cpus={slot['cpus']} threads={slot['threads']}")
+    return "\n".join(lines)
+
+
+def apply_thread_budget(threads, cpus=None):
+    """
+    Pin this process to `cpus` and cap torch / OpenCV / BLAS at
+    `threads` intra-op threads.
+    """
+    if cpus and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, cpus)
+
+    for var in THREAD_ENV_VARS:
+        os.environ[var] = str(threads)
+    os.environ[WORKER_THREADS_ENV] = str(threads)
+    if cpus:
+        os.environ[WORKER_CPUS_ENV] = ",".join(str(c) for c in cpus)
+
+    try:
+        import cv2
+        cv2.setNumThreads(threads)
+    except ImportError:
+        pass
+
+    # torch reads OMP_NUM_THREADS when imported; if it already is
+    # (preloaded master), set it directly
+    torch = sys.modules.get("torch")
+    if torch is not None:
+        torch.set_num_threads(threads)
+        try:
+            torch.set_num_interop_threads(1)
+        except RuntimeError:
+            # only allowed before the first inter-op parallel call
+            pass
+
+
+def apply_from_env():
+    """
+    Apply the budget chosen by the launcher, or, for a single
+    process, use all physical cores it may run on.
+    """
+    threads = os.getenv(WORKER_THREADS_ENV)
+    if threads:
+        cpus = os.getenv(WORKER_CPUS_ENV)
+        apply_thread_budget(int(threads), [int(c) for c in cpus.split(",")] if cpus else None)
+        return
+
+    apply_thread_budget(len(physical_cores(available_cpus())))
@@ -0,0 +1,127 @@
+"""
+Copy-on-write model sharing for forked workers.
+
+With OCR_PRELOAD_MODELS=True the gunicorn master imports the ML modules
+(which load their models at import time), switches every torch module
+to inference-only state and freezes the Python heap, then forks.
+Workers map the same physical pages; as long as nothing writes to the
+weights (no autograd, no train mode) and the GC does not touch the
+preloaded objects, those pages stay shared.
+
+memory_usage() / worker_pids() read /proc to report how much of each
+worker is actually shared. Must not import Django.
+"""
+import gc
+import importlib
+import os
+import sys
+import tempfile
+
+DEFAULT_PRELOAD_MODULES = "ml.handwritten_ocr,ml.aadhaar_detector"
+
+
+def _torch_modules(module):
+    torch = sys.modules.get("torch")
+    if torch is None:
+        return []
+    return [value for value in vars(module).values() if isinstance(value, torch.nn.Module)]
+
+
+def freeze_for_inference(module):
+    """
+    Put every torch model held at module level into eval mode with
+    gradients off, so nothing writes to the shared weight pages.
+    Returns the number of models frozen.
+    """
+    models = _torch_modules(module)
+    for model in models:
+        model.eval()
+        model.requires_grad_(False)
+    return len(models)
+
+
+def preload_models(module_names=None, log=print):
+    """
+    Import the model modules in this (master) process and freeze them.
+    A module that fails to import is logged and skipped; workers will
+    then load it themselves on first use.
+    """
+    names = module_names or os.getenv("OCR_PRELOAD_MODULES", DEFAULT_PRELOAD_MODULES)
+    loaded = []
+    for name in filter(None, (n.strip() for n in names.split(","))):
+        try:
+            module = importlib.import_module(name)
+        except Exception as e:
+            log(f"preload: {name} failed: {e}")
+            continue
+        count = freeze_for_inference(module)
+        loaded.append(name)
+        log(f"preload: {name} ({count} model(s) frozen)")
+
+    # Objects allocated so far go to the permanent generation: the
+    # collector in the workers will not write to their headers and
+    # un-share the pages they live on.
+    gc.collect()
+    gc.freeze()
+    return loaded
+
+
+# -------------------------------------------------------
+#               MEMORY REPORT
+# -------------------------------------------------------
+
+def pidfile_path():
+    """
+    The gunicorn master's pidfile: OCR_PIDFILE, else a file in the
+    runtime directory ($XDG_RUNTIME_DIR, or the temp directory).
+    """
+    runtime_dir = os.getenv("XDG_RUNTIME_DIR") or tempfile.gettempdir()
+    return os.getenv("OCR_PIDFILE") or os.path.join(runtime_dir, "ocr_backend-gunicorn.pid")
+
+
+def memory_usage(pid="self"):
+    """
+    {"rss", "pss", "shared", "unique"} in bytes for a process, from
+    /proc/<pid>/smaps_rollup; None where that is not available.
+    `unique` is memory only this process maps (USS), `shared` is
+    mapped by others too (e.g. preloaded weights).
+    """
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            return parse_smaps_rollup(f)
+    except OSError:
+        return None
+
+
+def parse_smaps_rollup(lines):
+    """
+    memory_usage() for the lines of an smaps_rollup file.
+    """
+    fields = {}
+    for line in lines:
+        parts = line.split()
+        if len(parts) == 3 and parts[2] == "kB":
+            fields[parts[0].rstrip(":")] = int(parts[1]) * 1024
+
+    return {
+        "rss": fields.get("Rss", 0),
+        "pss": fields.get("Pss", 0),
+        "shared": fields.get("Shared_Clean", 0) + fields.get("Shared_Dirty", 0),
+        "unique": fields.get("Private_Clean", 0) + fields.get("Private_Dirty", 0),
+    }
+
+
+def worker_pids(master_pid):
+    pids = []
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                # the command name may contain spaces; ppid follows ")"
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        if ppid == master_pid:
+            pids.append(int(entry))
+    return sorted(pids)
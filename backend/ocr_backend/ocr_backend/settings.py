@@ -12,6 +12,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 
 from pathlib import Path
 import os
+import tempfile
 from dotenv import load_dotenv
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -65,6 +66,8 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'verify_user.profiling.ProfilingMiddleware',
+    'verify_user.debug_capture.DebugCaptureMiddleware',
 ]
 
 ROOT_URLCONF = 'ocr_backend.urls'
@@ -90,10 +93,12 @@ WSGI_APPLICATION = 'ocr_backend.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# OCR_DATABASE_PATH points at another SQLite file (load tests run on a
+# throwaway one)
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'NAME': os.getenv('OCR_DATABASE_PATH', str(BASE_DIR / 'db.sqlite3')),
     }
 }
 
@@ -135,6 +140,87 @@ EMAIL_PORT=587
 EMAIL_HOST_USER=os.getenv('SMTP_USER')
 EMAIL_HOST_PASSWORD=os.getenv('SMTP_PASS')
 
+# Email outbox (verify_user/outbox.py): mail is stored and sent by one
+# background thread per process, up to OCR_OUTBOX_BATCH messages per
+# pass over one SMTP connection kept open for OCR_OUTBOX_IDLE_SECONDS.
+# Failed messages are retried after OCR_OUTBOX_RETRY_DELAY seconds,
+# doubling, and given up after OCR_OUTBOX_MAX_ATTEMPTS attempts.
+OCR_OUTBOX_BATCH=int(os.getenv('OCR_OUTBOX_BATCH','50'))
+OCR_OUTBOX_POLL_SECONDS=float(os.getenv('OCR_OUTBOX_POLL_SECONDS','5'))
+OCR_OUTBOX_IDLE_SECONDS=float(os.getenv('OCR_OUTBOX_IDLE_SECONDS','60'))
+OCR_OUTBOX_RETRY_DELAY=float(os.getenv('OCR_OUTBOX_RETRY_DELAY','5'))
+OCR_OUTBOX_MAX_ATTEMPTS=int(os.getenv('OCR_OUTBOX_MAX_ATTEMPTS','6'))
+OCR_OUTBOX_LEASE_SECONDS=float(os.getenv('OCR_OUTBOX_LEASE_SECONDS','120'))
+
+# Background OCR enrichment of new PassportRecords
+OCR_BACKGROUND_ENRICHMENT=os.getenv('OCR_BACKGROUND_ENRICHMENT','True')=='True'
+OCR_BACKGROUND_WORKERS=int(os.getenv('OCR_BACKGROUND_WORKERS','1'))
+# a record PROCESSING for longer was left by a crash or restart and
+# is enriched again (tasks.enrich_passport_record, enrich_records)
+OCR_ENRICH_STALE_SECONDS=int(os.getenv('OCR_ENRICH_STALE_SECONDS','1800'))
+
+# Model-call pool behind the async (ASGI) endpoints
+OCR_INFERENCE_WORKERS=int(os.getenv('OCR_INFERENCE_WORKERS','2'))
+
+# Admission control (verify_user/admission.py): per-endpoint
+# (concurrent requests, queued requests). Beyond that -> 429.
+OCR_ADMISSION_LIMITS={
+    'aadhar_ocr':(2,8),
+    'handwritten_ocr':(2,8),
+    'verify_documents':(1,4),
+    'aadhaar_detect':(4,16),
+    'quality_score':(8,32),
+}
+OCR_REQUEST_DEADLINE=float(os.getenv('OCR_REQUEST_DEADLINE','60'))
+OCR_RETRY_AFTER=int(os.getenv('OCR_RETRY_AFTER','5'))
+
+# Load-adaptive quality tiers (verify_user/degradation.py): step down
+# when any queue or latency goes over *_HIGH, back up when all are
+# under *_LOW, at most once per OCR_DEGRADE_MIN_DWELL seconds.
+OCR_DEGRADATION_ENABLED=os.getenv('OCR_DEGRADATION_ENABLED','True')=='True'
+OCR_DEGRADE_QUEUE_HIGH=int(os.getenv('OCR_DEGRADE_QUEUE_HIGH','4'))
+OCR_DEGRADE_QUEUE_LOW=int(os.getenv('OCR_DEGRADE_QUEUE_LOW','1'))
+OCR_DEGRADE_LATENCY_HIGH=float(os.getenv('OCR_DEGRADE_LATENCY_HIGH','20'))
+OCR_DEGRADE_LATENCY_LOW=float(os.getenv('OCR_DEGRADE_LATENCY_LOW','8'))
+OCR_DEGRADE_LATENCY_WINDOW=float(os.getenv('OCR_DEGRADE_LATENCY_WINDOW','30'))
+OCR_DEGRADE_MIN_DWELL=float(os.getenv('OCR_DEGRADE_MIN_DWELL','10'))
+
+# TrOCR decoding profile per endpoint ('beam' or 'greedy', see
+# ml/handwritten_ocr.py DECODING_PROFILES). Degraded tiers use greedy.
+OCR_DECODING_PROFILES={
+    'handwritten_ocr':os.getenv('OCR_DECODING_HANDWRITTEN','beam'),
+    'verify_documents':os.getenv('OCR_DECODING_VERIFY','beam'),
+}
+
+# Sampled request profiling (verify_user/profiling.py); 0 = off.
+# Tracing allocations slows the whole worker while a sampled request
+# runs; OCR_PROFILE_TOP_ALLOCATORS=0 skips it.
+OCR_PROFILE_SAMPLE_RATE=float(os.getenv('OCR_PROFILE_SAMPLE_RATE','0'))
+OCR_PROFILE_PATH_PREFIX=os.getenv('OCR_PROFILE_PATH_PREFIX','/api/')
+OCR_PROFILE_TOP_ALLOCATORS=int(os.getenv('OCR_PROFILE_TOP_ALLOCATORS','10'))
+OCR_PROFILE_KEEP=int(os.getenv('OCR_PROFILE_KEEP','500'))
+
+# Debug capture (verify_user/debug_capture.py): box overlays, line crops
+# and a JSON trace for OCR_DEBUG_SAMPLE_RATE of the requests, or for any
+# sent with X-OCR-Debug: <OCR_DEBUG_TOKEN> (no token = header ignored).
+# Captures hold applicant documents: keep OCR_DEBUG_DIR private.
+OCR_DEBUG_SAMPLE_RATE=float(os.getenv('OCR_DEBUG_SAMPLE_RATE','0'))
+OCR_DEBUG_TOKEN=os.getenv('OCR_DEBUG_TOKEN','')
+OCR_DEBUG_DIR=os.getenv('OCR_DEBUG_DIR',str(BASE_DIR/'debug_captures'))
+OCR_DEBUG_MAX_CAPTURES=int(os.getenv('OCR_DEBUG_MAX_CAPTURES','200'))
+OCR_DEBUG_MAX_BYTES=int(os.getenv('OCR_DEBUG_MAX_BYTES',str(512*1024*1024)))
+OCR_DEBUG_MAX_AGE_HOURS=float(os.getenv('OCR_DEBUG_MAX_AGE_HOURS','72'))
+
+# Near-duplicate proofs (verify_user/duplicates.py): uploads whose
+# perceptual hashes differ in at most OCR_NEAR_DUPLICATE_DISTANCE of 64
+# bits are reported as near duplicates. Reported only: OCR lines are
+# reused for byte-identical uploads alone.
+OCR_NEAR_DUPLICATE_DISTANCE=int(os.getenv('OCR_NEAR_DUPLICATE_DISTANCE','10'))
+
+# Record search (verify_user/search.py): SQLite FTS5 by default;
+# verify_user.search.SubstringBackend on databases without FTS5.
+OCR_SEARCH_BACKEND=os.getenv('OCR_SEARCH_BACKEND','verify_user.search.FTS5Backend')
+
 
 # Static files (CSS, JavaScript, Images)
 # https://docs.djangoproject.com/en/5.2/howto/static-files/
@@ -143,7 +229,23 @@ STATIC_URL = 'static/'
 STATIC_ROOT = BASE_DIR / 'staticfiles'
 
 MEDIA_URL = '/media/'
-MEDIA_ROOT = BASE_DIR / 'media'
+MEDIA_ROOT = os.getenv('OCR_MEDIA_ROOT', str(BASE_DIR / 'media'))
+
+# Upload spool: uploads up to UPLOAD_SPOOL_MAX_MEMORY stay in RAM, larger
+# ones go to UPLOAD_SPOOL_DIR (tmpfs when available), capped at
+# UPLOAD_SPOOL_MAX_DISK bytes in flight. See verify_user/spool.py.
+_DEFAULT_SPOOL_ROOT='/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir()
+UPLOAD_SPOOL_DIR=os.getenv('UPLOAD_SPOOL_DIR',os.path.join(_DEFAULT_SPOOL_ROOT,'ocr_spool'))
+UPLOAD_SPOOL_MAX_MEMORY=int(os.getenv('UPLOAD_SPOOL_MAX_MEMORY',str(8*1024*1024)))
+UPLOAD_SPOOL_MAX_DISK=int(os.getenv('UPLOAD_SPOOL_MAX_DISK',str(512*1024*1024)))
+FILE_UPLOAD_MAX_MEMORY_SIZE=UPLOAD_SPOOL_MAX_MEMORY
+FILE_UPLOAD_TEMP_DIR=UPLOAD_SPOOL_DIR
+
+# URL ingestion (verify_user/fetch.py)
+URL_FETCH_MAX_BYTES=int(os.getenv('URL_FETCH_MAX_BYTES',str(20*1024*1024)))
+URL_FETCH_CONNECT_TIMEOUT=float(os.getenv('URL_FETCH_CONNECT_TIMEOUT','5'))
+URL_FETCH_READ_TIMEOUT=float(os.getenv('URL_FETCH_READ_TIMEOUT','30'))
+URL_FETCH_POOL_SIZE=int(os.getenv('URL_FETCH_POOL_SIZE','16'))
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
@@ -159,16 +261,37 @@ cloudinary.config(
     api_secret=os.getenv("CLOUDINARY_API_SECRET"),
 )
 
+# OCR_LOCAL_MEDIA=True keeps uploads in MEDIA_ROOT instead of
+# Cloudinary (offline runs, load tests)
+OCR_LOCAL_MEDIA=os.getenv('OCR_LOCAL_MEDIA','False')=='True'
+_MEDIA_BACKEND=(
+    "django.core.files.storage.FileSystemStorage" if OCR_LOCAL_MEDIA
+    else "cloudinary_storage.storage.MediaCloudinaryStorage"
+)
+
+# Staged uploads (verify_user/storage.py): proofs are written to
+# OCR_STAGING_DIR during the request and uploaded to the remote
+# backend by OCR_UPLOAD_WORKERS background threads, each file retried
+# OCR_UPLOAD_RETRIES times with backoff from OCR_UPLOAD_RETRY_DELAY
+# seconds. Keep OCR_STAGING_DIR on persistent disk shared by every
+# worker; staged files have no URL until they are uploaded.
+OCR_STAGE_UPLOADS=os.getenv('OCR_STAGE_UPLOADS','True')=='True' and not OCR_LOCAL_MEDIA
+OCR_MEDIA_REMOTE_BACKEND=_MEDIA_BACKEND
+OCR_STAGING_DIR=os.getenv('OCR_STAGING_DIR',str(BASE_DIR/'media_staging'))
+OCR_UPLOAD_WORKERS=int(os.getenv('OCR_UPLOAD_WORKERS','4'))
+OCR_UPLOAD_RETRIES=int(os.getenv('OCR_UPLOAD_RETRIES','5'))
+OCR_UPLOAD_RETRY_DELAY=float(os.getenv('OCR_UPLOAD_RETRY_DELAY','2'))
+
 STORAGES = {
     "staticfiles": {
         "BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage",
     },
     "default": {
-        "BACKEND": "cloudinary_storage.storage.MediaCloudinaryStorage",
+        "BACKEND": "verify_user.storage.StagedStorage" if OCR_STAGE_UPLOADS else _MEDIA_BACKEND,
     },
 }
 
-DEFAULT_FILE_STORAGE = "cloudinary_storage.storage.MediaCloudinaryStorage"
+DEFAULT_FILE_STORAGE = _MEDIA_BACKEND
 
 CLOUDINARY_STORAGE = {
     "CLOUD_NAME": os.getenv("CLOUDINARY_CLOUD_NAME"),
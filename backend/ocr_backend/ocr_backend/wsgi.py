@@ -11,6 +11,11 @@ import os
 
 from django.core.wsgi import get_wsgi_application
 
+from ocr_backend.cpu_layout import apply_from_env
+
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ocr_backend.settings')
 
+# thread budget / CPU pinning, before any model library is imported
+apply_from_env()
+
 application = get_wsgi_application()
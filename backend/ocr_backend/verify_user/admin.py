@@ -1,5 +1,6 @@
 from django.contrib import admin
-from .models import PassportRecord
+from . import search
+from .models import PassportRecord, RequestProfile
 
 @admin.register(PassportRecord)
 class PassportRecordAdmin(admin.ModelAdmin):
@@ -9,14 +10,29 @@ class PassportRecordAdmin(admin.ModelAdmin):
         "dob",
         "gender",
         "present_city",
+        "ocr_status",
+        "verification_outcome",
         "created_at",
     )
 
+    # shows the search box; get_search_results() answers it from the index
     search_fields = (
         "first_name",
         "last_name",
         "present_city",
-        "passport_number",
     )
 
-    list_filter = ("gender", "present_state", "created_at")
+    list_filter = ("status", "present_state", "verification_outcome", "ocr_status", "gender", "created_at")
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term.strip():
+            return queryset, False
+        ids = [record_id for record_id, _ in search.get_backend().search(search_term, limit=search.MAX_RESULTS)]
+        return queryset.filter(id__in=ids), False
+
+
+@admin.register(RequestProfile)
+class RequestProfileAdmin(admin.ModelAdmin):
+    list_display = ("method", "path", "status_code", "wall_ms", "cpu_ms", "peak_rss_growth_bytes", "created_at")
+    list_filter = ("method", "created_at")
+    readonly_fields = [f.name for f in RequestProfile._meta.fields]
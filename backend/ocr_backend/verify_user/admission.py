@@ -0,0 +1,264 @@
+"""
+Admission control for the ML endpoints.
+
+Each endpoint gets a gate allowing `limit` requests to run at once
+and `queue` more to wait. Anything beyond that is shed immediately
+with 429 + Retry-After; waiters whose deadline passes get 503.
+"""
+import asyncio
+import collections
+import contextvars
+import functools
+import threading
+import time
+
+from django.conf import settings
+from django.http import JsonResponse
+from rest_framework.response import Response
+
+from . import metrics
+
+# monotonic deadline of the request being served, read by run_inference
+current_deadline = contextvars.ContextVar("current_deadline", default=None)
+
+
+class AdmissionRejected(Exception):
+    """
+    The endpoint's wait queue is full.
+    """
+
+
+class AdmissionTimeout(Exception):
+    """
+    The request's deadline passed while it was queued.
+    """
+
+
+class _Waiter:
+    def __init__(self):
+        self.granted = False
+        self._event = threading.Event()
+
+    def grant(self):
+        self.granted = True
+        self._event.set()
+
+    def wait(self, timeout):
+        return self._event.wait(timeout)
+
+
+class _AsyncWaiter:
+    def __init__(self):
+        self.granted = False
+        self._loop = asyncio.get_running_loop()
+        self.future = self._loop.create_future()
+
+    def grant(self):
+        self.granted = True
+        self._loop.call_soon_threadsafe(self._resolve)
+
+    def _resolve(self):
+        if not self.future.done():
+            self.future.set_result(True)
+
+
+class AdmissionGate:
+    def __init__(self, name, limit, queue):
+        self.name = name
+        self.limit = limit
+        self.queue = queue
+        self._lock = threading.Lock()
+        self._active = 0
+        self._waiters = collections.deque()
+        # exponentially weighted request latency (queue wait + work), seconds
+        self.latency_ewma = 0.0
+        self.last_observed = 0.0
+
+    @property
+    def queued(self):
+        return len(self._waiters)
+
+    def observe_latency(self, seconds, alpha=0.2):
+        with self._lock:
+            self.latency_ewma += alpha * (seconds - self.latency_ewma)
+            self.last_observed = time.monotonic()
+        metrics.set_gauge(f"admission.{self.name}.latency_ewma", round(self.latency_ewma, 3))
+
+    def _publish(self):
+        metrics.set_gauge(f"admission.{self.name}.active", self._active)
+        metrics.set_gauge(f"admission.{self.name}.queued", len(self._waiters))
+        metrics.track_max(f"admission.{self.name}.queued_peak", len(self._waiters))
+
+    def _enter(self, make_waiter):
+        """
+        Take a slot now (returns None) or join the queue (returns the
+        waiter). Raises AdmissionRejected when the queue is full.
+        """
+        with self._lock:
+            if self._active < self.limit and not self._waiters:
+                self._active += 1
+                self._publish()
+                metrics.inc(f"admission.{self.name}.admitted_total")
+                return None
+            if len(self._waiters) >= self.queue:
+                metrics.inc(f"admission.{self.name}.rejected_total")
+                raise AdmissionRejected(self.name)
+            waiter = make_waiter()
+            self._waiters.append(waiter)
+            self._publish()
+            return waiter
+
+    def _abandon(self, waiter):
+        """
+        Leave the queue; True if a slot was granted in the meantime.
+        """
+        with self._lock:
+            if waiter.granted:
+                return True
+            self._waiters.remove(waiter)
+            self._publish()
+            metrics.inc(f"admission.{self.name}.timeout_total")
+            return False
+
+    def acquire(self, deadline):
+        waiter = self._enter(_Waiter)
+        if waiter is None:
+            return
+        if waiter.wait(max(0.0, deadline - time.monotonic())) or self._abandon(waiter):
+            metrics.inc(f"admission.{self.name}.admitted_total")
+            return
+        raise AdmissionTimeout(self.name)
+
+    async def acquire_async(self, deadline):
+        waiter = self._enter(_AsyncWaiter)
+        if waiter is None:
+            return
+        try:
+            done, _ = await asyncio.wait({waiter.future}, timeout=max(0.0, deadline - time.monotonic()))
+        except asyncio.CancelledError:
+            # client went away while queued
+            if self._abandon(waiter):
+                self.release()
+            raise
+        if done or self._abandon(waiter):
+            metrics.inc(f"admission.{self.name}.admitted_total")
+            return
+        raise AdmissionTimeout(self.name)
+
+    def release(self):
+        with self._lock:
+            if self._waiters:
+                # hand the slot straight to the oldest waiter
+                self._waiters.popleft().grant()
+            else:
+                self._active -= 1
+            self._publish()
+
+
+_gates = {}
+_gates_lock = threading.Lock()
+
+
+def all_gates():
+    with _gates_lock:
+        return list(_gates.values())
+
+
+def get_gate(name):
+    with _gates_lock:
+        if name not in _gates:
+            limit, queue = settings.OCR_ADMISSION_LIMITS[name]
+            _gates[name] = AdmissionGate(name, limit, queue)
+        return _gates[name]
+
+
+class _ReleaseOnClose:
+    # Django calls close() on streaming content when the response ends,
+    # whether or not the client read it all.
+    def __init__(self, iterable, release):
+        self._iterable = iterable
+        self._release = release
+
+    def __iter__(self):
+        return iter(self._iterable)
+
+    def close(self):
+        if self._release:
+            self._release()
+            self._release = None
+
+
+def _busy(name, status, response_class):
+    body = {"error": f"Server busy ({name}), retry later"}
+    response = response_class(body, status=status)
+    response["Retry-After"] = str(settings.OCR_RETRY_AFTER)
+    return response
+
+
+def admission_controlled(name):
+    """
+    Run the decorated view (sync DRF or async Django) under the
+    `name` gate with a per-request deadline of OCR_REQUEST_DEADLINE.
+    """
+    def decorator(view):
+        if asyncio.iscoroutinefunction(view):
+            @functools.wraps(view)
+            async def async_wrapper(*args, **kwargs):
+                gate = get_gate(name)
+                started = time.monotonic()
+                deadline = started + settings.OCR_REQUEST_DEADLINE
+                try:
+                    await gate.acquire_async(deadline)
+                except AdmissionRejected:
+                    return _busy(name, 429, JsonResponse)
+                except AdmissionTimeout:
+                    return _busy(name, 503, JsonResponse)
+
+                token = current_deadline.set(deadline)
+                try:
+                    return await view(*args, **kwargs)
+                except AdmissionTimeout:
+                    # dropped by run_inference after the deadline
+                    return _busy(name, 503, JsonResponse)
+                finally:
+                    current_deadline.reset(token)
+                    gate.release()
+                    gate.observe_latency(time.monotonic() - started)
+
+            return async_wrapper
+
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            gate = get_gate(name)
+            started = time.monotonic()
+            deadline = started + settings.OCR_REQUEST_DEADLINE
+            try:
+                gate.acquire(deadline)
+            except AdmissionRejected:
+                return _busy(name, 429, Response)
+            except AdmissionTimeout:
+                return _busy(name, 503, Response)
+
+            def done():
+                gate.release()
+                gate.observe_latency(time.monotonic() - started)
+
+            token = current_deadline.set(deadline)
+            try:
+                response = view(*args, **kwargs)
+            except BaseException:
+                done()
+                raise
+            finally:
+                current_deadline.reset(token)
+
+            if getattr(response, "streaming", False):
+                # keep the slot until the stream is finished
+                response.streaming_content = _ReleaseOnClose(response.streaming_content, done)
+            else:
+                done()
+            return response
+
+        return wrapper
+
+    return decorator
@@ -1,6 +1,15 @@
+import os
+
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class VerifyUserConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'verify_user'
+
+    def ready(self):
+        os.makedirs(settings.UPLOAD_SPOOL_DIR, exist_ok=True)
+
+        from .search import connect_signals
+        connect_signals()
@@ -0,0 +1,168 @@
+"""
+Async (ASGI) variants of the upload/OCR endpoints.
+
+Under ASGI, Django reads the request body on the event loop and URL
+downloads use httpx, so slow clients only hold a coroutine. Model
+calls go to the bounded pool in inference.py.
+"""
+import functools
+import json
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.exceptions import BadRequest
+from django.http import JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
+
+from . import degradation
+from .admission import admission_controlled
+from .inference import run_inference
+from .spool import spool, SpoolFull
+
+
+async def _form(request):
+    """
+    (data, files) for a JSON or multipart request. Multipart parsing
+    may spill to disk, so it runs off the loop. Raises BadRequest for a
+    body that is not a JSON object.
+    """
+    if request.content_type == "application/json":
+        try:
+            data = json.loads(request.body or b"{}")
+        except ValueError:
+            raise BadRequest("Malformed JSON body")
+        if not isinstance(data, dict):
+            raise BadRequest("JSON body must be an object")
+        return data, {}
+    return await sync_to_async(lambda: (request.POST, request.FILES), thread_sensitive=False)()
+
+
+def _bad_request_as_json(view):
+    """
+    A 400 with the usual {"error": ...} body for BadRequest from `view`.
+    """
+    @functools.wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        try:
+            return await view(request, *args, **kwargs)
+        except BadRequest as e:
+            return JsonResponse({"error": str(e)}, status=400)
+    return wrapper
+
+
+def _spooled(func, source, name=None, as_path=False):
+    with spool(source, name) as upload:
+        if as_path:
+            with upload.path() as path:
+                return func(path)
+        return func(upload.read())
+
+
+# -------------------------------------------------------
+#               OCR ENDPOINTS (LAZY IMPORT)
+# -------------------------------------------------------
+
+@csrf_exempt
+@require_POST
+@admission_controlled("aadhar_ocr")
+@_bad_request_as_json
+async def aadhar_ocr_async_view(request):
+    from ml.aadhar_ocr import extract_aadhar_smart
+    from .fetch import afetch, FetchError, FetchTooLarge
+
+    data, files = await _form(request)
+
+    # Case 1: Cloudinary URL
+    if "url" in data:
+        try:
+            source, name = await afetch(data["url"]), "download.jpg"
+        except FetchTooLarge as e:
+            return JsonResponse({"error": str(e)}, status=413)
+        except FetchError as e:
+            return JsonResponse({"error": str(e)}, status=502)
+
+    # Case 2: File upload
+    else:
+        file = files.get("file")
+        if not file:
+            return JsonResponse({"error": "Upload a file or provide URL"}, status=400)
+        source, name = file, file.name
+
+    try:
+        result = await run_inference(_spooled, extract_aadhar_smart, source, name, as_path=True)
+    except SpoolFull as e:
+        return JsonResponse({"error": str(e)}, status=503)
+
+    return JsonResponse(result, safe=False)
+
+
+@csrf_exempt
+@require_POST
+@admission_controlled("handwritten_ocr")
+@_bad_request_as_json
+async def handwritten_ocr_async_view(request):
+    from ml.handwritten_ocr import handwritten_extract
+
+    data, files = await _form(request)
+    file = files.get("file")
+    if not file:
+        return JsonResponse({"error": "Upload a file"}, status=400)
+
+    tier = degradation.controller.current_tier()
+
+    try:
+        result = await run_inference(_spooled, functools.partial(
+            handwritten_extract, tier=tier, decoding=settings.OCR_DECODING_PROFILES["handwritten_ocr"]
+        ), file)
+    except SpoolFull as e:
+        return JsonResponse({"error": str(e)}, status=503)
+
+    result["quality_tier"] = tier
+    return JsonResponse(result, headers={"X-OCR-Quality-Tier": tier})
+
+
+@csrf_exempt
+@require_POST
+@admission_controlled("aadhaar_detect")
+@_bad_request_as_json
+async def aadhar_detect_async_view(request):
+    from ml.aadhaar_detector import is_aadhaar
+
+    data, files = await _form(request)
+    file = files.get("file")
+    if not file:
+        return JsonResponse({"error": "Upload a file"}, status=400)
+
+    try:
+        result = await run_inference(_spooled, is_aadhaar, file)
+    except SpoolFull as e:
+        return JsonResponse({"error": str(e)}, status=503)
+
+    return JsonResponse({
+        "is_aadhaar": result,
+        "message": "Aadhaar Card ✓" if result else "NOT Aadhaar Card ✗"
+    })
+
+
+@csrf_exempt
+@require_POST
+@admission_controlled("quality_score")
+@_bad_request_as_json
+async def quality_score_async_view(request):
+    from ml.quality_score import process_uploaded_file, calc_scores
+
+    data, files = await _form(request)
+    file = files.get("file")
+    if not file:
+        return JsonResponse({"error": "Upload a file"}, status=400)
+
+    def _score(upload):
+        return calc_scores(process_uploaded_file(upload))
+
+    try:
+        result = await run_inference(_score, file)
+        return JsonResponse(result)
+
+    except Exception as e:
+        return JsonResponse({"error": str(e)}, status=500)
@@ -0,0 +1,90 @@
+"""
+Batch writes for the back office: status changes and record imports.
+
+update_status() moves any number of records to one status with a
+single UPDATE and reports, per id, whether it changed. create_records()
+validates an import batch, inserts the valid records with bulk_create
+in BULK_CREATE_CHUNK-row statements, and leaves the proofs, given as
+URLs, to tasks.attach_proofs after the batch commits: no file is
+downloaded or uploaded while the insert holds the write lock.
+"""
+from django.db import transaction
+from rest_framework.exceptions import ValidationError
+
+from . import search
+from .documents import PROOF_FIELDS
+from .models import STATUS_CHOICE, PassportRecord
+from .serializers import PassportBulkRecordSerializer
+from .tasks import attach_proofs, enqueue
+
+MAX_BULK_IDS = 10000
+MAX_BULK_RECORDS = 5000
+BULK_CREATE_CHUNK = 500
+STATUSES = tuple(value for value, _ in STATUS_CHOICE)
+
+
+def update_status(ids, status):
+    """
+    Set `status` on the records in `ids`. Returns one
+    {"id", "result"} per id, in order: updated, unchanged or not_found.
+    """
+    if status not in STATUSES:
+        raise ValidationError({"status": f"must be one of {', '.join(STATUSES)}"})
+    if not isinstance(ids, list) or not all(isinstance(i, int) for i in ids):
+        raise ValidationError({"ids": "must be a list of integers"})
+    if len(ids) > MAX_BULK_IDS:
+        raise ValidationError({"ids": f"at most {MAX_BULK_IDS} ids per request"})
+    ids = list(dict.fromkeys(ids))
+
+    with transaction.atomic():
+        records = PassportRecord.objects.filter(id__in=ids)
+        # read under the same write transaction as the update
+        before = dict(records.select_for_update().values_list("id", "status"))
+        records.exclude(status=status).update(status=status)
+
+    return [
+        {
+            "id": i,
+            "result": "not_found" if i not in before else "unchanged" if before[i] == status else "updated",
+        }
+        for i in ids
+    ]
+
+
+def create_records(items):
+    """
+    Import `items` (PassportBulkRecordSerializer data). Returns one
+    {"index", "id"} or {"index", "errors"} per item, in order; the
+    valid items are created even when others are not.
+    """
+    if not isinstance(items, list):
+        raise ValidationError({"records": "must be a list"})
+    if len(items) > MAX_BULK_RECORDS:
+        raise ValidationError({"records": f"at most {MAX_BULK_RECORDS} records per request"})
+
+    # one serializer instance validates every item
+    validator = PassportBulkRecordSerializer()
+    results, records = [], []
+    for index, item in enumerate(items):
+        try:
+            data = validator.run_validation(item)
+        except ValidationError as e:
+            results.append({"index": index, "errors": e.detail})
+            continue
+        sources = {field: data.pop(field) for field in PROOF_FIELDS}
+        records.append((index, PassportRecord(**data, proof_sources=sources)))
+        results.append(None)
+
+    with transaction.atomic():
+        created = PassportRecord.objects.bulk_create(
+            [record for _, record in records], batch_size=BULK_CREATE_CHUNK
+        )
+        # bulk_create sends no post_save
+        search.get_backend().index_many(created)
+        ids = [record.id for record in created]
+        for start in range(0, len(ids), BULK_CREATE_CHUNK):
+            enqueue(attach_proofs, ids[start:start + BULK_CREATE_CHUNK])
+
+    for (index, _), record in zip(records, created):
+        results[index] = {"index": index, "id": record.id}
+    return results
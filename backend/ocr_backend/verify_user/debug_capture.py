@@ -0,0 +1,80 @@
+"""
+Sampled debug capture of the OCR pipeline.
+
+OCR_DEBUG_SAMPLE_RATE of the requests, and any request carrying
+`X-OCR-Debug: <OCR_DEBUG_TOKEN>`, run with an ml.debug_capture
+DebugCapture in context. Whatever the pipeline recorded (box overlay,
+line crops, JSON trace per document) is written to OCR_DEBUG_DIR by a
+single background thread, and the store is pruned to the
+OCR_DEBUG_MAX_* limits. The response names the capture in
+X-OCR-Debug-Capture. Requests not captured pay for a header lookup
+and one random() call.
+"""
+import hmac
+import logging
+import random
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+
+from . import metrics
+from .sampling import SampledContextMiddleware
+
+logger = logging.getLogger(__name__)
+
+# PNG encoding of full pages stays off the request thread
+_writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ocr-debug")
+
+
+def _pipeline_debug():
+    from ml import debug_capture
+    return debug_capture
+
+
+def get_store():
+    return _pipeline_debug().DebugStore(
+        settings.OCR_DEBUG_DIR,
+        max_captures=settings.OCR_DEBUG_MAX_CAPTURES,
+        max_bytes=settings.OCR_DEBUG_MAX_BYTES,
+        max_age=settings.OCR_DEBUG_MAX_AGE_HOURS * 3600,
+    )
+
+
+def _reason(request):
+    token = settings.OCR_DEBUG_TOKEN
+    if token and hmac.compare_digest(request.headers.get("X-OCR-Debug", ""), token):
+        return "header"
+    rate = settings.OCR_DEBUG_SAMPLE_RATE
+    if rate > 0 and random.random() < rate:
+        return "sampled"
+    return None
+
+
+def _save(capture):
+    try:
+        get_store().save(capture)
+    except Exception:
+        logger.exception("Could not write debug capture %s", capture.name)
+        return
+    metrics.inc("debug_capture.saved_total")
+
+
+class DebugCaptureMiddleware(SampledContextMiddleware):
+    @property
+    def var(self):
+        return _pipeline_debug().current_capture
+
+    def begin(self, request):
+        reason = _reason(request)
+        if reason is None:
+            return None
+        return _pipeline_debug().DebugCapture(label=f"{request.method} {request.path}", reason=reason)
+
+    def respond(self, request, response, capture):
+        # streams record their documents after this point
+        if capture.documents or response.streaming:
+            response["X-OCR-Debug-Capture"] = capture.name
+
+    def finish(self, request, response, capture):
+        if capture.documents:
+            _writer.submit(_save, capture)
@@ -0,0 +1,71 @@
+"""
+Load-adaptive quality tiers for the OCR pipeline.
+
+The controller looks at the admission queues and request latency and
+steps the pipeline down to cheaper settings (handwritten_ocr
+QUALITY_TIERS) under pressure, and back up once load has stayed low.
+A minimum dwell time between changes keeps it from flapping.
+"""
+import threading
+import time
+
+from django.conf import settings
+
+from . import metrics
+from .admission import all_gates
+
+TIERS = ("full", "reduced", "minimal")
+
+
+class DegradationController:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._level = 0
+        self._changed_at = 0.0
+        metrics.set_gauge("degradation.tier", TIERS[0])
+
+    def _load(self, now):
+        gates = all_gates()
+        queued = max((g.queued for g in gates), default=0)
+        # latency of a gate that has gone quiet says nothing about load now
+        latency = max(
+            (g.latency_ewma for g in gates
+             if now - g.last_observed <= settings.OCR_DEGRADE_LATENCY_WINDOW),
+            default=0.0,
+        )
+        return queued, latency
+
+    def current_tier(self):
+        """
+        Tier to use for a request starting now.
+        """
+        if not settings.OCR_DEGRADATION_ENABLED:
+            return TIERS[0]
+
+        now = time.monotonic()
+        queued, latency = self._load(now)
+
+        with self._lock:
+            if now - self._changed_at >= settings.OCR_DEGRADE_MIN_DWELL:
+                high = (
+                    queued >= settings.OCR_DEGRADE_QUEUE_HIGH
+                    or latency >= settings.OCR_DEGRADE_LATENCY_HIGH
+                )
+                low = (
+                    queued <= settings.OCR_DEGRADE_QUEUE_LOW
+                    and latency <= settings.OCR_DEGRADE_LATENCY_LOW
+                )
+                if high and self._level < len(TIERS) - 1:
+                    self._set_level(self._level + 1, now)
+                elif low and self._level > 0:
+                    self._set_level(self._level - 1, now)
+            return TIERS[self._level]
+
+    def _set_level(self, level, now):
+        self._level = level
+        self._changed_at = now
+        metrics.set_gauge("degradation.tier", TIERS[level])
+        metrics.inc("degradation.transitions_total")
+
+
+controller = DegradationController()
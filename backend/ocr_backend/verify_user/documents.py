@@ -0,0 +1,129 @@
+import hashlib
+
+from . import duplicates
+from .degradation import TIERS
+from .models import DocumentOCR
+
+PROOF_FIELDS = ("dob_proof", "name_gender_proof", "address_proof")
+
+
+def read_proof(uploaded, proofs):
+    """
+    Read an uploaded proof into `proofs` ({hash: (name, bytes)})
+    and return its content hash.
+    """
+    content = uploaded.read()
+    digest = hashlib.sha256(content).hexdigest()
+    proofs.setdefault(digest, (uploaded.name, content))
+    return digest
+
+
+def stored_lines(hashes, tier=None):
+    """
+    Stored lines of `hashes`; with `tier`, only lines from that tier
+    or a better one.
+    """
+    rows = DocumentOCR.objects.filter(content_hash__in=list(hashes))
+    if tier is not None:
+        rows = rows.filter(tier__in=TIERS[:TIERS.index(tier) + 1])
+    return dict(rows.values_list("content_hash", "lines"))
+
+
+def store_lines(digest, lines, tier="full"):
+    """
+    Keep the lines of a proof unless lines from a better tier are
+    already stored; lines from a worse tier are replaced. No lines
+    (an unreadable upload, a failed OCR) are not kept, so the next
+    upload of the proof is OCR'd again.
+    """
+    if not lines:
+        return
+    row, created = DocumentOCR.objects.get_or_create(
+        content_hash=digest, defaults={"lines": lines, "tier": tier}
+    )
+    if not created and TIERS.index(row.tier) > TIERS.index(tier):
+        row.lines = lines
+        row.tier = tier
+        row.save(update_fields=["lines", "tier"])
+
+
+def proof_lines(verifier, proofs, tier="full", decoding=None):
+    """
+    OCR lines for each proof, keyed by content hash.
+
+    Proofs seen before, byte for byte, are served from DocumentOCR; the
+    rest are OCR'd, straight from their bytes. A near duplicate is not
+    enough: a copy of the same form with one field changed looks alike
+    to the fingerprints. Every new proof is fingerprinted for the
+    near-duplicate report. Lines from a degraded tier are stored marked
+    with it, so the hashes stay valid for /reverify/, and are OCR'd
+    again by the next request at a better tier.
+    """
+    lines = stored_lines(proofs, tier)
+
+    missing = [digest for digest in proofs if digest not in lines]
+    if missing:
+        extracted = verifier.extract_lines([proofs[digest][1] for digest in missing], tier, decoding)
+        for digest, doc_lines in zip(missing, extracted):
+            lines[digest] = doc_lines
+            store_lines(digest, doc_lines, tier)
+
+    for digest in missing:
+        duplicates.index_proof(digest, duplicates.proof_phash(digest, proofs[digest][1]))
+
+    return lines
+
+
+def user_details(data):
+    """
+    Verifier input from DocumentVerifySerializer data.
+    """
+    return {
+        "first_name": data["first_name"],
+        "middle_name": data.get("middle_name", ""),
+        "last_name": data["last_name"],
+        "gender": data["gender"],
+        "dob": data["dob"],
+        "address_line": data["permanent_address_line"],
+        "city": data["permanent_city"],
+        "state": data["permanent_state"],
+        "pincode": data["permanent_pincode"],
+        "country": data["permanent_country"],
+    }
+
+
+def verification_outcome(results, details):
+    """
+    MATCHED, PARTIAL or UNMATCHED for match_details() `results`,
+    counting only the fields the applicant filled in; PENDING if the
+    record has not been verified.
+    """
+    if not results:
+        return "PENDING"
+    expected = [
+        field for field in results
+        if details.get("dob" if field == "date_of_birth" else field)
+    ]
+    matched = sum(1 for field in expected if results.get(field))
+    if expected and matched == len(expected):
+        return "MATCHED"
+    return "PARTIAL" if matched else "UNMATCHED"
+
+
+def record_user_details(record):
+    """
+    Verifier input from a saved PassportRecord.
+    """
+    prefix = "present" if record.permanent_address_same_as_present else "permanent"
+    return {
+        "first_name": record.first_name,
+        "middle_name": record.middle_name,
+        "last_name": record.last_name,
+        "gender": record.gender,
+        "dob": record.dob.strftime("%d/%m/%Y"),
+        "address_line": getattr(record, f"{prefix}_address_line"),
+        "city": getattr(record, f"{prefix}_city"),
+        "state": getattr(record, f"{prefix}_state"),
+        "pincode": getattr(record, f"{prefix}_pincode"),
+        "country": getattr(record, f"{prefix}_country"),
+    }
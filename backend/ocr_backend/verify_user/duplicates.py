@@ -0,0 +1,141 @@
+"""
+Near-duplicate proofs.
+
+Every proof that reaches OCR gets a DocumentFingerprint: a 64-bit
+perceptual hash, stored as four indexed 16-bit chunks
+(ml/perceptual_hash.py). near_duplicates() finds the
+fingerprints within a Hamming radius with one indexed IN lookup per
+chunk (multi-index hashing) and checks the full distance of the few
+rows that come back, so the cost follows the number of matches, not
+the size of the archive.
+
+The hash matches re-uploads with recompression, rescaling or small
+crops, but also other copies of the same form, and cannot tell two
+uploads apart that differ in one field value.
+Matches are therefore only reported, for reviewers; OCR lines are
+reused for byte-identical uploads alone (documents.proof_lines).
+"""
+from django.conf import settings
+from django.db.models import Q
+
+from .models import DocumentFingerprint
+
+
+def proof_phash(digest, content):
+    """
+    Perceptual hash of a proof, from its stored fingerprint when it
+    has one; None for files that cannot be read as an image.
+    """
+    from ml.perceptual_hash import document_phash, from_signed
+
+    stored = (
+        DocumentFingerprint.objects
+        .filter(content_hash=digest)
+        .values_list("phash", flat=True)
+        .first()
+    )
+    if stored is not None:
+        return from_signed(stored)
+    return document_phash(content)
+
+
+def index_proof(digest, phash, record=None, field=""):
+    """
+    Store the fingerprint of a proof (optionally as `field` of
+    `record`) unless it is already there.
+    """
+    from ml.perceptual_hash import chunks, to_signed
+
+    if phash is None:
+        return None
+    c0, c1, c2, c3 = chunks(phash)
+    fingerprint, _ = DocumentFingerprint.objects.get_or_create(
+        content_hash=digest,
+        record=record,
+        field=field,
+        defaults={
+            "phash": to_signed(phash),
+            "chunk0": c0,
+            "chunk1": c1,
+            "chunk2": c2,
+            "chunk3": c3,
+        },
+    )
+    return fingerprint
+
+
+def index_record(record, proofs=None):
+    """
+    Fingerprint the three proofs of a PassportRecord. `proofs` maps
+    field -> (content hash, bytes) when the caller has read them
+    already; otherwise the files are read from storage.
+    """
+    from .documents import PROOF_FIELDS, read_proof
+
+    indexed = set(record.fingerprints.values_list("field", flat=True))
+    for field in PROOF_FIELDS:
+        if field in indexed:
+            continue
+        if proofs and field in proofs:
+            digest, content = proofs[field]
+        else:
+            read = {}
+            with getattr(record, field).open("rb") as f:
+                digest = read_proof(f, read)
+            content = read[digest][1]
+        index_proof(digest, proof_phash(digest, content), record, field)
+
+
+def near_duplicates(phash, radius=None, limit=50):
+    """
+    [(distance, DocumentFingerprint)] within `radius` bits of
+    `phash` (default OCR_NEAR_DUPLICATE_DISTANCE), nearest first,
+    at most `limit` (None: all).
+    """
+    from ml.perceptual_hash import candidate_chunks, distance, from_signed
+
+    radius = settings.OCR_NEAR_DUPLICATE_DISTANCE if radius is None else radius
+    query = Q()
+    for i, values in enumerate(candidate_chunks(phash, radius)):
+        query |= Q(**{f"chunk{i}__in": values})
+
+    matches = []
+    for fingerprint in DocumentFingerprint.objects.filter(query).iterator():
+        d = distance(phash, from_signed(fingerprint.phash))
+        if d <= radius:
+            matches.append((d, fingerprint))
+    matches.sort(key=lambda m: (m[0], -m[1].id))
+    return matches if limit is None else matches[:limit]
+
+
+def describe(matches, exclude_record=None):
+    """
+    API form of near_duplicates() results.
+    """
+    return [
+        {
+            "distance": d,
+            "content_hash": fingerprint.content_hash,
+            "record_id": fingerprint.record_id,
+            "field": fingerprint.field or None,
+        }
+        for d, fingerprint in matches
+        if exclude_record is None or fingerprint.record_id != exclude_record
+    ]
+
+
+def record_duplicates(record, radius=None, limit=50):
+    """
+    Near duplicates of each proof of `record` on other records.
+    """
+    from ml.perceptual_hash import from_signed
+
+    index_record(record)
+    found = {}
+    for fingerprint in record.fingerprints.all():
+        matches = near_duplicates(from_signed(fingerprint.phash), radius, limit=None)
+        found[fingerprint.field] = [
+            m for m in describe(matches, exclude_record=record.id) if m["record_id"] is not None
+        ][:limit]
+    return found
+
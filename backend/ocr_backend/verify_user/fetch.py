@@ -0,0 +1,141 @@
+import asyncio
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+from django.conf import settings
+
+
+class FetchError(Exception):
+    """
+    The URL could not be downloaded.
+    """
+
+
+class FetchTooLarge(FetchError):
+    """
+    The response body is larger than the allowed maximum.
+    """
+
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session():
+    """
+    Process-wide session: one keep-alive connection pool shared by
+    every request and batch job.
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(
+                pool_connections=settings.URL_FETCH_POOL_SIZE,
+                pool_maxsize=settings.URL_FETCH_POOL_SIZE,
+            )
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            _session = session
+        return _session
+
+
+def fetch(url, max_bytes=None, timeout=None):
+    """
+    Download `url` into memory, streaming, and stop as soon as the
+    body goes over `max_bytes`.
+    """
+    max_bytes = max_bytes or settings.URL_FETCH_MAX_BYTES
+    timeout = timeout or (settings.URL_FETCH_CONNECT_TIMEOUT, settings.URL_FETCH_READ_TIMEOUT)
+
+    try:
+        with get_session().get(url, stream=True, timeout=timeout) as resp:
+            resp.raise_for_status()
+
+            length = resp.headers.get("Content-Length")
+            if length and length.isdigit() and int(length) > max_bytes:
+                raise FetchTooLarge(f"{url} is {length} bytes (limit {max_bytes})")
+
+            body = bytearray()
+            for chunk in resp.iter_content(chunk_size=64 * 1024):
+                body += chunk
+                if len(body) > max_bytes:
+                    raise FetchTooLarge(f"{url} is over {max_bytes} bytes")
+            return bytes(body)
+
+    except requests.RequestException as e:
+        raise FetchError(f"Could not fetch {url}: {e}") from e
+
+
+def fetch_many(urls, max_workers=None, **kwargs):
+    """
+    Fetch several URLs concurrently over the shared pool. Returns one
+    entry per URL, in order: the body bytes, or the FetchError raised.
+    """
+    def _one(url):
+        try:
+            return fetch(url, **kwargs)
+        except FetchError as e:
+            return e
+
+    max_workers = max_workers or settings.URL_FETCH_POOL_SIZE
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(urls) or 1)) as pool:
+        return list(pool.map(_one, urls))
+
+
+# -------------------------------------------------------
+#       ASYNC FETCH (ASGI views, runs on the event loop)
+# -------------------------------------------------------
+
+# One httpx client (and pool) per event loop
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def _get_async_client():
+    import httpx
+
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=settings.URL_FETCH_POOL_SIZE,
+                max_keepalive_connections=settings.URL_FETCH_POOL_SIZE,
+            ),
+            timeout=httpx.Timeout(
+                settings.URL_FETCH_READ_TIMEOUT,
+                connect=settings.URL_FETCH_CONNECT_TIMEOUT,
+            ),
+        )
+        _async_clients[loop] = client
+    return client
+
+
+async def afetch(url, max_bytes=None):
+    """
+    Async counterpart of fetch(), using httpx.
+    """
+    import httpx
+
+    max_bytes = max_bytes or settings.URL_FETCH_MAX_BYTES
+
+    try:
+        async with _get_async_client().stream("GET", url) as resp:
+            resp.raise_for_status()
+
+            length = resp.headers.get("Content-Length")
+            if length and length.isdigit() and int(length) > max_bytes:
+                raise FetchTooLarge(f"{url} is {length} bytes (limit {max_bytes})")
+
+            body = bytearray()
+            async for chunk in resp.aiter_bytes(64 * 1024):
+                body += chunk
+                if len(body) > max_bytes:
+                    raise FetchTooLarge(f"{url} is over {max_bytes} bytes")
+            return bytes(body)
+
+    except httpx.HTTPError as e:
+        raise FetchError(f"Could not fetch {url}: {e}") from e
@@ -0,0 +1,43 @@
+import asyncio
+import contextvars
+import functools
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+
+from . import metrics
+from .admission import AdmissionTimeout, current_deadline
+
+# Fixed pool that runs the CPU-bound model calls for async views, so
+# the event loop only ever waits on it.
+_executor = ThreadPoolExecutor(
+    max_workers=settings.OCR_INFERENCE_WORKERS,
+    thread_name_prefix="ocr-infer",
+)
+
+
+def _run_before_deadline(deadline, func, *args, **kwargs):
+    # Work whose request has already given up is dropped, not run
+    if deadline is not None and time.monotonic() > deadline:
+        metrics.inc("inference.expired_total")
+        raise AdmissionTimeout("deadline passed while queued for inference")
+    return func(*args, **kwargs)
+
+
+async def run_inference(func, *args, **kwargs):
+    """
+    Await `func(*args, **kwargs)` on the inference pool.
+    """
+    loop = asyncio.get_running_loop()
+    # run_in_executor does not carry contextvars (e.g. the request's
+    # ml.profiling profile) over to the pool thread by itself
+    call = functools.partial(
+        contextvars.copy_context().run,
+        _run_before_deadline, current_deadline.get(), func, *args, **kwargs
+    )
+    metrics.inc("inference.inflight")
+    try:
+        return await loop.run_in_executor(_executor, call)
+    finally:
+        metrics.inc("inference.inflight", -1)
@@ -0,0 +1,80 @@
+import json
+import os
+import platform
+import statistics
+import timeit
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from benchmarks.stages import STAGES, Skip, calibration
+
+DEFAULT_BASELINE = os.path.join(settings.BASE_DIR, "benchmarks", "baseline.json")
+
+
+class Command(BaseCommand):
+    help = "Time the OCR pipeline stages on synthetic input with stub models and compare with the stored baseline"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--stage", action="append", choices=sorted(STAGES), help="Run only this stage (repeatable)")
+        parser.add_argument("--repeat", type=int, default=41, help="Timed runs per stage")
+        parser.add_argument("--threshold", type=float, default=0.25,
+                            help="Allowed slowdown vs the baseline (0.25 = 25%%), of both the median and the min")
+        parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="Baseline JSON file")
+        parser.add_argument("--save-baseline", action="store_true", help="Store these results as the new baseline")
+
+    def handle(self, *args, **options):
+        baseline = {}
+        if os.path.exists(options["baseline"]):
+            with open(options["baseline"]) as f:
+                baseline = json.load(f).get("stages", {})
+
+        calibrate = calibration()
+        results = {}
+        regressions = []
+        for name in options["stage"] or STAGES:
+            try:
+                func = STAGES[name]()
+            except Skip as e:
+                self.stdout.write(f"{name:28} skipped: {e}")
+                continue
+
+            func()  # warm-up: imports, caches
+            # machine speed right before and after the stage
+            speed = timeit.repeat(calibrate, number=1, repeat=5)
+            times = timeit.repeat(func, number=1, repeat=options["repeat"])
+            speed += timeit.repeat(calibrate, number=1, repeat=5)
+            median = statistics.median(times)
+            results[name] = {"median": round(median, 6), "min": round(min(times), 6), "calibration": round(min(speed), 6)}
+
+            line = f"{name:28} median {median * 1000:9.2f} ms  min {min(times) * 1000:9.2f} ms"
+            reference = baseline.get(name)
+            if reference:
+                # times as if the machine ran at the baseline's speed
+                scale = min(speed) / reference["calibration"] if reference.get("calibration") else 1.0
+                change = median / scale / reference["median"] - 1
+                line += f"  ({change:+.0%} vs baseline, machine x{scale:.2f})"
+                # a busy machine moves the median; a slower stage moves
+                # the fastest run as well
+                if change > options["threshold"] and min(times) / scale / reference["min"] - 1 > options["threshold"]:
+                    regressions.append(f"{name} {change:+.0%}")
+                    line += "  REGRESSION"
+            self.stdout.write(line)
+
+        if options["save_baseline"]:
+            stored = {
+                "machine": {
+                    "platform": platform.platform(),
+                    "python": platform.python_version(),
+                    "cpus": os.cpu_count(),
+                },
+                "stages": {**baseline, **results},
+            }
+            with open(options["baseline"], "w") as f:
+                json.dump(stored, f, indent=2, sort_keys=True)
+                f.write("\n")
+            self.stdout.write(f"Baseline written to {options['baseline']}")
+        elif regressions:
+            raise CommandError(
+                f"Slower than baseline by more than {options['threshold']:.0%}: " + ", ".join(regressions)
+            )
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from ocr_backend.cpu_layout import describe, plan_layout
+
+
+class Command(BaseCommand):
+    help = "Show how CPU cores would be split across OCR workers (see gunicorn.conf.py)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, help="Number of workers (default: cores / OCR_CORES_PER_WORKER)")
+        parser.add_argument("--cores-per-worker", type=int, help="Physical cores per worker when --workers is not given")
+
+    def handle(self, *args, **options):
+        layout = plan_layout(options["workers"], options["cores_per_worker"])
+        self.stdout.write(describe(layout))
@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from verify_user.models import PassportRecord
+from verify_user.tasks import attach_proofs, enrich_passport_record, stale_processing_before
+
+
+class Command(BaseCommand):
+    help = "Run OCR enrichment for PassportRecords that have not been processed yet, or whose enrichment was interrupted"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--retry-failed",
+            action="store_true",
+            help="Also retry records whose enrichment failed",
+        )
+
+    def handle(self, *args, **options):
+        # bulk imports whose proofs were never downloaded
+        unattached = PassportRecord.objects.filter(proof_sources__isnull=False).values_list("id", flat=True)
+        attach_proofs(list(unattached))
+
+        states = ["PENDING", "FAILED"] if options["retry_failed"] else ["PENDING"]
+        # PROCESSING since before the stale cutoff: its worker died
+        stuck = Q(ocr_status="PROCESSING") & (
+            Q(processing_since__lt=stale_processing_before()) | Q(processing_since__isnull=True)
+        )
+        ids = (
+            PassportRecord.objects
+            .filter(Q(ocr_status__in=states) | stuck, proof_sources__isnull=True)
+            .values_list("id", flat=True)
+        )
+
+        for record_id in ids.iterator():
+            enrich_passport_record(record_id)
+            status = PassportRecord.objects.values_list("ocr_status", flat=True).get(id=record_id)
+            self.stdout.write(f"{record_id}: {status}")
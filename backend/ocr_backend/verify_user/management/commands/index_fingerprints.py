@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count
+
+from verify_user.duplicates import index_record
+from verify_user.models import PassportRecord
+
+
+class Command(BaseCommand):
+    help = "Fingerprint the proofs of PassportRecords missing from the near-duplicate index"
+
+    def handle(self, *args, **options):
+        # one fingerprint per proof field when fully indexed
+        records = PassportRecord.objects.annotate(indexed=Count("fingerprints")).filter(indexed__lt=3)
+
+        for record in records.iterator():
+            try:
+                index_record(record)
+            except Exception as e:
+                self.stderr.write(f"{record.id}: {e}")
+                continue
+            self.stdout.write(f"{record.id}: {record.fingerprints.count()} proofs indexed")
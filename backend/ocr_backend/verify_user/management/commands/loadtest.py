@@ -0,0 +1,148 @@
+import json
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import requests
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from benchmarks.load import DEFAULT_MIX, Corpus, LoadRun, parse_mix
+
+DEFAULT_OUTPUT = os.path.join(settings.BASE_DIR, "benchmarks", "results")
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class Command(BaseCommand):
+    help = "Drive the API with a configurable request mix and arrival rate; report throughput, latency percentiles and error rates per endpoint"
+
+    def add_arguments(self, parser):
+        # no default server: the mix creates records and flips statuses
+        target = parser.add_mutually_exclusive_group(required=True)
+        target.add_argument("--url", help="Server to load; its data is written to")
+        target.add_argument("--serve", action="store_true",
+                            help="Start a local server with stub models and a throwaway database and media root instead of using --url")
+        parser.add_argument("--mix", help="endpoint=weight,... (default: %s)" % ",".join(f"{k}={v}" for k, v in DEFAULT_MIX.items()))
+        parser.add_argument("--rate", type=float, default=5.0, help="Mean arrivals per second")
+        parser.add_argument("--duration", type=float, default=60.0, help="Seconds of arrivals")
+        parser.add_argument("--concurrency", type=int, default=32, help="Max requests in flight")
+        parser.add_argument("--corpus-size", type=int, default=8, help="Synthetic forms in the corpus")
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--label", default="run", help="Name used in the result file")
+        parser.add_argument("--output-dir", default=DEFAULT_OUTPUT)
+        parser.add_argument("--compare", help="Earlier result file to compare against")
+
+    def handle(self, *args, **options):
+        try:
+            mix = parse_mix(options["mix"]) if options["mix"] else DEFAULT_MIX
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        server = workdir = None
+        url = options["url"]
+        if options["serve"]:
+            # a throwaway database and media root: the mix writes records
+            workdir = tempfile.mkdtemp(prefix="loadtest-")
+            try:
+                server, url = self._start_server(workdir)
+            except BaseException:
+                shutil.rmtree(workdir, ignore_errors=True)
+                raise
+
+        try:
+            self.stdout.write(f"Loading {url}: {options['rate']}/s for {options['duration']}s, mix {mix}")
+            run = LoadRun(
+                url, mix, options["rate"], options["duration"],
+                concurrency=options["concurrency"],
+                corpus=Corpus(options["corpus_size"]),
+                seed=options["seed"],
+            )
+            report = run.run()
+        finally:
+            if server:
+                server.terminate()
+                server.wait(timeout=30)
+            if workdir:
+                shutil.rmtree(workdir, ignore_errors=True)
+
+        report["label"] = options["label"]
+        report["stub_models"] = options["serve"]
+        self._print(report)
+
+        os.makedirs(options["output_dir"], exist_ok=True)
+        path = os.path.join(
+            options["output_dir"],
+            f"loadtest-{options['label']}-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json",
+        )
+        with open(path, "w") as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+            f.write("\n")
+        self.stdout.write(f"Results written to {path}")
+
+        if options["compare"]:
+            with open(options["compare"]) as f:
+                self._compare(json.load(f), report)
+
+    def _start_server(self, workdir):
+        port = _free_port()
+        env = dict(
+            os.environ, OCR_STUB_MODELS="True", OCR_LOCAL_MEDIA="True",
+            OCR_DATABASE_PATH=os.path.join(workdir, "db.sqlite3"),
+            OCR_MEDIA_ROOT=os.path.join(workdir, "media"),
+        )
+        migrate = subprocess.run(
+            [sys.executable, "manage.py", "migrate", "--noinput"],
+            cwd=settings.BASE_DIR, env=env, capture_output=True, text=True,
+        )
+        if migrate.returncode:
+            raise CommandError(f"Could not migrate the load test database:\n{migrate.stderr}")
+        server = subprocess.Popen(
+            [sys.executable, "manage.py", "runserver", f"127.0.0.1:{port}", "--noreload"],
+            cwd=settings.BASE_DIR, env=env,
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        url = f"http://127.0.0.1:{port}"
+        deadline = time.monotonic() + 60
+        while time.monotonic() < deadline:
+            if server.poll() is not None:
+                raise CommandError("Local server exited during startup")
+            try:
+                requests.get(f"{url}/api/metrics/", timeout=2)
+                return server, url
+            except requests.RequestException:
+                time.sleep(0.5)
+        server.terminate()
+        raise CommandError("Local server did not start within 60s")
+
+    def _print(self, report):
+        self.stdout.write(
+            f"\n{'endpoint':20} {'reqs':>6} {'rps':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>7} {'shed':>6}"
+        )
+        for name, e in report["endpoints"].items():
+            self.stdout.write(
+                f"{name:20} {e['requests']:6d} {e['throughput_rps']:7.2f} {e['p50_ms']:9.1f} {e['p95_ms']:9.1f} "
+                f"{e['p99_ms']:9.1f} {e['error_rate']:7.1%} {e['shed_rate']:6.1%}"
+            )
+        self.stdout.write(f"total {report['requests']} requests, {report['throughput_rps']} rps over {report['elapsed_s']}s")
+
+    def _compare(self, before, after):
+        self.stdout.write(f"\nvs {before.get('label')} ({before['throughput_rps']} rps):")
+        for name, e in after["endpoints"].items():
+            old = before["endpoints"].get(name)
+            if not old:
+                continue
+            self.stdout.write(
+                f"{name:20} p95 {old['p95_ms']:.1f} -> {e['p95_ms']:.1f} ms, "
+                f"p99 {old['p99_ms']:.1f} -> {e['p99_ms']:.1f} ms, "
+                f"errors {old['error_rate']:.1%} -> {e['error_rate']:.1%}"
+            )
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from verify_user.search import get_backend
+
+
+class Command(BaseCommand):
+    help = "Rebuild the PassportRecord search index (after bulk loads, which bypass save())"
+
+    def handle(self, *args, **options):
+        count = get_backend().rebuild()
+        self.stdout.write(f"{count} records indexed")
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from verify_user.models import OutboxEmail
+from verify_user.outbox import Mailer, send_pending
+
+
+class Command(BaseCommand):
+    help = "Send the due messages of the email outbox (e.g. those left by a restart)"
+
+    def handle(self, *args, **options):
+        mailer = Mailer()
+        try:
+            while send_pending(mailer):
+                pass
+        finally:
+            mailer.close()
+        for status in ("SENT", "PENDING", "FAILED"):
+            self.stdout.write(f"{status}: {OutboxEmail.objects.filter(status=status).count()}")
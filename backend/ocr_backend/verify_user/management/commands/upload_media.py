@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from verify_user.models import PassportRecord
+from verify_user.tasks import upload_media
+
+
+class Command(BaseCommand):
+    help = "Upload staged proofs of PassportRecords to the remote media storage"
+
+    def handle(self, *args, **options):
+        ids = list(
+            PassportRecord.objects
+            .filter(media_status__in=["STAGED", "FAILED"])
+            .values_list("id", flat=True)
+        )
+        for record_id in ids:
+            upload_media(record_id)
+            status = PassportRecord.objects.values_list("media_status", flat=True).get(id=record_id)
+            self.stdout.write(f"{record_id}: {status}")
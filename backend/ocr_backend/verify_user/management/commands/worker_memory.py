@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from ocr_backend.model_sharing import memory_usage, pidfile_path, worker_pids
+
+
+def _mb(value):
+    return f"{value / 2**20:9.1f}"
+
+
+class Command(BaseCommand):
+    help = "Report unique vs shared memory of each gunicorn worker (see OCR_PRELOAD_MODELS)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--pid", type=int, help="Master PID (default: read from the gunicorn pidfile, OCR_PIDFILE)")
+
+    def handle(self, *args, **options):
+        master = options["pid"]
+        if master is None:
+            pidfile = pidfile_path()
+            try:
+                with open(pidfile) as f:
+                    master = int(f.read().strip())
+            except (OSError, ValueError):
+                raise CommandError(f"No master PID given and {pidfile} is not readable")
+
+        pids = worker_pids(master)
+        if not pids:
+            raise CommandError(f"No workers found for master {master}")
+
+        self.stdout.write(f"{'pid':>8} {'rss MB':>9} {'unique MB':>9} {'shared MB':>9} {'pss MB':>9}")
+        total_unique = total_pss = 0
+        for pid in [master] + pids:
+            usage = memory_usage(pid)
+            if usage is None:
+                self.stdout.write(f"{pid:>8}  (not readable)")
+                continue
+            label = f"{pid}*" if pid == master else str(pid)
+            self.stdout.write(
+                f"{label:>8} {_mb(usage['rss'])} {_mb(usage['unique'])} {_mb(usage['shared'])} {_mb(usage['pss'])}"
+            )
+            total_unique += usage["unique"]
+            total_pss += usage["pss"]
+
+        self.stdout.write(f"* master. {len(pids)} worker(s); total unique {_mb(total_unique).strip()} MB, "
+                          f"total pss {_mb(total_pss).strip()} MB")
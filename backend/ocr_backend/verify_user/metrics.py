@@ -0,0 +1,26 @@
+import threading
+
+# Process-local counters and gauges, served by /api/metrics/.
+_lock = threading.Lock()
+_values = {}
+
+
+def inc(name, amount=1):
+    with _lock:
+        _values[name] = _values.get(name, 0) + amount
+
+
+def set_gauge(name, value):
+    with _lock:
+        _values[name] = value
+
+
+def track_max(name, value):
+    with _lock:
+        if value > _values.get(name, 0):
+            _values[name] = value
+
+
+def snapshot():
+    with _lock:
+        return dict(sorted(_values.items()))
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 16:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('verify_user', '0008_documentocr'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='passportrecord',
+            name='ocr_status',
+            field=models.CharField(choices=[('PENDING', 'pending'), ('PROCESSING', 'processing'), ('DONE', 'done'), ('FAILED', 'failed')], db_index=True, default='PENDING', max_length=10),
+        ),
+    ]
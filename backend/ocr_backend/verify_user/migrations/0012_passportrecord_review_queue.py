@@ -0,0 +1,80 @@
+# Generated by Django 5.2.18 on 2026-10-19 17:14
+
+from django.db import migrations, models
+
+
+# Copies of verify_user.documents.record_user_details and
+# verification_outcome as of this migration, so later changes to those
+# leave the backfill as it was.
+
+def _user_details(record):
+    prefix = "present" if record.permanent_address_same_as_present else "permanent"
+    return {
+        "first_name": record.first_name,
+        "middle_name": record.middle_name,
+        "last_name": record.last_name,
+        "gender": record.gender,
+        "dob": record.dob.strftime("%d/%m/%Y"),
+        "address_line": getattr(record, f"{prefix}_address_line"),
+        "city": getattr(record, f"{prefix}_city"),
+        "state": getattr(record, f"{prefix}_state"),
+        "pincode": getattr(record, f"{prefix}_pincode"),
+        "country": getattr(record, f"{prefix}_country"),
+    }
+
+
+def _outcome(results, details):
+    if not results:
+        return "PENDING"
+    expected = [
+        field for field in results
+        if details.get("dob" if field == "date_of_birth" else field)
+    ]
+    matched = sum(1 for field in expected if results.get(field))
+    if expected and matched == len(expected):
+        return "MATCHED"
+    return "PARTIAL" if matched else "UNMATCHED"
+
+
+def backfill_outcome(apps, schema_editor):
+    PassportRecord = apps.get_model('verify_user', 'PassportRecord')
+    verified = PassportRecord.objects.filter(verification_results__isnull=False)
+    for record in verified.iterator(chunk_size=2000):
+        outcome = _outcome(record.verification_results, _user_details(record))
+        PassportRecord.objects.filter(id=record.id).update(verification_outcome=outcome)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('verify_user', '0011_documentfingerprint'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='passportrecord',
+            name='verification_outcome',
+            field=models.CharField(choices=[('PENDING', 'pending'), ('MATCHED', 'matched'), ('PARTIAL', 'partial'), ('UNMATCHED', 'unmatched')], default='PENDING', max_length=10),
+        ),
+        migrations.AddIndex(
+            model_name='passportrecord',
+            index=models.Index(fields=['created_at'], name='passport_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='passportrecord',
+            index=models.Index(fields=['status', 'created_at'], name='passport_status_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='passportrecord',
+            index=models.Index(fields=['status', 'present_state', 'created_at'], name='passport_status_state_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='passportrecord',
+            index=models.Index(fields=['status', 'verification_outcome', 'created_at'], name='passport_status_outcome_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='passportrecord',
+            index=models.Index(fields=['present_state', 'created_at'], name='passport_state_created_idx'),
+        ),
+        migrations.RunPython(backfill_outcome, migrations.RunPython.noop),
+    ]
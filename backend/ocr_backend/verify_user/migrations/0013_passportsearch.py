@@ -0,0 +1,39 @@
+from django.db import migrations
+
+NAME = "first_name || ' ' || middle_name || ' ' || last_name"
+CITY = "present_city || ' ' || permanent_city"
+ADDRESS = (
+    "present_address_line || ' ' || present_state || ' ' || present_pincode || ' ' || "
+    "permanent_address_line || ' ' || permanent_state || ' ' || permanent_pincode"
+)
+
+
+def create_index(apps, schema_editor):
+    # FTS5 is SQLite's; other databases use search.SubstringBackend
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(
+        "CREATE VIRTUAL TABLE verify_user_passportsearch USING fts5("
+        "name, city, address, tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+    )
+    schema_editor.execute(
+        "INSERT INTO verify_user_passportsearch (rowid, name, city, address) "
+        f"SELECT id, {NAME}, {CITY}, {ADDRESS} FROM verify_user_passportrecord"
+    )
+
+
+def drop_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute("DROP TABLE verify_user_passportsearch")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('verify_user', '0012_passportrecord_review_queue'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-19 17:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('verify_user', '0013_passportsearch'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='passportrecord',
+            name='proof_sources',
+            field=models.JSONField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='passportrecord',
+            name='status',
+            field=models.CharField(choices=[('PENDING', 'pending'), ('VERIFIED', 'verified'), ('REJECTED', 'rejected')], default='PENDING', max_length=10),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 17:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('verify_user', '0014_passportrecord_proof_sources'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='passportrecord',
+            name='media_status',
+            field=models.CharField(choices=[('STAGED', 'staged'), ('STORED', 'stored'), ('FAILED', 'failed')], default='STORED', max_length=10),
+        ),
+    ]
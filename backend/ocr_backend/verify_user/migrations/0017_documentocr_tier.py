@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 17:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('verify_user', '0016_outboxemail'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='documentocr',
+            name='tier',
+            field=models.CharField(default='full', max_length=10),
+        ),
+    ]
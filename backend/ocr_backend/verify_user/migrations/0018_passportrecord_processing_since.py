@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 17:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('verify_user', '0017_documentocr_tier'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='passportrecord',
+            name='processing_since',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-19 18:02
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('verify_user', '0018_passportrecord_processing_since'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='documentfingerprint',
+            name='thumbnail',
+        ),
+    ]
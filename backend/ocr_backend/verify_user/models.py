@@ -9,7 +9,25 @@ GENDER_CHOICES=(
 )
 STATUS_CHOICE=(
     ('PENDING','pending'),
-    ('VERIFIED','verified')
+    ('VERIFIED','verified'),
+    ('REJECTED','rejected'),
+)
+OCR_STATUS_CHOICES=(
+    ('PENDING','pending'),
+    ('PROCESSING','processing'),
+    ('DONE','done'),
+    ('FAILED','failed'),
+)
+MEDIA_STATUS_CHOICES=(
+    ('STAGED','staged'),
+    ('STORED','stored'),
+    ('FAILED','failed'),
+)
+VERIFICATION_OUTCOME_CHOICES=(
+    ('PENDING','pending'),
+    ('MATCHED','matched'),
+    ('PARTIAL','partial'),
+    ('UNMATCHED','unmatched'),
 )
 class PassportRecord(models.Model):
     first_name=models.CharField(max_length=100)
@@ -37,15 +55,39 @@ class PassportRecord(models.Model):
     name_gender_proof=models.FileField(upload_to="name_gender_proof/")
     dob_proof=models.FileField(upload_to="dob_proofs/")
     address_proof = models.FileField(upload_to="address_proofs/")
+    # proof URLs of bulk-created records, until tasks.attach_proofs
+    # has copied them into the fields above
+    proof_sources=models.JSONField(blank=True,null=True)
+    # where the proofs are: STAGED on local disk until tasks.upload_media
+    # has copied them to the remote storage (see storage.py)
+    media_status=models.CharField(max_length=10,choices=MEDIA_STATUS_CHOICES,default='STORED')
 
     status=models.CharField(max_length=10,choices=STATUS_CHOICE,default='PENDING')
     
     # raw OCR output
     extracted_data = models.JSONField(blank=True, null=True)       
     verification_results = models.JSONField(blank=True, null=True)
+    # background enrichment state (see tasks.enrich_passport_record)
+    ocr_status=models.CharField(max_length=10,choices=OCR_STATUS_CHOICES,default='PENDING',db_index=True)
+    # when the running enrichment claimed the record; older than
+    # OCR_ENRICH_STALE_SECONDS means its worker died
+    processing_since=models.DateTimeField(blank=True,null=True)
+    # summary of verification_results, for the reviewer queue
+    verification_outcome=models.CharField(max_length=10,choices=VERIFICATION_OUTCOME_CHOICES,default='PENDING')
 
     created_at=models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        # reviewer queue (review.py): equality filters, then created_at
+        # for both the date range and the order
+        indexes=[
+            models.Index(fields=['created_at'],name='passport_created_idx'),
+            models.Index(fields=['status','created_at'],name='passport_status_created_idx'),
+            models.Index(fields=['status','present_state','created_at'],name='passport_status_state_idx'),
+            models.Index(fields=['status','verification_outcome','created_at'],name='passport_status_outcome_idx'),
+            models.Index(fields=['present_state','created_at'],name='passport_state_created_idx'),
+        ]
+
     def __str__(self):
         return f"{self.first_name} {self.last_name} ({self.dob})"
     
@@ -59,3 +101,76 @@ class EmailOTP(models.Model):
         return timezone.now() <= self.created_at+timedelta(minutes=10)
     def __str__(self):
         return f"{self.email} - {self.otp}"
+
+
+OUTBOX_STATUS_CHOICES=(
+    ('PENDING','pending'),
+    ('SENT','sent'),
+    ('FAILED','failed'),
+)
+class OutboxEmail(models.Model):
+    # mail waiting for the background sender (outbox.py); a sender
+    # claims a row by moving next_attempt_at past its lease
+    to=models.EmailField()
+    subject=models.CharField(max_length=255)
+    body=models.TextField()
+    status=models.CharField(max_length=10,choices=OUTBOX_STATUS_CHOICES,default='PENDING')
+    attempts=models.PositiveSmallIntegerField(default=0)
+    next_attempt_at=models.DateTimeField(default=timezone.now)
+    claim=models.CharField(max_length=32,blank=True)
+    last_error=models.TextField(blank=True)
+    created_at=models.DateTimeField(auto_now_add=True)
+    sent_at=models.DateTimeField(null=True,blank=True)
+
+    class Meta:
+        indexes=[
+            models.Index(fields=['status','next_attempt_at'],name='outbox_due_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.to} - {self.subject} ({self.status})"
+
+
+class DocumentOCR(models.Model):
+    # OCR lines of an uploaded proof, keyed by SHA-256 of its bytes
+    content_hash=models.CharField(max_length=64,unique=True)
+    lines=models.JSONField()
+    # degradation tier the lines came from; a better tier replaces them
+    tier=models.CharField(max_length=10,default='full')
+    created_at=models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.content_hash[:12]} ({len(self.lines)} lines)"
+
+
+class RequestProfile(models.Model):
+    # resource profile of one sampled request (see profiling.py)
+    method=models.CharField(max_length=10)
+    path=models.CharField(max_length=255)
+    status_code=models.PositiveSmallIntegerField(null=True)
+    wall_ms=models.FloatField()
+    cpu_ms=models.FloatField()
+    peak_rss_growth_bytes=models.BigIntegerField(null=True)
+    # per-stage totals, top allocators, torch counters
+    data=models.JSONField()
+    created_at=models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.method} {self.path} ({self.wall_ms:.0f} ms)"
+
+
+class DocumentFingerprint(models.Model):
+    # perceptual hash of an uploaded proof (duplicates.py);
+    # the hash's four 16-bit chunks are indexed for Hamming search
+    content_hash=models.CharField(max_length=64,db_index=True)
+    record=models.ForeignKey(PassportRecord,null=True,blank=True,on_delete=models.CASCADE,related_name='fingerprints')
+    field=models.CharField(max_length=20,blank=True)
+    phash=models.BigIntegerField()
+    chunk0=models.PositiveIntegerField(db_index=True)
+    chunk1=models.PositiveIntegerField(db_index=True)
+    chunk2=models.PositiveIntegerField(db_index=True)
+    chunk3=models.PositiveIntegerField(db_index=True)
+    created_at=models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.content_hash[:12]} {self.phash & 0xFFFFFFFFFFFFFFFF:016x}"
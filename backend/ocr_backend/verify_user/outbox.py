@@ -0,0 +1,172 @@
+"""
+Email outbox.
+
+queue_email() stores an OutboxEmail and returns; after the transaction
+commits it wakes this process's sender thread. The sender claims up to
+OCR_OUTBOX_BATCH due messages at a time and sends them one by one over
+a single SMTP connection, which it keeps open between batches and
+closes after OCR_OUTBOX_IDLE_SECONDS without mail, so a burst of OTPs
+costs one TLS handshake instead of one per message. A message that
+fails is retried after OCR_OUTBOX_RETRY_DELAY seconds, doubling each
+time, until OCR_OUTBOX_MAX_ATTEMPTS.
+
+A claim moves the rows' next_attempt_at OCR_OUTBOX_LEASE_SECONDS
+ahead, so several processes (or `manage.py send_outbox`) can share the
+table, and rows claimed by a sender that died are sent once the lease
+runs out.
+"""
+import logging
+import smtplib
+import threading
+import time
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from . import metrics
+from .models import OutboxEmail
+
+logger = logging.getLogger(__name__)
+
+# the connection is still usable after these
+_MESSAGE_ERRORS = (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused, smtplib.SMTPDataError)
+
+
+def queue_email(to, subject, body):
+    email = OutboxEmail.objects.create(to=to, subject=subject, body=body)
+    transaction.on_commit(_sender.wake)
+    return email
+
+
+class Mailer:
+    """
+    One SMTP connection, opened on first use and reopened after a
+    connection-level failure.
+    """
+
+    def __init__(self):
+        self.connection = None
+        self.last_used = 0.0
+
+    def send(self, email):
+        message = EmailMessage(subject=email.subject, body=email.body, to=[email.to])
+        reused = self.connection is not None
+        try:
+            self._send(message)
+        except smtplib.SMTPServerDisconnected:
+            if not reused:
+                raise
+            # the server dropped the connection while it was idle
+            self._send(message)
+
+    def _send(self, message):
+        if self.connection is None:
+            self.connection = get_connection(fail_silently=False)
+            self.connection.open()
+            metrics.inc("outbox.connections_total")
+        try:
+            self.connection.send_messages([message])
+        except _MESSAGE_ERRORS:
+            raise
+        except Exception:
+            self.close()
+            raise
+        finally:
+            self.last_used = time.monotonic()
+
+    def close(self):
+        if self.connection is not None:
+            try:
+                self.connection.close()
+            except Exception:
+                pass
+            self.connection = None
+
+
+def _claim():
+    now = timezone.now()
+    due = OutboxEmail.objects.filter(status="PENDING", next_attempt_at__lte=now)
+    ids = list(due.order_by("next_attempt_at", "id").values_list("id", flat=True)[:settings.OCR_OUTBOX_BATCH])
+    if not ids:
+        return []
+    token = uuid.uuid4().hex
+    # rows another sender claimed first no longer match `due`
+    due.filter(id__in=ids).update(
+        claim=token, next_attempt_at=now + timedelta(seconds=settings.OCR_OUTBOX_LEASE_SECONDS)
+    )
+    return list(OutboxEmail.objects.filter(claim=token).order_by("id"))
+
+
+def _retry_at(attempts):
+    return timezone.now() + timedelta(seconds=settings.OCR_OUTBOX_RETRY_DELAY * 2 ** (attempts - 1))
+
+
+def send_pending(mailer):
+    """
+    Send one batch of due messages through `mailer`; returns how many
+    were claimed.
+    """
+    batch = _claim()
+    sent = []
+    for email in batch:
+        try:
+            mailer.send(email)
+        except Exception as e:
+            email.attempts += 1
+            email.last_error = str(e)[:1000]
+            if email.attempts >= settings.OCR_OUTBOX_MAX_ATTEMPTS:
+                email.status = "FAILED"
+                metrics.inc("outbox.failed_total")
+                logger.error("Giving up on outbox email %s to %s: %s", email.id, email.to, e)
+            else:
+                email.next_attempt_at = _retry_at(email.attempts)
+                metrics.inc("outbox.retries_total")
+            email.claim = ""
+            email.save(update_fields=["attempts", "last_error", "status", "next_attempt_at", "claim"])
+            continue
+        sent.append(email.id)
+
+    if sent:
+        OutboxEmail.objects.filter(id__in=sent).update(status="SENT", sent_at=timezone.now(), claim="")
+        metrics.inc("outbox.sent_total", len(sent))
+    return len(batch)
+
+
+class _Sender:
+    """
+    The process's sender thread, started by the first wake().
+    """
+
+    def __init__(self):
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def wake(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._loop, name="email-outbox", daemon=True)
+                self._thread.start()
+        self._event.set()
+
+    def _loop(self):
+        mailer = Mailer()
+        while True:
+            self._event.wait(settings.OCR_OUTBOX_POLL_SECONDS)
+            self._event.clear()
+            try:
+                while send_pending(mailer) == settings.OCR_OUTBOX_BATCH:
+                    pass
+            except Exception:
+                logger.exception("Email outbox pass failed")
+            finally:
+                close_old_connections()
+            if mailer.connection is not None and time.monotonic() - mailer.last_used > settings.OCR_OUTBOX_IDLE_SECONDS:
+                mailer.close()
+
+
+_sender = _Sender()
@@ -0,0 +1,121 @@
+"""
+Keyset (cursor) pagination and table export for PassportRecord.
+
+Pages are "rows with id > after, in id order, at most limit", which
+the primary key index answers in time proportional to the page, not
+to the offset, and which stays consistent while rows are added.
+Exports walk the table the same way through QuerySet.iterator(), so
+the response is written while rows are read and never held whole.
+"""
+import csv
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from rest_framework.exceptions import ValidationError
+
+from .models import PassportRecord
+
+MAX_BATCH_IDS = 500
+EXPORT_CHUNK = 2000
+
+
+def int_param(request, name, default, minimum=0, maximum=None):
+    value = request.query_params.get(name)
+    if value in (None, ""):
+        return default
+    try:
+        value = int(value)
+    except ValueError:
+        raise ValidationError({name: "must be an integer"})
+    if value < minimum:
+        raise ValidationError({name: f"must be at least {minimum}"})
+    if maximum is not None and value > maximum:
+        raise ValidationError({name: f"must be at most {maximum}"})
+    return value
+
+
+def filtered_records(request):
+    """
+    PassportRecords narrowed by ?status= and ?ocr_status=.
+    """
+    records = PassportRecord.objects.all()
+    for field in ("status", "ocr_status"):
+        value = request.query_params.get(field)
+        if value:
+            records = records.filter(**{field: value.upper()})
+    return records
+
+
+def keyset_page(queryset, request, default_limit, max_limit):
+    """
+    (rows, next_after) for ?after=<id>&limit=<n>. `next_after` is the
+    `after` of the following page, or None on the last one.
+    """
+    after = int_param(request, "after", 0)
+    limit = int_param(request, "limit", default_limit, minimum=1, maximum=max_limit)
+
+    # one extra row says whether there is a next page, without a count
+    rows = list(queryset.filter(id__gt=after).order_by("id")[:limit + 1])
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        return rows, last if isinstance(last, int) else last.id
+    return rows, None
+
+
+def batch_ids(request):
+    """
+    The ids of ?ids=1,2,3 (at most MAX_BATCH_IDS), or None if absent.
+    """
+    raw = request.query_params.get("ids")
+    if raw is None:
+        return None
+    try:
+        ids = list(dict.fromkeys(int(i) for i in raw.split(",") if i.strip()))
+    except ValueError:
+        raise ValidationError({"ids": "must be comma-separated integers"})
+    if len(ids) > MAX_BATCH_IDS:
+        raise ValidationError({"ids": f"at most {MAX_BATCH_IDS} ids per request"})
+    return ids
+
+
+# -------------------------------------------------------
+#               EXPORT
+# -------------------------------------------------------
+
+EXPORT_FIELDS = [f.attname for f in PassportRecord._meta.concrete_fields]
+JSON_FIELDS = {"extracted_data", "verification_results"}
+
+
+def export_rows(queryset):
+    """
+    Records as dicts of EXPORT_FIELDS (files as storage names), read
+    EXPORT_CHUNK at a time.
+    """
+    return queryset.order_by("id").values(*EXPORT_FIELDS).iterator(chunk_size=EXPORT_CHUNK)
+
+
+def ndjson_lines(rows):
+    for row in rows:
+        yield json.dumps(row, cls=DjangoJSONEncoder, ensure_ascii=False) + "\n"
+
+
+class _Line:
+    # csv.writer target that hands back what was written
+    def write(self, value):
+        return value
+
+
+def _csv_value(field, value):
+    if field in JSON_FIELDS:
+        return "" if value is None else json.dumps(value, cls=DjangoJSONEncoder, ensure_ascii=False)
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    return value
+
+
+def csv_lines(rows):
+    writer = csv.writer(_Line())
+    yield writer.writerow(EXPORT_FIELDS)
+    for row in rows:
+        yield writer.writerow([_csv_value(f, row[f]) for f in EXPORT_FIELDS])
@@ -0,0 +1,72 @@
+"""
+Sampled per-request resource profiling.
+
+OCR_PROFILE_SAMPLE_RATE of the requests under OCR_PROFILE_PATH_PREFIX
+run with an ml.profiling.Profiler in context: the pipeline's stages
+(load, detect, preprocess, recognize, fields, ...) add their wall
+time, CPU time and RSS change to it, and the request adds peak RSS
+growth, tracemalloc's top allocators and CUDA allocator counters. The
+result is stored as a RequestProfile (newest OCR_PROFILE_KEEP kept)
+and served to admin users by /api/profiles/. Requests not sampled pay
+for one random() call.
+"""
+import logging
+import random
+
+from django.conf import settings
+
+from . import metrics
+from .sampling import SampledContextMiddleware
+
+logger = logging.getLogger(__name__)
+
+
+def _pipeline_profiling():
+    from ml import profiling
+    return profiling
+
+
+def _sampled(request):
+    rate = settings.OCR_PROFILE_SAMPLE_RATE
+    return (
+        rate > 0
+        and request.path.startswith(settings.OCR_PROFILE_PATH_PREFIX)
+        and random.random() < rate
+    )
+
+
+def save_profile(request, status_code, record):
+    from .models import RequestProfile
+
+    try:
+        profile = RequestProfile.objects.create(
+            method=request.method,
+            path=request.path[:255],
+            status_code=status_code,
+            wall_ms=record["wall_ms"],
+            cpu_ms=record["cpu_ms"],
+            peak_rss_growth_bytes=record["peak_rss_growth_bytes"],
+            data=record,
+        )
+        # bounded: drop everything older than the newest OCR_PROFILE_KEEP
+        RequestProfile.objects.filter(id__lte=profile.id - settings.OCR_PROFILE_KEEP).delete()
+    except Exception:
+        logger.exception("Could not store request profile for %s", request.path)
+        return
+    metrics.inc("profiling.recorded_total")
+
+
+class ProfilingMiddleware(SampledContextMiddleware):
+    @property
+    def var(self):
+        return _pipeline_profiling().current_profile
+
+    def begin(self, request):
+        if not _sampled(request):
+            return None
+        return _pipeline_profiling().Profiler(settings.OCR_PROFILE_TOP_ALLOCATORS).start()
+
+    def finish(self, request, response, profiler):
+        record = profiler.finish()
+        if response is not None:
+            save_profile(request, response.status_code, record)
@@ -0,0 +1,98 @@
+"""
+Reviewer queue: PassportRecords to look at, oldest first.
+
+Each filter the queue takes is an equality column of one of
+PassportRecord's composite indexes, all ending in created_at, so the
+database reads the index in queue order for both the date range and
+the ORDER BY and stops after one page: no table scan and no sort,
+however large the table grows. Pages resume after the (created_at, id)
+of the previous page's last record.
+"""
+from datetime import datetime, time, timedelta
+
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from rest_framework.exceptions import ValidationError
+
+from .models import STATUS_CHOICE, VERIFICATION_OUTCOME_CHOICES, PassportRecord
+from .pagination import int_param
+
+STATUSES = tuple(value for value, _ in STATUS_CHOICE)
+OUTCOMES = tuple(value for value, _ in VERIFICATION_OUTCOME_CHOICES)
+
+
+def _date_param(request, name):
+    value = request.query_params.get(name)
+    if not value:
+        return None
+    day = parse_date(value)
+    if day is None:
+        raise ValidationError({name: "must be a date (YYYY-MM-DD)"})
+    return day
+
+
+def _start_of(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def queue_records(request):
+    """
+    Records for ?status= (default PENDING, `any` for all), ?state=,
+    ?outcome= and ?from= / ?to= (inclusive dates), in queue order.
+    """
+    records = PassportRecord.objects.all()
+
+    status = request.query_params.get("status", "PENDING").upper()
+    if status != "ANY":
+        if status not in STATUSES:
+            raise ValidationError({"status": f"must be one of {', '.join(STATUSES)} or any"})
+        records = records.filter(status=status)
+
+    state = request.query_params.get("state")
+    if state:
+        # exact, so the index applies; states are stored as chosen in the form
+        records = records.filter(present_state=state)
+
+    outcome = request.query_params.get("outcome")
+    if outcome:
+        outcome = outcome.upper()
+        if outcome not in OUTCOMES:
+            raise ValidationError({"outcome": f"must be one of {', '.join(OUTCOMES)}"})
+        records = records.filter(verification_outcome=outcome)
+
+    start = _date_param(request, "from")
+    end = _date_param(request, "to")
+    if start and end and start > end:
+        raise ValidationError({"to": "must not be before from"})
+    # ranges on the column itself; created_at__date would hide it from the index
+    if start:
+        records = records.filter(created_at__gte=_start_of(start))
+    if end:
+        records = records.filter(created_at__lt=_start_of(end + timedelta(days=1)))
+
+    return records.order_by("created_at", "id")
+
+
+def queue_page(records, request, default_limit=50, max_limit=200):
+    """
+    (rows, next_after) for ?after=<id>&limit=<n>, like
+    pagination.keyset_page but in (created_at, id) order.
+    """
+    after = int_param(request, "after", 0)
+    limit = int_param(request, "limit", default_limit, minimum=1, maximum=max_limit)
+
+    if after:
+        created_at = PassportRecord.objects.filter(id=after).values_list("created_at", flat=True).first()
+        if created_at is None:
+            raise ValidationError({"after": "no such record"})
+        # the >= keeps the condition an index range; the OR only breaks ties
+        records = records.filter(
+            Q(created_at__gte=created_at) & (Q(created_at__gt=created_at) | Q(id__gt=after))
+        )
+
+    rows = list(records[:limit + 1])
+    if len(rows) > limit:
+        rows = rows[:limit]
+        return rows, rows[-1].id
+    return rows, None
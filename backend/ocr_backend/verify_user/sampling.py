@@ -0,0 +1,106 @@
+"""
+Base for middleware that runs some requests with a value in a
+ContextVar (a profiler, a debug capture) and finishes it afterwards.
+"""
+import contextvars
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+
+
+class _ContextStream:
+    # Streaming views do their work while the response is iterated:
+    # every chunk is produced inside the request's context, and
+    # `finish` runs when Django closes the response.
+    def __init__(self, iterable, context, finish):
+        self._iterator = iter(iterable)
+        self._context = context
+        self._finish = finish
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return self._context.run(next, self._iterator)
+
+    def close(self):
+        if self._finish:
+            self._finish()
+            self._finish = None
+
+
+class SampledContextMiddleware:
+    """
+    Subclasses provide `var` (the ContextVar) and implement begin()
+    and finish().
+    """
+    sync_capable = True
+    async_capable = True
+    var = None
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def begin(self, request):
+        """
+        The value to run `request` with, or None to leave it alone.
+        """
+        raise NotImplementedError
+
+    def respond(self, request, response, value):
+        """
+        Called with the response before it is returned, e.g. to add
+        headers.
+        """
+
+    def finish(self, request, response, value):
+        """
+        Called once the response is complete; `response` is None if
+        the view raised.
+        """
+        raise NotImplementedError
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        value = self.begin(request)
+        if value is None:
+            return self.get_response(request)
+
+        context = contextvars.copy_context()
+        context.run(self.var.set, value)
+        try:
+            response = context.run(self.get_response, request)
+        except BaseException:
+            self.finish(request, None, value)
+            raise
+        self.respond(request, response, value)
+
+        def done():
+            self.finish(request, response, value)
+
+        if response.streaming and not response.is_async:
+            response.streaming_content = _ContextStream(response.streaming_content, context, done)
+        else:
+            done()
+        return response
+
+    async def __acall__(self, request):
+        value = self.begin(request)
+        if value is None:
+            return await self.get_response(request)
+
+        token = self.var.set(value)
+        try:
+            response = await self.get_response(request)
+        except BaseException:
+            await sync_to_async(self.finish)(request, None, value)
+            raise
+        finally:
+            self.var.reset(token)
+        self.respond(request, response, value)
+
+        # async streams are covered up to the first byte only
+        await sync_to_async(self.finish)(request, response, value)
+        return response
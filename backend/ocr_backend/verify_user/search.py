@@ -0,0 +1,192 @@
+"""
+Full-text search over PassportRecord names, cities and addresses.
+
+The backend is OCR_SEARCH_BACKEND (a dotted class path). FTS5Backend
+keeps an SQLite FTS5 table, verify_user_passportsearch (migration
+0013), with one row per record under the record's id: an inverted
+index with prefix indexes, so a lookup costs in proportion to the
+records it finds, and BM25 ranks them with names weighted over cities
+over addresses. SubstringBackend is the plain icontains search for
+databases without FTS5.
+
+Records are indexed on save and dropped on delete (connect_signals,
+from AppConfig.ready). bulk_create() and QuerySet.update() send no
+signals: callers index such records with index_many(), or run
+`manage.py rebuild_search_index` after loading records that way.
+"""
+import re
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q
+from django.db.models.signals import post_delete, post_save
+from django.utils.module_loading import import_string
+
+from .models import PassportRecord
+
+# fields whose change needs the record re-indexed
+NAME_FIELDS = ("first_name", "middle_name", "last_name")
+CITY_FIELDS = ("present_city", "permanent_city")
+ADDRESS_FIELDS = (
+    "present_address_line", "present_state", "present_pincode",
+    "permanent_address_line", "permanent_state", "permanent_pincode",
+)
+SEARCH_FIELDS = frozenset(NAME_FIELDS + CITY_FIELDS + ADDRESS_FIELDS)
+
+MAX_TERMS = 8
+MAX_RESULTS = 1000
+
+
+def terms(query):
+    """
+    The words of a search box query, at most MAX_TERMS.
+    """
+    return re.findall(r"\w+", query.lower())[:MAX_TERMS]
+
+
+def _join(record, fields):
+    return " ".join(v for v in (getattr(record, f) for f in fields) if v)
+
+
+class SearchBackend:
+    def index(self, record):
+        pass
+
+    def index_many(self, records):
+        for record in records:
+            self.index(record)
+
+    def remove(self, record_id):
+        pass
+
+    def rebuild(self):
+        """
+        Re-index every record; returns how many there are.
+        """
+        return PassportRecord.objects.count()
+
+    def search(self, query, limit=20):
+        """
+        [(record id, score)], best first; every word of `query` must
+        start a word of the record.
+        """
+        raise NotImplementedError
+
+
+class FTS5Backend(SearchBackend):
+    table = "verify_user_passportsearch"
+    # bm25() column weights: name, city, address
+    weights = (10.0, 3.0, 1.0)
+
+    def index(self, record):
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {self.table} WHERE rowid = %s", [record.id])
+            cursor.execute(
+                f"INSERT INTO {self.table} (rowid, name, city, address) VALUES (%s, %s, %s, %s)",
+                [
+                    record.id,
+                    _join(record, NAME_FIELDS),
+                    _join(record, CITY_FIELDS),
+                    _join(record, ADDRESS_FIELDS),
+                ],
+            )
+
+    def index_many(self, records):
+        # new records only: nothing to delete first
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f"INSERT INTO {self.table} (rowid, name, city, address) VALUES (%s, %s, %s, %s)",
+                [
+                    (r.id, _join(r, NAME_FIELDS), _join(r, CITY_FIELDS), _join(r, ADDRESS_FIELDS))
+                    for r in records
+                ],
+            )
+
+    def remove(self, record_id):
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {self.table} WHERE rowid = %s", [record_id])
+
+    def rebuild(self):
+        def concat(fields):
+            return " || ' ' || ".join(f"coalesce({f}, '')" for f in fields)
+
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {self.table}")
+            # one statement: no rows travel through Python
+            cursor.execute(
+                f"INSERT INTO {self.table} (rowid, name, city, address) "
+                f"SELECT id, {concat(NAME_FIELDS)}, {concat(CITY_FIELDS)}, {concat(ADDRESS_FIELDS)} "
+                f"FROM {PassportRecord._meta.db_table}"
+            )
+            cursor.execute(f"INSERT INTO {self.table} ({self.table}) VALUES ('optimize')")
+            cursor.execute(f"SELECT count(*) FROM {self.table}")
+            return cursor.fetchone()[0]
+
+    def search(self, query, limit=20):
+        words = terms(query)
+        if not words:
+            return []
+        # quoted prefix terms, implicitly ANDed; \w+ words need no escaping
+        match = " ".join(f'"{w}"*' for w in words)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT rowid, rank FROM {self.table} "
+                f"WHERE {self.table} MATCH %s AND rank MATCH %s "
+                f"ORDER BY rank LIMIT %s",
+                [match, "bm25({})".format(", ".join(map(str, self.weights))), limit],
+            )
+            # bm25 is lower for better matches
+            return [(record_id, -rank) for record_id, rank in cursor.fetchall()]
+
+
+class SubstringBackend(SearchBackend):
+    """
+    Unindexed icontains over the search fields, newest first.
+    """
+
+    def search(self, query, limit=20):
+        words = terms(query)
+        if not words:
+            return []
+        records = PassportRecord.objects.all()
+        for word in words:
+            match = Q()
+            for field in SEARCH_FIELDS:
+                match |= Q(**{f"{field}__icontains": word})
+            records = records.filter(match)
+        return [(record_id, None) for record_id in records.order_by("-id").values_list("id", flat=True)[:limit]]
+
+
+_backends = {}
+
+
+def get_backend():
+    path = settings.OCR_SEARCH_BACKEND
+    if path not in _backends:
+        _backends[path] = import_string(path)()
+    return _backends[path]
+
+
+def search_records(query, limit=20):
+    """
+    [(PassportRecord, score)] for `query`, best first.
+    """
+    hits = get_backend().search(query, limit)
+    found = PassportRecord.objects.in_bulk([record_id for record_id, _ in hits])
+    return [(found[record_id], score) for record_id, score in hits if record_id in found]
+
+
+def _saved(sender, instance, update_fields=None, **kwargs):
+    # enrichment and status changes save other fields only
+    if update_fields is not None and not SEARCH_FIELDS.intersection(update_fields):
+        return
+    get_backend().index(instance)
+
+
+def _deleted(sender, instance, **kwargs):
+    get_backend().remove(instance.id)
+
+
+def connect_signals():
+    post_save.connect(_saved, sender=PassportRecord, dispatch_uid="passport_search_index")
+    post_delete.connect(_deleted, sender=PassportRecord, dispatch_uid="passport_search_remove")
@@ -1,10 +1,41 @@
 from rest_framework import serializers
+from .documents import PROOF_FIELDS
 from .models import PassportRecord
 
 class PassportReportSerializer(serializers.ModelSerializer):
     class Meta:
         model=PassportRecord
         fields="__all__"
+        read_only_fields=("ocr_status","verification_outcome","proof_sources","media_status")
+
+    def to_representation(self, instance):
+        data=super().to_representation(instance)
+        # staged proofs have no URL yet (storage.py); media_status says when they do
+        if instance.media_status!="STORED":
+            for field in PROOF_FIELDS:
+                data[field]=None
+        return data
+
+class ReviewQueueSerializer(serializers.ModelSerializer):
+    class Meta:
+        model=PassportRecord
+        fields=("id","first_name","middle_name","last_name","dob","gender","present_state",
+                "status","ocr_status","verification_outcome","created_at")
+
+class PassportSearchSerializer(ReviewQueueSerializer):
+    class Meta(ReviewQueueSerializer.Meta):
+        fields=ReviewQueueSerializer.Meta.fields+("present_city",)
+
+class PassportBulkRecordSerializer(serializers.ModelSerializer):
+    # proofs by URL, copied into storage after the import (bulk.py)
+    name_gender_proof=serializers.URLField()
+    dob_proof=serializers.URLField()
+    address_proof=serializers.URLField()
+
+    class Meta:
+        model=PassportRecord
+        exclude=("status","extracted_data","verification_results","ocr_status",
+                 "verification_outcome","proof_sources","media_status","created_at")
 
 class EmailSerializer(serializers.Serializer):
     email=serializers.EmailField()
@@ -13,7 +44,7 @@ class OTPVerifySerializer(serializers.Serializer):
     email=serializers.EmailField()
     otp=serializers.CharField(max_length=6)
 
-class DocumentVerifySerializer(serializers.Serializer):
+class UserDetailsSerializer(serializers.Serializer):
     # --- Personal Details ---
     first_name = serializers.CharField()
     middle_name = serializers.CharField(required=False, allow_null=True, allow_blank=True)
@@ -28,7 +59,16 @@ class DocumentVerifySerializer(serializers.Serializer):
     permanent_pincode = serializers.CharField()
     permanent_country = serializers.CharField()
 
+
+class DocumentVerifySerializer(UserDetailsSerializer):
     # --- Documents (3 required docs) ---
     dob_proof = serializers.FileField()
     name_gender_proof= serializers.FileField()
     address_proof = serializers.FileField()
+
+
+class DocumentReverifySerializer(UserDetailsSerializer):
+    # --- Content hashes returned by /verify-documents/ ---
+    dob_proof_hash = serializers.CharField(max_length=64)
+    name_gender_proof_hash = serializers.CharField(max_length=64)
+    address_proof_hash = serializers.CharField(max_length=64)
@@ -0,0 +1,157 @@
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
+
+from django.conf import settings
+
+from . import metrics
+
+
+class SpoolFull(Exception):
+    """
+    The on-disk spool area has no room left for this upload.
+    """
+
+
+_lock = threading.Lock()
+_disk_bytes = 0
+_disk_files = 0
+
+
+def _reserve(size):
+    global _disk_bytes, _disk_files
+    with _lock:
+        if _disk_bytes + size > settings.UPLOAD_SPOOL_MAX_DISK:
+            metrics.inc("spool.rejected_total")
+            raise SpoolFull(f"Upload spool is full ({_disk_bytes} bytes in use)")
+        _disk_bytes += size
+        _disk_files += 1
+        _publish()
+
+
+def _release(size):
+    global _disk_bytes, _disk_files
+    with _lock:
+        _disk_bytes -= size
+        _disk_files -= 1
+        _publish()
+
+
+def _publish():
+    metrics.set_gauge("spool.disk_bytes", _disk_bytes)
+    metrics.set_gauge("spool.disk_files", _disk_files)
+    metrics.track_max("spool.disk_bytes_peak", _disk_bytes)
+
+
+def _write_spool_file(chunks, suffix):
+    fd, path = tempfile.mkstemp(suffix=suffix, dir=settings.UPLOAD_SPOOL_DIR)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            for chunk in chunks:
+                f.write(chunk)
+    except BaseException:
+        os.unlink(path)
+        raise
+    return path
+
+
+class SpooledUpload:
+    """
+    An upload held in RAM when small, or in the bounded spool
+    directory (tmpfs where available) when large.
+    """
+
+    def __init__(self, source, name=None):
+        if isinstance(source, (bytes, bytearray, memoryview)):
+            data = bytes(source)
+            self.name = name or "upload"
+            self.size = len(data)
+        else:
+            data = None
+            self.name = name or source.name
+            self.size = source.size
+
+        self.suffix = os.path.splitext(self.name)[1].lower()
+        self._source = source
+        self._data = None
+        self._path = None
+        self._owns_path = False
+        self._reserved = 0
+
+        if self.size <= settings.UPLOAD_SPOOL_MAX_MEMORY:
+            self._data = data if data is not None else source.read()
+            metrics.inc("spool.memory_total")
+            return
+
+        _reserve(self.size)
+        self._reserved = self.size
+        metrics.inc("spool.spilled_total")
+
+        if hasattr(source, "temporary_file_path"):
+            # Django already streamed it into FILE_UPLOAD_TEMP_DIR (the spool dir)
+            self._path = source.temporary_file_path()
+        else:
+            chunks = [data] if data is not None else source.chunks()
+            try:
+                self._path = _write_spool_file(chunks, self.suffix)
+            except BaseException:
+                # no close() follows a failed constructor
+                _release(self._reserved)
+                self._reserved = 0
+                raise
+            self._owns_path = True
+
+    def read(self):
+        if self._data is not None:
+            return self._data
+        with open(self._path, "rb") as f:
+            return f.read()
+
+    @contextmanager
+    def path(self):
+        """
+        A filesystem path to the upload, for consumers that only take
+        paths. RAM-held uploads are written out only for the duration
+        of the block.
+        """
+        if self._path is not None:
+            yield self._path
+            return
+
+        _reserve(self.size)
+        try:
+            path = _write_spool_file([self._data], self.suffix)
+        except BaseException:
+            _release(self.size)
+            raise
+        try:
+            yield path
+        finally:
+            os.unlink(path)
+            _release(self.size)
+
+    def close(self):
+        if self._owns_path and self._path is not None:
+            os.unlink(self._path)
+        elif self._path is not None:
+            # TemporaryUploadedFile deletes its file on close
+            self._source.close()
+        if self._reserved:
+            _release(self._reserved)
+            self._reserved = 0
+        self._path = None
+        self._data = None
+
+
+@contextmanager
+def spool(source, name=None):
+    """
+    Hold an UploadedFile or raw bytes for one request and always
+    clean up after it.
+    """
+    upload = SpooledUpload(source, name)
+    try:
+        yield upload
+    finally:
+        upload.close()
@@ -0,0 +1,82 @@
+"""
+Media storage that answers uploads from local disk.
+
+StagedStorage writes every saved file to OCR_STAGING_DIR and returns
+at disk speed; the remote storage (Cloudinary by default) is only
+written by upload(), which tasks.upload_media runs in the background
+for each new PassportRecord (media_status STAGED -> STORED) before
+pointing the record's fields at the remote names. Reads and deletes
+go to the staged copy while it exists and to the remote storage after
+that, so the rest of the code never asks where a file is; but the
+remote name may differ, so a name read before the upload must be
+read again once its staged copy is gone (tasks._open_proof). Staged
+copies are not served: url() is None until the file is uploaded, and
+the API shows the proofs of records not yet STORED as null.
+
+The staging directory must outlive restarts: records still STAGED or
+FAILED there are uploaded by `manage.py upload_media`. It must also be
+one disk shared by every worker, since the upload and later reads may
+run in a different process (or host) than the request that staged the
+file.
+"""
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage, Storage, default_storage
+from django.utils.module_loading import import_string
+
+
+class StagedStorage(Storage):
+    def __init__(self, remote=None, remote_options=None, location=None):
+        remote = remote or settings.OCR_MEDIA_REMOTE_BACKEND
+        self.remote = (import_string(remote) if isinstance(remote, str) else remote)(**(remote_options or {}))
+        self.staging = FileSystemStorage(location=location or settings.OCR_STAGING_DIR)
+
+    def is_staged(self, name):
+        return bool(name) and self.staging.exists(name)
+
+    def get_available_name(self, name, max_length=None):
+        # the remote name is chosen at upload; asking the remote store
+        # here would put a round trip back on the request
+        return self.staging.get_available_name(name, max_length)
+
+    def _save(self, name, content):
+        return self.staging._save(name, content)
+
+    def _open(self, name, mode="rb"):
+        if self.is_staged(name):
+            try:
+                return self.staging._open(name, mode)
+            except FileNotFoundError:
+                # uploaded and discarded in between
+                pass
+        return self.remote._open(name, mode)
+
+    def upload(self, name):
+        """
+        Copy staged `name` to the remote storage; returns the remote
+        name, which may differ.
+        """
+        with self.staging.open(name, "rb") as f:
+            return self.remote.save(name, f)
+
+    def discard(self, name):
+        self.staging.delete(name)
+
+    def delete(self, name):
+        if self.is_staged(name):
+            self.staging.delete(name)
+        else:
+            self.remote.delete(name)
+
+    def exists(self, name):
+        return self.is_staged(name) or self.remote.exists(name)
+
+    def size(self, name):
+        return self.staging.size(name) if self.is_staged(name) else self.remote.size(name)
+
+    def url(self, name):
+        # nothing serves the staging directory
+        return None if self.is_staged(name) else self.remote.url(name)
+
+
+def staging_enabled():
+    return isinstance(default_storage, StagedStorage)
@@ -0,0 +1,202 @@
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from . import duplicates, metrics
+from .fetch import fetch_many
+from .models import PassportRecord
+from .documents import PROOF_FIELDS, proof_lines, read_proof, record_user_details, verification_outcome
+from .storage import staging_enabled
+
+logger = logging.getLogger(__name__)
+
+# In-process queue; records left PENDING (or stuck PROCESSING) by a
+# restart are picked up again by `manage.py enrich_records`.
+_executor = ThreadPoolExecutor(
+    max_workers=settings.OCR_BACKGROUND_WORKERS,
+    thread_name_prefix="ocr-enrich",
+)
+# remote media uploads, OCR_UPLOAD_WORKERS at a time; records left
+# STAGED by a restart are uploaded by `manage.py upload_media`
+_uploads = ThreadPoolExecutor(
+    max_workers=settings.OCR_UPLOAD_WORKERS,
+    thread_name_prefix="media-upload",
+)
+
+
+def enqueue(func, *args, pool=None):
+    """
+    Run `func(*args)` on the background pool (or `pool`) once the
+    current transaction commits.
+    """
+    pool = pool or _executor
+    transaction.on_commit(lambda: pool.submit(_run, func, *args))
+
+
+def enqueue_upload(record_id):
+    enqueue(upload_media, record_id, pool=_uploads)
+
+
+def _run(func, *args):
+    try:
+        func(*args)
+    except Exception:
+        logger.exception("Background task %s failed", func.__name__)
+    finally:
+        close_old_connections()
+
+
+def stale_processing_before():
+    """
+    Records claimed for enrichment before this were abandoned.
+    """
+    return timezone.now() - timedelta(seconds=settings.OCR_ENRICH_STALE_SECONDS)
+
+
+def _open_proof(record, field):
+    """
+    Open proof `field` of `record`, also when upload_media has moved it
+    to the remote storage, possibly under another name, since `record`
+    was read.
+    """
+    name = getattr(record, field).name
+    if staging_enabled() and record.media_status != "STORED":
+        try:
+            return default_storage.staging.open(name, "rb")
+        except FileNotFoundError:
+            # upload_media points the row at the remote name before it
+            # discards the staged copy
+            record.refresh_from_db(fields=[field, "media_status"])
+    return getattr(record, field).open("rb")
+
+
+def enrich_passport_record(record_id):
+    """
+    OCR and verify the three proofs of a PassportRecord and store
+    the results on it, so reviewers never wait on the models.
+    """
+    from ml.doc_verification import DocumentVerifier
+
+    updated = (
+        PassportRecord.objects
+        # bulk imports are enriched once attach_proofs has their files
+        .filter(id=record_id, proof_sources__isnull=True)
+        # another worker has it, unless that claim is stale
+        .exclude(ocr_status="PROCESSING", processing_since__gte=stale_processing_before())
+        .update(ocr_status="PROCESSING", processing_since=timezone.now())
+    )
+    if not updated:
+        return
+
+    record = PassportRecord.objects.get(id=record_id)
+
+    try:
+        proofs = {}
+        hashes = {}
+        for field in PROOF_FIELDS:
+            with _open_proof(record, field) as f:
+                hashes[field] = read_proof(f, proofs)
+
+        verifier = DocumentVerifier()
+        lines = proof_lines(verifier, proofs, decoding=settings.OCR_DECODING_PROFILES["verify_documents"])
+        duplicates.index_record(
+            record, {field: (digest, proofs[digest][1]) for field, digest in hashes.items()}
+        )
+
+        record.extracted_data = {
+            field: {"hash": digest, "lines": lines[digest]}
+            for field, digest in hashes.items()
+        }
+        details = record_user_details(record)
+        record.verification_results = verifier.match_details(
+            *(lines[hashes[field]] for field in PROOF_FIELDS),
+            details,
+        )
+        record.verification_outcome = verification_outcome(record.verification_results, details)
+        record.ocr_status = "DONE"
+    except Exception:
+        logger.exception("OCR enrichment failed for PassportRecord %s", record_id)
+        record.ocr_status = "FAILED"
+
+    record.save(update_fields=["extracted_data", "verification_results", "verification_outcome", "ocr_status"])
+
+
+def attach_proofs(record_ids):
+    """
+    Download the proofs of bulk-imported PassportRecords into storage
+    and enrich them. Records whose downloads fail keep their
+    proof_sources for `manage.py enrich_records` to try again.
+    """
+    records = PassportRecord.objects.filter(id__in=record_ids, proof_sources__isnull=False)
+    for record in records:
+        sources = record.proof_sources
+        bodies = fetch_many([sources[field] for field in PROOF_FIELDS])
+        failed = [body for body in bodies if isinstance(body, Exception)]
+        if failed:
+            logger.warning("Proofs of PassportRecord %s not attached: %s", record.id, failed[0])
+            continue
+
+        for field, body in zip(PROOF_FIELDS, bodies):
+            name = os.path.basename(urlsplit(sources[field]).path) or field
+            getattr(record, field).save(name, ContentFile(body), save=False)
+        record.proof_sources = None
+        record.media_status = "STAGED" if staging_enabled() else "STORED"
+        record.save(update_fields=[*PROOF_FIELDS, "proof_sources", "media_status"])
+        if record.media_status == "STAGED":
+            enqueue_upload(record.id)
+
+        if settings.OCR_BACKGROUND_ENRICHMENT:
+            enrich_passport_record(record.id)
+
+
+def _with_retries(func, *args):
+    # OCR_UPLOAD_RETRIES more attempts, waiting OCR_UPLOAD_RETRY_DELAY,
+    # then twice as long each time
+    for attempt in range(settings.OCR_UPLOAD_RETRIES + 1):
+        try:
+            return func(*args)
+        except Exception:
+            if attempt == settings.OCR_UPLOAD_RETRIES:
+                raise
+            metrics.inc("media.upload_retries_total")
+            time.sleep(settings.OCR_UPLOAD_RETRY_DELAY * 2 ** attempt)
+
+
+def upload_media(record_id):
+    """
+    Upload the staged proofs of a PassportRecord to the remote storage
+    and point the record at them. If a file still fails after its
+    retries the record is marked FAILED and keeps its staged files.
+    """
+    record = PassportRecord.objects.filter(id=record_id, media_status__in=["STAGED", "FAILED"]).first()
+    if record is None or not staging_enabled():
+        return
+
+    staged = {
+        field: getattr(record, field).name for field in PROOF_FIELDS
+        if default_storage.is_staged(getattr(record, field).name)
+    }
+    remote = {}
+    try:
+        for field, name in staged.items():
+            remote[field] = _with_retries(default_storage.upload, name)
+    except Exception:
+        logger.exception("Proofs of PassportRecord %s not uploaded", record_id)
+        metrics.inc("media.upload_failed_total")
+        PassportRecord.objects.filter(id=record_id).update(media_status="FAILED")
+        return
+
+    # update(), not save(): enrichment may be writing the same row
+    PassportRecord.objects.filter(id=record_id).update(**remote, media_status="STORED")
+    for name in staged.values():
+        default_storage.discard(name)
+    metrics.inc("media.uploaded_total", len(remote))
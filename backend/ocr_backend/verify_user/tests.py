@@ -1,3 +1,1802 @@
-from django.test import TestCase
+import asyncio
+import csv
+import datetime
+import importlib.util
+import io
+import json
+import math
+import os
+import shutil
+import socketserver
+import subprocess
+import tempfile
+import threading
+import time
+import types
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
 
-# Create your tests here.
+import cv2
+import numpy as np
+from django.contrib.auth.models import User
+from django.core.management import CommandError, call_command
+from django.core.files.storage import FileSystemStorage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from PIL import Image
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from ml import doc_verification, perceptual_hash, profiling
+from ocr_backend import cpu_layout, model_sharing
+from ml.doc_verification import DocumentVerifier
+from ml.debug_capture import DebugCapture, DebugStore
+from ml.line_crops import LinePreprocessor, pad_box
+from ml.line_layout import group_lines
+from . import admission, bulk, debug_capture, degradation, metrics, outbox, review, search, spool
+from .documents import proof_lines, verification_outcome
+from .models import DocumentFingerprint, DocumentOCR, EmailOTP, OutboxEmail, PassportRecord, RequestProfile
+from .storage import StagedStorage
+from .tasks import _open_proof, attach_proofs, enqueue, enrich_passport_record, upload_media
+from .fetch import fetch, fetch_many, afetch, FetchError, FetchTooLarge
+from .inference import run_inference
+
+
+# -------------------------------------------------------
+#               LOCAL HTTP STAND-IN
+# -------------------------------------------------------
+
+class _StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        if self.path == "/missing":
+            self.send_response(404)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        size = int(self.path.strip("/").split("?")[0] or 0)
+        body = b"x" * size
+        self.send_response(200)
+        if "chunked" in self.path:
+            # no Content-Length: the limit must be enforced while streaming
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            self.wfile.write(b"%x\r\n%s\r\n0\r\n\r\n" % (size, body))
+        else:
+            self.send_header("Content-Length", str(size))
+            self.end_headers()
+            self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@override_settings(URL_FETCH_MAX_BYTES=1000)
+class FetchTests(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), _StandInHandler)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.base = f"http://127.0.0.1:{cls.server.server_port}"
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def test_fetch_returns_body(self):
+        self.assertEqual(fetch(f"{self.base}/500"), b"x" * 500)
+
+    def test_declared_length_over_limit(self):
+        with self.assertRaises(FetchTooLarge):
+            fetch(f"{self.base}/5000")
+
+    def test_streamed_body_over_limit(self):
+        with self.assertRaises(FetchTooLarge):
+            fetch(f"{self.base}/5000?chunked")
+
+    def test_http_error(self):
+        with self.assertRaises(FetchError):
+            fetch(f"{self.base}/missing")
+
+    def test_fetch_many_keeps_order_and_errors(self):
+        results = fetch_many([f"{self.base}/10", f"{self.base}/missing", f"{self.base}/20"])
+        self.assertEqual(results[0], b"x" * 10)
+        self.assertIsInstance(results[1], FetchError)
+        self.assertEqual(results[2], b"x" * 20)
+
+    async def test_afetch_streams_with_limit(self):
+        self.assertEqual(await afetch(f"{self.base}/500"), b"x" * 500)
+        with self.assertRaises(FetchTooLarge):
+            await afetch(f"{self.base}/5000?chunked")
+
+
+# -------------------------------------------------------
+#               UPLOAD SPOOL
+# -------------------------------------------------------
+
+class SpoolTests(SimpleTestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir, ignore_errors=True)
+        self.enterContext(override_settings(
+            UPLOAD_SPOOL_DIR=self.dir, UPLOAD_SPOOL_MAX_MEMORY=10, UPLOAD_SPOOL_MAX_DISK=100,
+        ))
+
+    def assertNothingSpooled(self):
+        self.assertEqual((spool._disk_bytes, spool._disk_files), (0, 0))
+        self.assertEqual(os.listdir(self.dir), [])
+
+    def test_small_uploads_stay_in_memory(self):
+        with spool.spool(b"small", "a.png") as upload:
+            self.assertEqual(os.listdir(self.dir), [])
+            with upload.path() as path:
+                self.assertTrue(path.endswith(".png"))
+                with open(path, "rb") as f:
+                    self.assertEqual(f.read(), b"small")
+                self.assertEqual(spool._disk_bytes, 5)
+            self.assertEqual(upload.read(), b"small")
+        self.assertNothingSpooled()
+
+    def test_large_uploads_spill_within_the_cap(self):
+        with spool.spool(b"x" * 60, "a.jpg") as upload:
+            self.assertEqual(spool._disk_bytes, 60)
+            self.assertEqual(len(os.listdir(self.dir)), 1)
+            self.assertEqual(upload.read(), b"x" * 60)
+            with self.assertRaises(spool.SpoolFull):
+                spool.SpooledUpload(b"y" * 60)
+        self.assertNothingSpooled()
+
+        with spool.spool(SimpleUploadedFile("b.jpg", b"y" * 60)) as upload:
+            self.assertEqual(upload.read(), b"y" * 60)
+        self.assertNothingSpooled()
+
+    def test_failed_writes_release_their_reservation(self):
+        full = OSError(28, "No space left on device")
+        with mock.patch.object(spool, "_write_spool_file", side_effect=full):
+            with self.assertRaises(OSError):
+                spool.SpooledUpload(b"x" * 60)
+            self.assertNothingSpooled()
+
+            upload = spool.SpooledUpload(b"small")
+            with self.assertRaises(OSError):
+                with upload.path():
+                    pass
+            upload.close()
+        self.assertNothingSpooled()
+
+        # the room is still there
+        with spool.spool(b"x" * 100):
+            pass
+
+
+# -------------------------------------------------------
+#               ADMISSION CONTROL
+# -------------------------------------------------------
+
+def _far():
+    return time.monotonic() + 30
+
+
+class AdmissionGateTests(SimpleTestCase):
+    def test_waiters_are_admitted_in_arrival_order(self):
+        gate = admission.AdmissionGate("t", limit=1, queue=3)
+        gate.acquire(_far())
+        admitted = []
+
+        def wait(i):
+            gate.acquire(_far())
+            admitted.append(i)
+            gate.release()
+
+        threads = []
+        for i in range(3):
+            threads.append(threading.Thread(target=wait, args=(i,)))
+            threads[-1].start()
+            while gate.queued < i + 1:
+                time.sleep(0.001)
+        gate.release()
+        for thread in threads:
+            thread.join(5)
+
+        self.assertEqual(admitted, [0, 1, 2])
+        self.assertEqual((gate._active, gate.queued), (0, 0))
+
+    def test_full_queue_rejects_and_deadline_times_out(self):
+        gate = admission.AdmissionGate("t", limit=1, queue=1)
+        gate.acquire(_far())
+        with self.assertRaises(admission.AdmissionTimeout):
+            gate.acquire(time.monotonic() + 0.05)
+        self.assertEqual(gate.queued, 0)
+
+        waiter = threading.Thread(target=gate.acquire, args=(_far(),))
+        waiter.start()
+        while gate.queued < 1:
+            time.sleep(0.001)
+        with self.assertRaises(admission.AdmissionRejected):
+            gate.acquire(_far())
+        gate.release()
+        waiter.join(5)
+        gate.release()
+        self.assertEqual((gate._active, gate.queued), (0, 0))
+
+    async def test_async_waiters_are_admitted_in_arrival_order(self):
+        gate = admission.AdmissionGate("t", limit=1, queue=3)
+        await gate.acquire_async(_far())
+        admitted = []
+
+        async def wait(i):
+            await gate.acquire_async(_far())
+            admitted.append(i)
+            gate.release()
+
+        tasks = []
+        for i in range(3):
+            tasks.append(asyncio.create_task(wait(i)))
+            while gate.queued < i + 1:
+                await asyncio.sleep(0)
+        gate.release()
+        await asyncio.gather(*tasks)
+
+        self.assertEqual(admitted, [0, 1, 2])
+        self.assertEqual((gate._active, gate.queued), (0, 0))
+
+    async def test_async_timeout_and_cancel_leave_the_queue(self):
+        gate = admission.AdmissionGate("t", limit=1, queue=2)
+        await gate.acquire_async(_far())
+        with self.assertRaises(admission.AdmissionTimeout):
+            await gate.acquire_async(time.monotonic() + 0.05)
+
+        task = asyncio.create_task(gate.acquire_async(_far()))
+        while gate.queued < 1:
+            await asyncio.sleep(0)
+        task.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await task
+        self.assertEqual(gate.queued, 0)
+        gate.release()
+        self.assertEqual(gate._active, 0)
+
+
+@override_settings(OCR_ADMISSION_LIMITS={"test": (1, 1)}, OCR_REQUEST_DEADLINE=0.05, OCR_RETRY_AFTER=7)
+class AdmissionControlledTests(SimpleTestCase):
+    def setUp(self):
+        self.addCleanup(admission._gates.pop, "test", None)
+        self.gate = admission.get_gate("test")
+
+    def assertIdle(self):
+        self.assertEqual((self.gate._active, self.gate.queued), (0, 0))
+
+    def test_timed_out_request_gets_503_with_retry_after(self):
+        view = admission.admission_controlled("test")(lambda request: HttpResponse("ok"))
+        self.gate.acquire(_far())
+        response = view(None)
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response["Retry-After"], "7")
+        self.gate.release()
+
+        self.assertEqual(view(None).status_code, 200)
+        self.assertIdle()
+
+    def test_deadline_reaches_the_view(self):
+        deadlines = []
+
+        @admission.admission_controlled("test")
+        def view(request):
+            deadlines.append(admission.current_deadline.get())
+            return HttpResponse("ok")
+
+        started = time.monotonic()
+        view(None)
+        self.assertAlmostEqual(deadlines[0], started + 0.05, delta=0.05)
+        self.assertIsNone(admission.current_deadline.get())
+
+    def test_slot_released_when_the_view_raises(self):
+        @admission.admission_controlled("test")
+        def view(request):
+            raise ValueError("boom")
+
+        with self.assertRaises(ValueError):
+            view(None)
+        self.assertIdle()
+
+    def test_streaming_response_holds_the_slot_until_closed(self):
+        view = admission.admission_controlled("test")(lambda request: StreamingHttpResponse(iter([b"a", b"b"])))
+        response = view(None)
+        self.assertEqual(self.gate._active, 1)
+        self.assertEqual(b"".join(response.streaming_content), b"ab")
+        self.assertEqual(self.gate._active, 1)
+        response.close()
+        self.assertIdle()
+
+        # closed without being read, e.g. the client went away
+        view(None).close()
+        self.assertIdle()
+
+    async def test_async_view_past_its_deadline_gets_503(self):
+        @admission.admission_controlled("test")
+        async def view(request):
+            await asyncio.sleep(0.1)
+            # the request gave up meanwhile: the work is dropped
+            return JsonResponse({"result": await run_inference(lambda: "done")})
+
+        response = await view(None)
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response["Retry-After"], "7")
+        self.assertIdle()
+
+
+# -------------------------------------------------------
+#               QUALITY TIERS
+# -------------------------------------------------------
+
+@override_settings(
+    OCR_DEGRADATION_ENABLED=True,
+    OCR_DEGRADE_QUEUE_HIGH=4,
+    OCR_DEGRADE_QUEUE_LOW=1,
+    OCR_DEGRADE_LATENCY_HIGH=20.0,
+    OCR_DEGRADE_LATENCY_LOW=8.0,
+    OCR_DEGRADE_LATENCY_WINDOW=30.0,
+    OCR_DEGRADE_MIN_DWELL=10.0,
+)
+class DegradationControllerTests(SimpleTestCase):
+    def setUp(self):
+        self.now = 1000.0
+        self.gates = [types.SimpleNamespace(queued=0, latency_ewma=0.0, last_observed=0.0) for _ in range(2)]
+        self.enterContext(mock.patch.object(degradation, "all_gates", lambda: self.gates))
+        self.enterContext(mock.patch.object(degradation, "time", mock.Mock(monotonic=lambda: self.now)))
+        # the gauge is process-wide; give it back to the real controller
+        self.addCleanup(metrics.set_gauge, "degradation.tier", metrics.snapshot()["degradation.tier"])
+        self.controller = degradation.DegradationController()
+
+    def tier_at(self, now):
+        self.now = now
+        return self.controller.current_tier()
+
+    def test_steps_one_tier_per_dwell_each_way(self):
+        self.assertEqual(self.tier_at(1000), "full")
+
+        self.gates[1].queued = 4
+        self.assertEqual(self.tier_at(1001), "reduced")
+        self.assertEqual(self.tier_at(1010), "reduced")
+        self.assertEqual(self.tier_at(1011), "minimal")
+        # no tier below minimal
+        self.assertEqual(self.tier_at(1030), "minimal")
+
+        self.gates[1].queued = 1
+        self.assertEqual(self.tier_at(1035), "reduced")
+        self.assertEqual(self.tier_at(1044), "reduced")
+        self.assertEqual(self.tier_at(1045), "full")
+
+    def test_holds_between_the_thresholds(self):
+        self.gates[0].queued = 4
+        self.assertEqual(self.tier_at(1000), "reduced")
+        # neither high nor low
+        self.gates[0].queued = 2
+        self.assertEqual(self.tier_at(1100), "reduced")
+
+    def test_recent_latency_steps_down(self):
+        self.gates[0].latency_ewma, self.gates[0].last_observed = 25.0, 990.0
+        self.assertEqual(self.tier_at(1000), "reduced")
+        # still over LATENCY_LOW, so it does not step back up
+        self.gates[0].latency_ewma = 9.0
+        self.assertEqual(self.tier_at(1015), "reduced")
+
+    def test_stale_latency_is_ignored(self):
+        self.gates[0].latency_ewma, self.gates[0].last_observed = 25.0, 960.0
+        self.assertEqual(self.tier_at(1000), "full")
+
+        self.gates[0].last_observed = 980.0
+        self.assertEqual(self.tier_at(1000), "reduced")
+        # the gate went quiet: its latency no longer holds the tier down
+        self.assertEqual(self.tier_at(1020), "full")
+
+    def test_tier_gauge(self):
+        self.assertEqual(metrics.snapshot()["degradation.tier"], "full")
+        self.gates[0].queued = 9
+        self.tier_at(1000)
+        self.assertEqual(metrics.snapshot()["degradation.tier"], "reduced")
+        self.tier_at(1010)
+        self.assertEqual(metrics.snapshot()["degradation.tier"], "minimal")
+
+    def test_disabled(self):
+        self.gates[0].queued = 9
+        with override_settings(OCR_DEGRADATION_ENABLED=False):
+            self.assertEqual(self.tier_at(1000), "full")
+        self.assertEqual(self.tier_at(1000), "reduced")
+
+
+# -------------------------------------------------------
+#               WORKER LAYOUT
+# -------------------------------------------------------
+
+def _gunicorn_conf():
+    path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "gunicorn.conf.py")
+    spec = importlib.util.spec_from_file_location("gunicorn_conf", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+class CPULayoutTests(SimpleTestCase):
+    def setUp(self):
+        # 8 physical cores with their SMT siblings: (0, 8), (1, 9), ...
+        cores = [[c, c + 8] for c in range(8)]
+        self.enterContext(mock.patch.object(cpu_layout, "physical_cores", return_value=cores))
+
+    def test_workers_get_disjoint_cores(self):
+        layout = cpu_layout.plan_layout(3, cpus=list(range(16)))
+        self.assertEqual([slot["threads"] for slot in layout], [3, 3, 2])
+        self.assertEqual(layout[0]["cpus"], [0, 1, 2, 8, 9, 10])
+        cpus = [c for slot in layout for c in slot["cpus"]]
+        self.assertEqual(sorted(cpus), list(range(16)))
+
+    def test_default_worker_count(self):
+        self.assertEqual(len(cpu_layout.plan_layout(cores_per_worker=4, cpus=[0])), 2)
+        self.assertEqual(len(cpu_layout.plan_layout(cores_per_worker=16, cpus=[0])), 1)
+
+    def test_more_workers_than_cores_share_them(self):
+        layout = cpu_layout.plan_layout(10, cpus=list(range(16)))
+        self.assertEqual(len(layout), 10)
+        self.assertTrue(all(slot["threads"] == 1 and len(slot["cpus"]) == 16 for slot in layout))
+
+    def test_workers_beyond_the_layout_run_unpinned(self):
+        conf = _gunicorn_conf()
+        conf.LAYOUT = cpu_layout.plan_layout(2, cpus=list(range(16)))
+        server = mock.Mock(WORKERS={})
+        budgets = []
+        self.enterContext(mock.patch.object(conf, "apply_thread_budget", side_effect=lambda *a: budgets.append(a)))
+
+        for pid in (1, 2, 3):
+            worker = mock.Mock(spec=["pid"], pid=pid)
+            conf.pre_fork(server, worker)
+            conf.post_fork(server, worker)
+            server.WORKERS[pid] = worker
+        self.assertEqual([w.cpu_slot for w in server.WORKERS.values()], [0, 1, None])
+        self.assertEqual(budgets[2], (1,))
+
+        # a respawn takes the slot its predecessor left
+        del server.WORKERS[1]
+        worker = mock.Mock(spec=["pid"], pid=4)
+        conf.pre_fork(server, worker)
+        self.assertEqual(worker.cpu_slot, 0)
+
+
+_SMAPS_ROLLUP = """\
+00400000-7ffd3e5f6000 ---p 00000000 00:00 0                              [rollup]
+Rss:              300000 kB
+Pss:              120000 kB
+Shared_Clean:     200000 kB
+Shared_Dirty:       4000 kB
+Private_Clean:      6000 kB
+Private_Dirty:     90000 kB
+Swap:                  0 kB
+"""
+
+
+class WorkerMemoryTests(SimpleTestCase):
+    def test_parse_smaps_rollup(self):
+        usage = model_sharing.parse_smaps_rollup(_SMAPS_ROLLUP.splitlines())
+        self.assertEqual(usage, {
+            "rss": 300000 * 1024,
+            "pss": 120000 * 1024,
+            "shared": 204000 * 1024,
+            "unique": 96000 * 1024,
+        })
+
+    def test_parse_smaps_rollup_missing_fields(self):
+        usage = model_sharing.parse_smaps_rollup(["Rss: 8 kB"])
+        self.assertEqual(usage, {"rss": 8192, "pss": 0, "shared": 0, "unique": 0})
+
+    def test_memory_usage_of_unknown_pid(self):
+        self.assertIsNone(model_sharing.memory_usage(2**31))
+
+    def test_worker_pids(self):
+        children = [subprocess.Popen(["sleep", "30"]) for _ in range(2)]
+        for child in children:
+            self.addCleanup(child.wait)
+            self.addCleanup(child.kill)
+        pids = model_sharing.worker_pids(os.getpid())
+        self.assertLessEqual({child.pid for child in children}, set(pids))
+        self.assertEqual(pids, sorted(pids))
+
+    def test_pidfile_in_runtime_dir(self):
+        with mock.patch.dict(os.environ, {"XDG_RUNTIME_DIR": "/run/user/1000"}):
+            os.environ.pop("OCR_PIDFILE", None)
+            self.assertEqual(model_sharing.pidfile_path(), "/run/user/1000/ocr_backend-gunicorn.pid")
+            os.environ["OCR_PIDFILE"] = "/srv/ocr.pid"
+            self.assertEqual(model_sharing.pidfile_path(), "/srv/ocr.pid")
+
+    def test_command_reads_pidfile(self):
+        child = subprocess.Popen(["sleep", "30"])
+        self.addCleanup(child.wait)
+        self.addCleanup(child.kill)
+        pidfile = tempfile.NamedTemporaryFile("w", suffix=".pid", delete=False)
+        self.addCleanup(os.unlink, pidfile.name)
+        pidfile.write(f"{os.getpid()}\n")
+        pidfile.close()
+
+        out = io.StringIO()
+        with mock.patch.dict(os.environ, {"OCR_PIDFILE": pidfile.name}):
+            call_command("worker_memory", stdout=out)
+        rows = out.getvalue().splitlines()
+        self.assertEqual(rows[1].split()[0], f"{os.getpid()}*")
+        self.assertIn(str(child.pid), [row.split()[0] for row in rows])
+
+    def test_command_without_pidfile(self):
+        with mock.patch.dict(os.environ, {"OCR_PIDFILE": "/nonexistent/ocr.pid"}):
+            with self.assertRaisesMessage(CommandError, "/nonexistent/ocr.pid is not readable"):
+                call_command("worker_memory")
+
+
+# -------------------------------------------------------
+#               STREAMING OCR
+# -------------------------------------------------------
+
+_HAS_TORCH = all(importlib.util.find_spec(m) for m in ("torch", "transformers"))
+
+
+def _stub_pipeline():
+    # STUB_MODELS is read when handwritten_ocr is first imported
+    os.environ["OCR_STUB_MODELS"] = "True"
+    from ml import handwritten_ocr
+
+    if not handwritten_ocr.STUB_MODELS:
+        raise unittest.SkipTest("handwritten_ocr already loaded with real models")
+    return handwritten_ocr
+
+
+@unittest.skipUnless(_HAS_TORCH, "torch and transformers not installed")
+class StreamingOCRTests(TestCase):
+    def setUp(self):
+        _stub_pipeline()
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir, ignore_errors=True)
+        # small enough that the form goes through the disk spool
+        self.enterContext(override_settings(UPLOAD_SPOOL_DIR=self.dir, UPLOAD_SPOOL_MAX_MEMORY=10))
+
+    def _post(self):
+        upload = SimpleUploadedFile("form.png", _form_bytes(0), content_type="image/png")
+        return self.client.post("/api/handwritten/ocr/stream/?mode=ndjson", {"file": upload})
+
+    def test_events_in_order(self):
+        response = self._post()
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        body = b"".join(response.streaming_content).decode()
+        response.close()
+
+        events = [json.loads(line)["event"] for line in body.splitlines()]
+        self.assertEqual(events[:2], ["tier", "boxes"])
+        self.assertEqual(set(events[2:-1]), {"line"})
+        self.assertEqual(events[-1], "fields")
+        self.assertEqual(spool._disk_bytes, 0)
+
+    def test_unreadable_upload(self):
+        from ml.handwritten_ocr import handwritten_extract
+
+        error = {"error": "OCR failed or image unreadable 1"}
+        self.assertEqual(handwritten_extract(b"not an image"), error)
+        path = os.path.join(self.dir, "form.png")
+        with open(path, "wb") as f:
+            f.write(b"not an image")
+        self.assertEqual(handwritten_extract(path), error)
+
+    def test_unread_stream_releases_its_upload(self):
+        # the client went away before the first event
+        response = self._post()
+        self.assertGreater(spool._disk_bytes, 0)
+        response.close()
+        self.assertEqual(spool._disk_bytes, 0)
+        self.assertEqual(os.listdir(self.dir), [])
+
+
+class AsyncViewTests(SimpleTestCase):
+    async def test_quality_score(self):
+        from ml.quality_score import calc_scores
+
+        data = _form_bytes(0)
+        upload = SimpleUploadedFile("form.png", data, content_type="image/png")
+        response = await self.async_client.post("/api/async/quality-score/", {"file": upload})
+        self.assertEqual(response.status_code, 200)
+        expected = calc_scores(cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR))
+        self.assertEqual(response.json(), json.loads(json.dumps(expected, default=float)))
+
+    async def test_missing_file_is_400(self):
+        response = await self.async_client.post("/api/async/quality-score/", {})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {"error": "Upload a file"})
+
+    async def test_malformed_json_is_400(self):
+        for body, error in ((b"{not json", "Malformed JSON body"), (b"[1]", "JSON body must be an object")):
+            response = await self.async_client.post(
+                "/api/async/quality-score/", body, content_type="application/json"
+            )
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(response.json(), {"error": error})
+
+    async def test_get_is_405(self):
+        response = await self.async_client.get("/api/async/quality-score/")
+        self.assertEqual(response.status_code, 405)
+
+    @unittest.skipUnless(_HAS_TORCH, "torch and transformers not installed")
+    async def test_handwritten_ocr(self):
+        _stub_pipeline()
+        upload = SimpleUploadedFile("form.png", _form_bytes(0), content_type="image/png")
+        response = await self.async_client.post("/api/async/handwritten/ocr/", {"file": upload})
+        self.assertEqual(response.status_code, 200)
+        result = response.json()
+        self.assertEqual(response["X-OCR-Quality-Tier"], result["quality_tier"])
+        self.assertTrue(result["lines"])
+        self.assertEqual(spool._disk_bytes, 0)
+
+
+@unittest.skipUnless(_HAS_TORCH, "torch and transformers not installed")
+class ConfidenceTrackerTests(SimpleTestCase):
+    def setUp(self):
+        self.hw = _stub_pipeline()
+
+    def test_matches_compute_transition_scores(self):
+        import torch
+        from transformers import GPT2Config, GPT2LMHeadModel, LogitsProcessorList
+
+        config = GPT2Config(vocab_size=12, n_positions=32, n_embd=16, n_layer=1, n_head=2,
+                            bos_token_id=0, eos_token_id=2, pad_token_id=1)
+        ended = set()
+        for generation in ({"num_beams": 1}, {"num_beams": 4, "early_stopping": True}):
+            for seed in range(8):
+                torch.manual_seed(seed)
+                model = GPT2LMHeadModel(config).eval()
+                tracker = self.hw.ConfidenceTracker(config.eos_token_id)
+                with torch.no_grad():
+                    out = model.generate(
+                        torch.tensor([[config.bos_token_id]]), attention_mask=torch.ones(1, 1, dtype=torch.long),
+                        max_new_tokens=8, do_sample=False,
+                        eos_token_id=config.eos_token_id, pad_token_id=config.pad_token_id,
+                        logits_processor=LogitsProcessorList([tracker]),
+                        output_scores=True, return_dict_in_generate=True, **generation,
+                    )
+                transition = model.compute_transition_scores(
+                    out.sequences, out.scores, getattr(out, "beam_indices", None),
+                    normalize_logits=generation["num_beams"] == 1,
+                )[0]
+                generated = out.sequences[0, 1:].tolist()
+                n = generated.index(config.eos_token_id) + 1 if config.eos_token_id in generated else len(generated)
+                ended.add(n < 8)
+                expected = math.exp(transition[:n].mean().item())
+                self.assertAlmostEqual(tracker.confidence(out.sequences[0]), expected, places=5, msg=(generation, seed))
+        # both ways a sequence ends were covered
+        self.assertEqual(ended, {True, False})
+
+    def test_stub_model_confidence(self):
+        import torch
+
+        pixel_values = torch.from_numpy(self.hw.line_preprocessor(np.full((40, 200, 3), 255, np.uint8), [(0, 0, 200, 40)]))
+        line = self.hw.recognize_line(pixel_values, (0, 0, 200, 40), (0, 0, 200, 40), "greedy")
+        # the stub puts 4.0 on its token and 0 on the others at every step
+        vocab = self.hw.model.vocab_size
+        expected = math.exp(4.0 - math.log(math.exp(4.0) + vocab - 1))
+        self.assertAlmostEqual(line["ocr_confidence"], expected, places=4)
+
+
+# -------------------------------------------------------
+#               LINE CROP PREPROCESSING
+# -------------------------------------------------------
+
+def _processor_reference(image_rgb, rect, size=384):
+    # the steps ViTImageProcessor (TrOCRProcessor) runs on a PIL crop
+    x, y, w, h = rect
+    crop = Image.fromarray(image_rgb).crop((x, y, x + w, y + h))
+    resized = np.array(crop.resize((size, size), resample=Image.BILINEAR))
+    rescaled = (resized.astype(np.float64) * (1 / 255)).astype(np.float32)
+    normalized = (rescaled - np.array([0.5] * 3, dtype=np.float32)) / np.array([0.5] * 3, dtype=np.float32)
+    return normalized.transpose(2, 0, 1)
+
+
+class LinePreprocessorTests(SimpleTestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.image = rng.integers(0, 256, size=(600, 900, 3), dtype=np.uint8)
+        boxes = [(10, 20, 500, 40), (0, 0, 30, 12), (850, 560, 60, 50), (300, 300, 12, 200)]
+        self.rects = [pad_box(box, 900, 600) for box in boxes]
+
+    def test_pad_box_clips_to_image(self):
+        self.assertEqual(pad_box((0, 0, 30, 12), 900, 600), (0, 0, 46, 28))
+        self.assertEqual(pad_box((850, 560, 60, 50), 900, 600), (842, 552, 58, 48))
+
+    def test_matches_processor_steps(self):
+        batch = LinePreprocessor()(self.image, self.rects)
+        self.assertEqual(batch.shape, (len(self.rects), 3, 384, 384))
+        self.assertEqual(batch.dtype, np.float32)
+        self.assertTrue(batch.flags["C_CONTIGUOUS"])
+        for i, rect in enumerate(self.rects):
+            np.testing.assert_array_equal(batch[i], _processor_reference(self.image, rect))
+
+    def test_writes_into_given_batch(self):
+        out = np.zeros((len(self.rects), 3, 384, 384), dtype=np.float32)
+        self.assertIs(LinePreprocessor()(self.image, self.rects, out=out), out)
+
+    @unittest.skipUnless(importlib.util.find_spec("transformers"), "transformers not installed")
+    def test_matches_transformers_image_processor(self):
+        from transformers import ViTImageProcessor
+
+        image_processor = ViTImageProcessor(
+            size={"height": 384, "width": 384}, image_mean=[0.5] * 3, image_std=[0.5] * 3
+        )
+        batch = LinePreprocessor.from_processor(image_processor)(self.image, self.rects)
+        for i, (x, y, w, h) in enumerate(self.rects):
+            crop = Image.fromarray(self.image).crop((x, y, x + w, y + h))
+            expected = image_processor(images=crop, return_tensors="np").pixel_values[0]
+            np.testing.assert_array_equal(batch[i], expected)
+
+
+# -------------------------------------------------------
+#               LINE GROUPING
+# -------------------------------------------------------
+
+class GroupLinesTests(SimpleTestCase):
+    def test_two_column_form(self):
+        boxes = [(300, 20, 400, 30), (50, 300, 900, 20)]  # title, footer
+        for row in range(3):
+            y = 100 + row * 40
+            boxes += [(50, y, 150, 20), (210, y + 2, 200, 20), (600, y, 150, 20), (760, y - 1, 190, 20)]
+
+        self.assertEqual(group_lines(boxes), [
+            (300, 20, 400, 30),
+            (50, 100, 360, 22), (50, 140, 360, 22), (50, 180, 360, 22),
+            (600, 99, 350, 21), (600, 139, 350, 21), (600, 179, 350, 21),
+            (50, 300, 900, 20),
+        ])
+
+    def test_sloping_line_stays_together(self):
+        boxes = [(10, 100, 50, 20), (65, 104, 60, 20), (130, 108, 60, 20), (10, 140, 80, 20)]
+        self.assertEqual(group_lines(boxes), [(10, 100, 180, 28), (10, 140, 80, 20)])
+
+    def test_no_boxes(self):
+        self.assertEqual(group_lines([]), [])
+
+
+# -------------------------------------------------------
+#               PROFILING
+# -------------------------------------------------------
+
+class ProfilingTests(TestCase):
+    def test_stages_add_up_and_allocators_point_at_the_code(self):
+        profiler = profiling.Profiler(top_allocators=5).start()
+        token = profiling.current_profile.set(profiler)
+        try:
+            for _ in range(2):
+                with profiling.stage("alloc"):
+                    kept = np.ones(4 * 1024 * 1024, dtype=np.uint8)
+        finally:
+            profiling.current_profile.reset(token)
+        record = profiler.finish()
+
+        self.assertEqual(record["stages"]["alloc"]["calls"], 2)
+        self.assertGreaterEqual(record["traced_peak_bytes"], kept.nbytes)
+        self.assertIn("verify_user/tests.py", record["top_allocators"][0]["where"])
+
+    def test_stage_without_profile_is_a_no_op(self):
+        with profiling.stage("anything"):
+            pass
+
+    @override_settings(
+        OCR_PROFILE_SAMPLE_RATE=1.0, OCR_PROFILE_PATH_PREFIX="/api/passport/",
+        OCR_PROFILE_KEEP=2, OCR_PROFILE_TOP_ALLOCATORS=0,
+    )
+    def test_sampled_requests_are_stored_and_served_to_admins(self):
+        for _ in range(3):
+            self.client.get("/api/passport/ids/")
+        self.assertEqual(RequestProfile.objects.count(), 2)
+
+        self.assertEqual(self.client.get("/api/profiles/").status_code, 403)
+
+        admin = User.objects.create_user("admin", password="pw", is_staff=True)
+        self.client.force_login(admin)
+        body = self.client.get("/api/profiles/?path=/api/passport/ids/").json()
+        self.assertEqual(len(body), 2)
+        self.assertEqual(body[0]["status_code"], 200)
+        self.assertIn("stages", body[0])
+
+
+# -------------------------------------------------------
+#               DEBUG CAPTURE
+# -------------------------------------------------------
+
+def _captured_document(capture):
+    trace = capture.document()
+    trace.image = np.full((120, 300, 3), 255, dtype=np.uint8)
+    trace.word_boxes = [(10, 10, 40, 20), (60, 10, 50, 20), (10, 60, 80, 20)]
+    trace.line_boxes = [(10, 10, 100, 20), (10, 60, 80, 20)]
+    trace.lines = [{"text": "NAME", "coordinates": [10, 110, 10, 30], "ocr_confidence": 0.9}]
+    trace.event("craft", raw_boxes=3)
+    return trace
+
+
+class DebugCaptureTests(SimpleTestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root, ignore_errors=True)
+
+    def test_writes_overlay_crops_and_trace(self):
+        capture = DebugCapture(label="POST /api/handwritten/ocr/", reason="header")
+        _captured_document(capture)
+        path = DebugStore(self.root).save(capture)
+
+        self.assertTrue(os.path.isfile(os.path.join(path, "doc0_overlay.png")))
+        self.assertEqual(sorted(os.listdir(os.path.join(path, "doc0_crops"))), ["line001.png", "line002.png"])
+        with open(os.path.join(path, "trace.json")) as f:
+            trace = json.load(f)
+        self.assertEqual(trace["documents"][0]["image_size"], [300, 120])
+        self.assertEqual(trace["documents"][0]["events"][0]["event"], "craft")
+
+    def test_capture_without_documents_is_not_written(self):
+        self.assertIsNone(DebugStore(self.root).save(DebugCapture()))
+        self.assertEqual(os.listdir(self.root), [])
+
+    def test_store_keeps_newest_captures_within_limits(self):
+        store = DebugStore(self.root, max_captures=2)
+        for _ in range(3):
+            capture = DebugCapture()
+            _captured_document(capture)
+            store.save(capture)
+        self.assertEqual(len(store.captures()), 2)
+
+        DebugStore(self.root, max_bytes=0).prune()
+        self.assertEqual(store.captures(), [])
+
+    def test_header_token_turns_capture_on(self):
+        seen = []
+
+        def view(request):
+            capture = middleware.var.get()
+            seen.append(capture)
+            if capture is not None:
+                _captured_document(capture)
+            return HttpResponse("ok")
+
+        middleware = debug_capture.DebugCaptureMiddleware(view)
+        factory = RequestFactory()
+        with override_settings(OCR_DEBUG_TOKEN="s3cret", OCR_DEBUG_SAMPLE_RATE=0, OCR_DEBUG_DIR=self.root):
+            plain = middleware(factory.get("/api/handwritten/ocr/", HTTP_X_OCR_DEBUG="wrong"))
+            captured = middleware(factory.get("/api/handwritten/ocr/", HTTP_X_OCR_DEBUG="s3cret"))
+            debug_capture._writer.submit(lambda: None).result()
+
+        self.assertIsNone(seen[0])
+        self.assertNotIn("X-OCR-Debug-Capture", plain)
+        self.assertEqual(seen[1].reason, "header")
+        self.assertTrue(os.path.isdir(os.path.join(self.root, captured["X-OCR-Debug-Capture"])))
+
+
+# -------------------------------------------------------
+#               DOCUMENT VERIFICATION
+# -------------------------------------------------------
+
+_DETAILS = {
+    "first_name": "Asha", "last_name": "Rao", "gender": "Female", "dob": "05/04/2005",
+    "permanent_address_line": "12 MG Road", "permanent_city": "Pune", "permanent_state": "Maharashtra",
+    "permanent_pincode": "411001", "permanent_country": "India",
+}
+
+
+class _SlowVerifier(DocumentVerifier):
+    # OCR stand-in that only finishes once `parties` documents are in flight
+    def __init__(self, parties):
+        self.barrier = threading.Barrier(parties, timeout=5)
+        self.seen = []
+        self.profiles = []
+
+    def ocr(self, document, tier="full", decoding=None):
+        self.seen.append(document)
+        self.profiles.append(profiling.current_profile.get())
+        self.barrier.wait()
+        return [{"text": document.decode(), "coordinates": [0, 1, 0, 1], "ocr_confidence": 1.0}]
+
+
+class DocumentVerifierTests(SimpleTestCase):
+    def setUp(self):
+        pool = ThreadPoolExecutor(max_workers=3)
+        self.addCleanup(pool.shutdown)
+        self.enterContext(mock.patch.object(doc_verification, "_executor", pool))
+
+    def test_distinct_documents_are_ocrd_concurrently(self):
+        verifier = _SlowVerifier(3)
+        lines = verifier.extract_lines([b"dob", b"id", b"address"])
+        self.assertEqual([doc[0]["text"] for doc in lines], ["dob", "id", "address"])
+
+    def test_identical_documents_are_ocrd_once_in_order(self):
+        verifier = _SlowVerifier(2)
+        profile = object()
+        token = profiling.current_profile.set(profile)
+        try:
+            lines = verifier.extract_lines([b"aadhaar", b"birth", b"aadhaar"])
+        finally:
+            profiling.current_profile.reset(token)
+        self.assertEqual(sorted(verifier.seen), [b"aadhaar", b"birth"])
+        self.assertEqual([doc[0]["text"] for doc in lines], ["aadhaar", "birth", "aadhaar"])
+        self.assertIs(lines[0], lines[2])
+        # the request's profile follows the work onto the pool
+        self.assertEqual(verifier.profiles, [profile, profile])
+
+
+class DocumentVerifyTests(TestCase):
+    def _verify(self, tier="full"):
+        proofs = {
+            field: SimpleUploadedFile(f"{field}.png", field.encode(), content_type="image/png")
+            for field in ("dob_proof", "name_gender_proof", "address_proof")
+        }
+        with mock.patch.object(degradation.controller, "current_tier", return_value=tier):
+            return self.client.post("/api/verify-documents/", {**_DETAILS, **proofs})
+
+    def _reverify(self, documents):
+        return self.client.post("/api/verify-documents/reverify/", {**_DETAILS, **documents})
+
+    def test_reverify_matches_stored_lines(self):
+        lines = {
+            b"dob_proof": "DOB 05/04/2005", b"name_gender_proof": "ASHA RAO FEMALE",
+            b"address_proof": "12 MG ROAD PUNE MAHARASHTRA 411001 INDIA",
+        }
+
+        def extract(documents, tier="full", decoding=None):
+            return [[{"text": lines[doc], "coordinates": [0, 1, 0, 1], "ocr_confidence": 1.0}] for doc in documents]
+
+        with mock.patch.object(DocumentVerifier, "extract_lines", side_effect=extract):
+            documents = self._verify().json()["documents"]
+
+        # no OCR from here on
+        with mock.patch.object(DocumentVerifier, "extract_lines", side_effect=AssertionError("OCR ran")):
+            result = self._reverify(documents).json()["verification_result"]
+            self.assertEqual(result["first_name"]["detected_text"], "ASHA RAO FEMALE")
+            self.assertEqual(result["date_of_birth"]["match_score"], 100)
+
+            corrected = self.client.post(
+                "/api/verify-documents/reverify/", {**_DETAILS, "first_name": "Zoya", **documents}
+            ).json()["verification_result"]
+            self.assertIsNone(corrected["first_name"])
+
+            response = self._reverify({**documents, "address_proof_hash": "0" * 64})
+            self.assertEqual(response.status_code, 404)
+            self.assertEqual(response.json()["missing"], ["0" * 64])
+            self.assertEqual(self.client.post("/api/verify-documents/reverify/", _DETAILS).status_code, 400)
+
+    def test_unreadable_proofs_are_not_stored(self):
+        verifier = _RecordingVerifier()
+        with mock.patch.object(DocumentVerifier, "extract_lines", return_value=[[], [], []]):
+            documents = self._verify().json()["documents"]
+        self.assertEqual(DocumentOCR.objects.count(), 0)
+        self.assertEqual(self._reverify(documents).status_code, 404)
+
+        # the next upload of the same files is OCR'd again
+        with mock.patch.object(DocumentVerifier, "extract_lines", side_effect=verifier.extract_lines):
+            self._verify()
+        self.assertEqual(verifier.calls, 3)
+        self.assertEqual(DocumentOCR.objects.count(), 3)
+
+    def test_degraded_lines_are_stored_and_upgraded(self):
+        verifier = _RecordingVerifier()
+        with mock.patch.object(DocumentVerifier, "extract_lines", side_effect=verifier.extract_lines):
+            body = self._verify("reduced").json()
+            self.assertEqual(body["quality_tier"], "reduced")
+            self.assertEqual(set(DocumentOCR.objects.values_list("tier", flat=True)), {"reduced"})
+
+            # the hashes of a degraded response still work for reverify
+            self.assertEqual(self._reverify(body["documents"]).status_code, 200)
+
+            # reduced lines are good enough for another reduced request...
+            self._verify("reduced")
+            self.assertEqual(verifier.calls, 3)
+            # ...but a full request OCRs the proofs again and keeps the better lines
+            self._verify("full")
+            self.assertEqual(verifier.calls, 6)
+            self.assertEqual(set(DocumentOCR.objects.values_list("tier", flat=True)), {"full"})
+
+            self._verify("minimal")
+            self.assertEqual(verifier.calls, 6)
+            self.assertEqual(set(DocumentOCR.objects.values_list("tier", flat=True)), {"full"})
+
+
+# -------------------------------------------------------
+#               NEAR DUPLICATES
+# -------------------------------------------------------
+
+def _form_bytes(seed, quality=None, scale=1.0):
+    from benchmarks import synthetic
+
+    image, _, _ = synthetic.render_form(rows=10, columns=1, seed=seed)
+    if scale != 1.0:
+        image = cv2.resize(image, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    if quality is None:
+        return synthetic.to_png(image)
+    _, jpeg = cv2.imencode(".jpg", cv2.cvtColor(image, cv2.COLOR_RGB2BGR), [cv2.IMWRITE_JPEG_QUALITY, quality])
+    return jpeg.tobytes()
+
+
+class _RecordingVerifier:
+    def __init__(self):
+        self.calls = 0
+
+    def extract_lines(self, documents, tier="full", decoding=None):
+        self.calls += len(documents)
+        return [[{"text": f"DOC {self.calls}", "coordinates": [0, 1, 0, 1], "ocr_confidence": 1.0}] for _ in documents]
+
+
+class PerceptualHashTests(SimpleTestCase):
+    def test_candidate_chunks_cover_every_hash_within_radius(self):
+        rng = np.random.default_rng(0)
+        for radius in (0, 3, 8, 15):
+            for _ in range(50):
+                h = int(rng.integers(0, 2 ** 63)) * 2 + int(rng.integers(0, 2))
+                flips = rng.choice(64, size=radius, replace=False)
+                near = h
+                for bit in flips:
+                    near ^= 1 << int(bit)
+                candidates = perceptual_hash.candidate_chunks(h, radius)
+                self.assertTrue(any(c in values for c, values in zip(perceptual_hash.chunks(near), candidates)))
+
+    def test_signed_round_trip(self):
+        for h in (0, 1, 2 ** 63 - 1, 2 ** 63, 2 ** 64 - 1):
+            self.assertEqual(perceptual_hash.from_signed(perceptual_hash.to_signed(h)), h)
+
+    def test_recompressed_copy_matches(self):
+        original = perceptual_hash.document_phash(_form_bytes(0))
+        copy = perceptual_hash.document_phash(_form_bytes(0, quality=40, scale=0.5))
+        self.assertLessEqual(perceptual_hash.distance(original, copy), 4)
+        self.assertIsNone(perceptual_hash.document_phash(b"not an image"))
+
+
+class NearDuplicateTests(TestCase):
+    def test_near_duplicates_are_ocrd_again(self):
+        verifier = _RecordingVerifier()
+        lines = proof_lines(verifier, {"a": ("a.png", _form_bytes(0))})
+        self.assertEqual(verifier.calls, 1)
+        # byte-identical: stored lines
+        self.assertEqual(proof_lines(verifier, {"a": ("a.png", _form_bytes(0))})["a"], lines["a"])
+        self.assertEqual(verifier.calls, 1)
+
+        proof_lines(verifier, {"b": ("b.jpg", _form_bytes(0, quality=40, scale=0.5))})
+        self.assertEqual(verifier.calls, 2)
+        self.assertEqual(DocumentFingerprint.objects.count(), 2)
+
+    def test_one_field_edit_is_ocrd_again(self):
+        from benchmarks import synthetic
+
+        image, _, _ = synthetic.render_form(rows=10, columns=1, seed=0)
+        edited = image.copy()
+        # same form, one value changed: a different year of birth
+        cv2.rectangle(edited, (400, 130), (700, 160), (255, 255, 255), -1)
+        cv2.putText(edited, "05/04/2003", (400, 155), synthetic.FONT, 1.1, (20, 20, 20), 2, cv2.LINE_AA)
+        original, changed = synthetic.to_png(image), synthetic.to_png(edited)
+
+        # the fingerprints alone call them the same page...
+        a, b = perceptual_hash.document_phash(original), perceptual_hash.document_phash(changed)
+        self.assertLessEqual(perceptual_hash.distance(a, b), 4)
+
+        verifier = _RecordingVerifier()
+        first = proof_lines(verifier, {"a": ("a.png", original)})
+        second = proof_lines(verifier, {"b": ("b.png", changed)})
+        # ...but the edit is OCR'd, not answered with the other document's lines
+        self.assertEqual(verifier.calls, 2)
+        self.assertNotEqual(second["b"], first["a"])
+
+    def test_near_duplicates_endpoint(self):
+        proof_lines(_RecordingVerifier(), {"a": ("a.png", _form_bytes(0))})
+
+        upload = SimpleUploadedFile("copy.jpg", _form_bytes(0, quality=40), content_type="image/jpeg")
+        body = self.client.post("/api/near-duplicates/", {"file": upload}).json()
+        self.assertEqual(body["matches"][0]["content_hash"], "a")
+
+        upload = SimpleUploadedFile("copy.jpg", b"not an image")
+        self.assertEqual(self.client.post("/api/near-duplicates/", {"file": upload}).status_code, 400)
+
+
+# -------------------------------------------------------
+#               LISTING AND EXPORT
+# -------------------------------------------------------
+
+def _records(count, **fields):
+    return PassportRecord.objects.bulk_create([
+        PassportRecord(**{
+            "first_name": f"NAME{i}", "last_name": "THOMAS", "gender": "M", "dob": datetime.date(2000, 1, 1),
+            "phone": "9876543210", "email": f"p{i}@example.com",
+            "present_address_line": "12 MG Road", "present_city": "Bengaluru", "present_state": "Karnataka",
+            "present_pincode": "560038", "name_gender_proof": "name_gender_proof/a.png",
+            "dob_proof": "dob_proofs/a.png", "address_proof": "address_proofs/a.png",
+            "extracted_data": {"lines": [i]}, **fields,
+        })
+        for i in range(count)
+    ])
+
+
+@override_settings(STORAGES={
+    "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+    "staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"},
+})
+class ListingTests(TestCase):
+    def test_id_pages_cover_the_table_once(self):
+        created = [r.id for r in _records(25)]
+        seen, after = [], 0
+        while after is not None:
+            body = self.client.get(f"/api/passport/ids/?limit=10&after={after}").json()
+            seen.extend(body["ids"])
+            after = body["next_after"]
+        self.assertEqual(seen, created)
+
+    def test_record_pages_and_filters(self):
+        _records(3)
+        verified = [r.id for r in _records(3, status="VERIFIED")]
+        body = self.client.get("/api/passport/?status=verified&limit=2").json()
+        self.assertEqual([r["id"] for r in body["results"]], verified[:2])
+        body = self.client.get(f"/api/passport/?status=verified&limit=2&after={body['next_after']}").json()
+        self.assertEqual([r["id"] for r in body["results"]], verified[2:])
+        self.assertIsNone(body["next_after"])
+
+    def test_batch_fetch_keeps_order_and_reports_missing(self):
+        a, b = (r.id for r in _records(2))
+        body = self.client.get(f"/api/passport/?ids={b},999999,{a}").json()
+        self.assertEqual([r["id"] for r in body["results"]], [b, a])
+        self.assertEqual(body["missing"], [999999])
+
+    def test_bad_parameters(self):
+        self.assertEqual(self.client.get("/api/passport/ids/?limit=0").status_code, 400)
+        self.assertEqual(self.client.get("/api/passport/ids/?after=x").status_code, 400)
+        self.assertEqual(self.client.get("/api/passport/?ids=1,x").status_code, 400)
+
+    def test_export_streams_ndjson_and_csv(self):
+        ids = [r.id for r in _records(5)]
+        self.client.force_login(User.objects.create_user("admin", password="pw", is_staff=True))
+
+        response = self.client.get(f"/api/passport/export/ndjson/?after={ids[0]}")
+        self.assertTrue(response.streaming)
+        rows = [json.loads(line) for line in b"".join(response.streaming_content).splitlines()]
+        self.assertEqual([r["id"] for r in rows], ids[1:])
+        self.assertEqual(rows[0]["extracted_data"], {"lines": [1]})
+
+        response = self.client.get("/api/passport/export/csv/")
+        rows = list(csv.DictReader(io.StringIO(b"".join(response.streaming_content).decode())))
+        self.assertEqual(len(rows), 5)
+        self.assertEqual(json.loads(rows[0]["extracted_data"]), {"lines": [0]})
+
+    def test_export_is_admin_only(self):
+        self.assertEqual(self.client.get("/api/passport/export/csv/").status_code, 403)
+
+
+def _aged(records, *days_ago):
+    # created_at is auto_now_add; set it afterwards
+    now = timezone.now()
+    for record, days in zip(records, days_ago):
+        record.created_at = now - datetime.timedelta(days=days)
+        PassportRecord.objects.filter(id=record.id).update(created_at=record.created_at)
+    return records
+
+
+class ReviewQueueTests(TestCase):
+    def _queue(self, query=""):
+        return self.client.get(f"/api/review-queue/{query}").json()
+
+    def test_oldest_pending_first(self):
+        newer, older = _aged(_records(2), 1, 5)
+        _aged(_records(1, status="VERIFIED"), 9)
+        body = self._queue()
+        self.assertEqual([r["id"] for r in body["results"]], [older.id, newer.id])
+        self.assertIsNone(body["next_after"])
+
+    def test_filters(self):
+        goa = _records(2, present_state="Goa", verification_outcome="PARTIAL")
+        _aged(goa, 3, 2)
+        _aged(_records(1), 2)
+        self.assertEqual([r["id"] for r in self._queue("?state=Goa")["results"]], [r.id for r in goa])
+        self.assertEqual([r["id"] for r in self._queue("?outcome=partial")["results"]], [r.id for r in goa])
+
+        day = (timezone.now() - datetime.timedelta(days=3)).date().isoformat()
+        self.assertEqual([r["id"] for r in self._queue(f"?from={day}&to={day}")["results"]], [goa[0].id])
+        self.assertEqual(self.client.get("/api/review-queue/?from=2026-02-01&to=2026-01-01").status_code, 400)
+        self.assertEqual(self.client.get("/api/review-queue/?outcome=maybe").status_code, 400)
+
+    def test_pages_resume_after_equal_timestamps(self):
+        records = _records(5)
+        at = timezone.now()
+        PassportRecord.objects.filter(id__in=[r.id for r in records]).update(created_at=at)
+        seen, after = [], 0
+        while after is not None:
+            body = self._queue(f"?limit=2&after={after}")
+            seen.extend(r["id"] for r in body["results"])
+            after = body["next_after"]
+        self.assertEqual(seen, [r.id for r in records])
+
+    def test_queries_read_an_index_in_order(self):
+        factory = APIRequestFactory()
+        now = timezone.now()
+        for query in ("", "?state=Goa", "?outcome=matched", "?status=any", "?status=any&state=Goa",
+                      "?from=2026-01-01&to=2026-02-01&state=Goa&outcome=partial"):
+            records = review.queue_records(Request(factory.get(f"/api/review-queue/{query}")))
+            for qs in (records, records.filter(created_at__gte=now)):
+                plan = qs[:51].explain()
+                self.assertIn("USING INDEX passport_", plan, query)
+                self.assertNotIn("TEMP B-TREE", plan, query)
+
+    def test_outcome(self):
+        details = {"first_name": "ANIL", "middle_name": "", "dob": "01/01/2000"}
+        match = {"match_score": 90}
+        self.assertEqual(verification_outcome(None, details), "PENDING")
+        self.assertEqual(
+            verification_outcome({"first_name": match, "middle_name": None, "date_of_birth": match}, details),
+            "MATCHED",
+        )
+        self.assertEqual(
+            verification_outcome({"first_name": match, "middle_name": None, "date_of_birth": None}, details),
+            "PARTIAL",
+        )
+        self.assertEqual(
+            verification_outcome({"first_name": None, "middle_name": None, "date_of_birth": None}, details),
+            "UNMATCHED",
+        )
+
+
+class SearchTests(TestCase):
+    def _rename(self, record, **fields):
+        for name, value in fields.items():
+            setattr(record, name, value)
+        record.save()
+        return record
+
+    def _ids(self, query, **params):
+        return [record_id for record_id, _ in search.get_backend().search(query, **params)]
+
+    def test_saved_records_are_found_by_word_prefix(self):
+        anil, sunil = _records(2)
+        self._rename(anil, first_name="Anil", last_name="Kumar")
+        self._rename(sunil, first_name="Sunil", present_city="Pune")
+        self.assertEqual(self._ids("anil kum"), [anil.id])
+        self.assertEqual(self._ids("PUNE"), [sunil.id])
+        self.assertEqual(self._ids("nil"), [])
+        self.assertEqual(self._ids("  ;; "), [])
+
+    def test_names_outrank_cities(self):
+        in_name, in_city = _records(2)
+        self._rename(in_name, first_name="Mysore")
+        self._rename(in_city, present_city="Mysore")
+        self.assertEqual(self._ids("mysore"), [in_name.id, in_city.id])
+
+    def test_index_follows_saves_and_deletes(self):
+        record, = _records(1)
+        self._rename(record, first_name="Anil")
+        self._rename(record, first_name="Ravi")
+        self.assertEqual(self._ids("anil"), [])
+        self.assertEqual(self._ids("ravi"), [record.id])
+
+        # saves of other fields leave the index alone
+        PassportRecord.objects.filter(id=record.id).update(first_name="Anil")
+        record.refresh_from_db()
+        record.save(update_fields=["ocr_status"])
+        self.assertEqual(self._ids("ravi"), [record.id])
+
+        record.delete()
+        self.assertEqual(self._ids("ravi"), [])
+
+    def test_rebuild_indexes_bulk_loads(self):
+        records = _records(3, last_name="Meera")
+        self.assertEqual(self._ids("meera"), [])
+        self.assertEqual(search.get_backend().rebuild(), 3)
+        self.assertEqual(sorted(self._ids("meera")), [r.id for r in records])
+
+    def test_search_api_ranks_and_validates(self):
+        record, = _records(1)
+        self._rename(record, first_name="Anil")
+        body = self.client.get("/api/passport/search/?q=anil").json()
+        self.assertEqual([r["id"] for r in body["results"]], [record.id])
+        self.assertGreater(body["results"][0]["score"], 0)
+        self.assertEqual(self.client.get("/api/passport/search/").status_code, 400)
+
+    def test_admin_search_box_uses_the_index(self):
+        anil, other = _records(2)
+        self._rename(anil, first_name="Anil")
+        self.client.force_login(User.objects.create_superuser("admin", password="pw"))
+        response = self.client.get("/admin/verify_user/passportrecord/?q=anil")
+        self.assertEqual([r.id for r in response.context["cl"].result_list], [anil.id])
+
+    @override_settings(OCR_SEARCH_BACKEND="verify_user.search.SubstringBackend")
+    def test_substring_backend(self):
+        anil, _ = _records(2)
+        self._rename(anil, first_name="Anil", last_name="Kumar")
+        self.assertEqual(self._ids("kumar ani"), [anil.id])
+
+
+def _import_item(i, base):
+    return {
+        "first_name": f"IMPORT{i}", "last_name": "RAO", "gender": "F", "dob": "1990-05-01",
+        "phone": "9876543210", "email": f"i{i}@example.com",
+        "present_address_line": "4 Park Street", "present_city": "Kolkata", "present_state": "West Bengal",
+        "present_pincode": "700016",
+        "name_gender_proof": f"{base}/100", "dob_proof": f"{base}/200", "address_proof": f"{base}/300",
+    }
+
+
+@override_settings(STORAGES={
+    "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+    "staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"},
+}, OCR_BACKGROUND_ENRICHMENT=False)
+class BulkTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), _StandInHandler)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.base = f"http://127.0.0.1:{cls.server.server_port}"
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media, ignore_errors=True)
+        self.enterContext(override_settings(MEDIA_ROOT=media))
+        self.client.force_login(User.objects.create_user("admin", password="pw", is_staff=True))
+
+    def test_status_update_is_one_statement_with_per_id_results(self):
+        pending, verified = _records(1)[0], _records(1, status="VERIFIED")[0]
+        with CaptureQueriesContext(connection) as queries:
+            results = bulk.update_status([pending.id, verified.id, 999999, pending.id], "VERIFIED")
+        statements = [q["sql"].split()[0] for q in queries.captured_queries]
+        self.assertEqual([s for s in statements if s in ("SELECT", "UPDATE")], ["SELECT", "UPDATE"])
+        self.assertEqual(results, [
+            {"id": pending.id, "result": "updated"},
+            {"id": verified.id, "result": "unchanged"},
+            {"id": 999999, "result": "not_found"},
+        ])
+        pending.refresh_from_db()
+        self.assertEqual(pending.status, "VERIFIED")
+
+    def test_status_endpoint(self):
+        ids = [r.id for r in _records(3)]
+        response = self.client.patch("/api/passport/bulk/status/", {"ids": ids, "status": "REJECTED"},
+                                     content_type="application/json")
+        self.assertEqual(response.json()["updated"], 3)
+        self.assertEqual(set(PassportRecord.objects.values_list("status", flat=True)), {"REJECTED"})
+
+        response = self.client.patch("/api/passport/bulk/status/", {"ids": ids, "status": "LOST"},
+                                     content_type="application/json")
+        self.assertEqual(response.status_code, 400)
+        self.client.logout()
+        response = self.client.patch("/api/passport/bulk/status/", {"ids": ids, "status": "PENDING"},
+                                     content_type="application/json")
+        self.assertEqual(response.status_code, 403)
+
+    def test_import_creates_valid_records_and_defers_proofs(self):
+        items = [_import_item(i, self.base) for i in range(3)]
+        items.insert(1, {**_import_item(9, self.base), "dob_proof": "not a url"})
+        with self.captureOnCommitCallbacks() as callbacks:
+            response = self.client.post("/api/passport/bulk/", {"records": items}, content_type="application/json")
+
+        self.assertEqual(response.status_code, 201)
+        body = response.json()
+        self.assertEqual(body["created"], 3)
+        self.assertIn("dob_proof", body["results"][1]["errors"])
+        ids = [r["id"] for r in body["results"] if "id" in r]
+        record = PassportRecord.objects.get(id=ids[0])
+        self.assertEqual(record.proof_sources["dob_proof"], f"{self.base}/200")
+        self.assertFalse(record.dob_proof)
+        # one background task per chunk, none run inside the request
+        self.assertEqual(len(callbacks), 1)
+        self.assertEqual(sorted(i for i, _ in search.get_backend().search("import rao")), sorted(ids))
+
+    def test_attach_proofs_downloads_into_storage(self):
+        response = self.client.post(
+            "/api/passport/bulk/",
+            {"records": [_import_item(0, self.base), {**_import_item(1, self.base), "address_proof": f"{self.base}/missing"}]},
+            content_type="application/json",
+        )
+        ok, broken = (r["id"] for r in response.json()["results"])
+        with self.assertLogs("verify_user.tasks", "WARNING"):
+            attach_proofs([ok, broken])
+
+        record = PassportRecord.objects.get(id=ok)
+        self.assertIsNone(record.proof_sources)
+        with record.address_proof.open("rb") as f:
+            self.assertEqual(f.read(), b"x" * 300)
+        self.assertIsNotNone(PassportRecord.objects.get(id=broken).proof_sources)
+
+
+class _InlinePool:
+    def submit(self, func, *args):
+        func(*args)
+
+
+@override_settings(STORAGES={
+    "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+    "staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"},
+}, OCR_ENRICH_STALE_SECONDS=600)
+class EnrichmentTests(TestCase):
+    def setUp(self):
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media, ignore_errors=True)
+        self.enterContext(override_settings(MEDIA_ROOT=media))
+        for name in ("name_gender_proof/a.png", "dob_proofs/a.png", "address_proofs/a.png"):
+            os.makedirs(os.path.join(media, os.path.dirname(name)), exist_ok=True)
+            with open(os.path.join(media, name), "wb") as f:
+                f.write(name.encode())
+        self.verifier = _RecordingVerifier()
+        self.enterContext(mock.patch.object(DocumentVerifier, "extract_lines", side_effect=self.verifier.extract_lines))
+
+    def test_enqueue_runs_after_commit_and_logs_failures(self):
+        calls = []
+        with self.captureOnCommitCallbacks() as callbacks:
+            enqueue(calls.append, 1, pool=_InlinePool())
+        self.assertEqual(calls, [])
+        callbacks[0]()
+        self.assertEqual(calls, [1])
+
+        with self.assertLogs("verify_user.tasks", "ERROR"):
+            with self.captureOnCommitCallbacks(execute=True):
+                enqueue(int, "x", pool=_InlinePool())
+
+    def test_enrich_stores_lines_and_outcome(self):
+        record, = _records(1, extracted_data=None)
+        enrich_passport_record(record.id)
+        record.refresh_from_db()
+        self.assertEqual(record.ocr_status, "DONE")
+        self.assertEqual(set(record.extracted_data), {"name_gender_proof", "dob_proof", "address_proof"})
+        self.assertEqual(len(record.extracted_data["dob_proof"]["lines"]), 1)
+        self.assertIsNotNone(record.verification_results)
+        self.assertNotEqual(record.verification_outcome, "PENDING")
+        self.assertEqual(self.verifier.calls, 3)
+
+    def test_missing_proof_fails_the_record(self):
+        record, = _records(1, dob_proof="dob_proofs/gone.png")
+        with self.assertLogs("verify_user.tasks", "ERROR"):
+            enrich_passport_record(record.id)
+        record.refresh_from_db()
+        self.assertEqual(record.ocr_status, "FAILED")
+
+    def test_stale_processing_is_enriched_again(self):
+        now = timezone.now()
+        running, stuck, unknown = _records(3, ocr_status="PROCESSING")
+        PassportRecord.objects.filter(id=running.id).update(processing_since=now)
+        PassportRecord.objects.filter(id=stuck.id).update(processing_since=now - datetime.timedelta(hours=1))
+
+        # another worker is on it
+        enrich_passport_record(running.id)
+        self.assertEqual(self.verifier.calls, 0)
+
+        call_command("enrich_records", stdout=io.StringIO())
+        statuses = dict(PassportRecord.objects.values_list("id", "ocr_status"))
+        self.assertEqual(statuses, {running.id: "PROCESSING", stuck.id: "DONE", unknown.id: "DONE"})
+
+
+class _FlakyRemote(FileSystemStorage):
+    # remote stand-in whose first `failures` saves fail
+    failures = 0
+
+    def _save(self, name, content):
+        if _FlakyRemote.failures:
+            _FlakyRemote.failures -= 1
+            raise OSError("remote unavailable")
+        return super()._save(name, content)
+
+
+@override_settings(OCR_BACKGROUND_ENRICHMENT=False, OCR_UPLOAD_RETRIES=2, OCR_UPLOAD_RETRY_DELAY=0)
+class StagedUploadTests(TestCase):
+    def setUp(self):
+        self.staging, self.remote = tempfile.mkdtemp(), tempfile.mkdtemp()
+        for path in (self.staging, self.remote):
+            self.addCleanup(shutil.rmtree, path, ignore_errors=True)
+        _FlakyRemote.failures = 0
+        self.enterContext(override_settings(STORAGES={
+            "default": {
+                "BACKEND": "verify_user.storage.StagedStorage",
+                "OPTIONS": {
+                    "remote": _FlakyRemote,
+                    "remote_options": {"location": self.remote, "base_url": "https://media.example/"},
+                    "location": self.staging,
+                },
+            },
+            "staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"},
+        }))
+
+    def _create(self, dob=b"dob"):
+        data = {
+            "first_name": "ANIL", "last_name": "KUMAR", "gender": "M", "dob": "1990-01-01",
+            "phone": "9876543210", "email": "a@example.com",
+            "present_address_line": "12 MG Road", "present_city": "Bengaluru", "present_state": "Karnataka",
+            "present_pincode": "560038",
+            "name_gender_proof": SimpleUploadedFile("id.png", b"id"),
+            "dob_proof": SimpleUploadedFile("dob.png", dob),
+            "address_proof": SimpleUploadedFile("address.png", b"address"),
+        }
+        with self.captureOnCommitCallbacks() as callbacks:
+            response = self.client.post("/api/passport/create/", data)
+        self.assertEqual(response.status_code, 201, response.content)
+        # the upload is queued, not run, by the request
+        self.assertEqual(len(callbacks), 1)
+        return PassportRecord.objects.get(id=response.json()["id"])
+
+    def _files(self, root):
+        return sorted(f for _, _, files in os.walk(root) for f in files)
+
+    def test_request_stages_and_worker_uploads(self):
+        record = self._create()
+        self.assertEqual(record.media_status, "STAGED")
+        self.assertEqual(self._files(self.staging), ["address.png", "dob.png", "id.png"])
+        self.assertEqual(self._files(self.remote), [])
+        with record.dob_proof.open("rb") as f:
+            self.assertEqual(f.read(), b"dob")
+
+        upload_media(record.id)
+        record.refresh_from_db()
+        self.assertEqual(record.media_status, "STORED")
+        self.assertEqual(self._files(self.staging), [])
+        self.assertEqual(self._files(self.remote), ["address.png", "dob.png", "id.png"])
+        self.assertTrue(record.dob_proof.url.startswith("https://media.example/"))
+        with record.address_proof.open("rb") as f:
+            self.assertEqual(f.read(), b"address")
+
+    def test_staged_proofs_have_no_url(self):
+        record = self._create()
+        body = self.client.get(f"/api/passport/{record.id}/").json()
+        self.assertEqual(body["media_status"], "STAGED")
+        self.assertEqual([body[f] for f in ("name_gender_proof", "dob_proof", "address_proof")], [None] * 3)
+        self.assertIsNone(record.dob_proof.url)
+
+        upload_media(record.id)
+        body = self.client.get(f"/api/passport/{record.id}/").json()
+        self.assertTrue(body["dob_proof"].startswith("https://media.example/"))
+
+    def test_upload_retries_then_gives_up(self):
+        record = self._create()
+        _FlakyRemote.failures = 2
+        upload_media(record.id)
+        record.refresh_from_db()
+        self.assertEqual(record.media_status, "STORED")
+
+        record = self._create()
+        _FlakyRemote.failures = 3
+        with self.assertLogs("verify_user.tasks", "ERROR"):
+            upload_media(record.id)
+        record.refresh_from_db()
+        self.assertEqual(record.media_status, "FAILED")
+        # still readable from the staged copy, and retried later
+        with record.name_gender_proof.open("rb") as f:
+            self.assertEqual(f.read(), b"id")
+        _FlakyRemote.failures = 0
+        upload_media(record.id)
+        record.refresh_from_db()
+        self.assertEqual(record.media_status, "STORED")
+
+    def test_enrichment_follows_a_proof_to_its_remote_name(self):
+        upload_media(self._create().id)
+        # staged as dob.png again, but the remote already has a dob.png
+        record = self._create(dob=b"second dob")
+        stale = PassportRecord.objects.get(id=record.id)
+        upload_media(record.id)
+        record.refresh_from_db()
+        self.assertNotEqual(record.dob_proof.name, stale.dob_proof.name)
+
+        with _open_proof(stale, "dob_proof") as f:
+            self.assertEqual(f.read(), b"second dob")
+        self.assertEqual(stale.dob_proof.name, record.dob_proof.name)
+
+    def test_staged_names_do_not_ask_the_remote(self):
+        storage = StagedStorage(remote=_FlakyRemote, remote_options={"location": self.remote}, location=self.staging)
+        def remote_exists(storage, name):
+            raise AssertionError("remote consulted")
+
+        _FlakyRemote.exists = remote_exists
+        self.addCleanup(delattr, _FlakyRemote, "exists")
+        first = storage.save("dob_proofs/a.png", io.BytesIO(b"1"))
+        second = storage.save("dob_proofs/a.png", io.BytesIO(b"2"))
+        self.assertNotEqual(first, second)
+
+
+class _SMTPStandIn(socketserver.StreamRequestHandler):
+    # just enough SMTP for smtplib; refuses recipients named bounce@
+    def reply(self, line):
+        self.wfile.write(line.encode() + b"\r\n")
+
+    def handle(self):
+        self.server.connections += 1
+        self.reply("220 stand-in")
+        data = None
+        for raw in self.rfile:
+            line = raw.decode().rstrip("\r\n")
+            if data is not None:
+                if line == ".":
+                    self.server.messages.append("\n".join(data))
+                    data = None
+                    self.reply("250 queued")
+                else:
+                    data.append(line)
+                continue
+            verb = line[:4].upper()
+            if verb in ("EHLO", "HELO"):
+                self.reply("250 stand-in")
+            elif verb == "RCPT" and "bounce@" in line:
+                self.reply("550 no such user")
+            elif verb in ("MAIL", "RCPT", "RSET", "NOOP"):
+                self.reply("250 ok")
+            elif verb == "DATA":
+                self.reply("354 go ahead")
+                data = []
+            elif verb == "QUIT":
+                self.reply("221 bye")
+                return
+            else:
+                self.reply("502 not implemented")
+
+
+class OutboxTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), _SMTPStandIn)
+        cls.server.daemon_threads = True
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.enterClassContext(override_settings(
+            EMAIL_BACKEND="django.core.mail.backends.smtp.EmailBackend",
+            EMAIL_HOST="127.0.0.1", EMAIL_PORT=cls.server.server_address[1],
+            EMAIL_USE_TLS=False, EMAIL_HOST_USER="", EMAIL_HOST_PASSWORD="",
+            OCR_OUTBOX_RETRY_DELAY=60, OCR_OUTBOX_MAX_ATTEMPTS=2,
+        ))
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        self.server.connections = 0
+        self.server.messages = []
+        self.mailer = outbox.Mailer()
+        self.addCleanup(self.mailer.close)
+
+    def test_send_otp_returns_once_persisted(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            response = self.client.post("/api/send-otp/", {"email": "a@example.com"})
+        self.assertEqual(response.status_code, 200)
+        otp = EmailOTP.objects.get(email="a@example.com").otp
+        queued = OutboxEmail.objects.get(to="a@example.com")
+        self.assertIn(otp, queued.body)
+        self.assertEqual(queued.status, "PENDING")
+        # the sender is only woken after commit; nothing went out yet
+        self.assertEqual(len(callbacks), 1)
+        self.assertEqual(self.server.connections, 0)
+
+    def test_batches_share_one_connection(self):
+        for i in range(5):
+            outbox.queue_email(f"user{i}@example.com", "OTP", f"code {i}")
+        self.assertEqual(outbox.send_pending(self.mailer), 5)
+        outbox.queue_email("late@example.com", "OTP", "code 5")
+        self.assertEqual(outbox.send_pending(self.mailer), 1)
+
+        self.assertEqual(self.server.connections, 1)
+        self.assertEqual(len(self.server.messages), 6)
+        self.assertEqual(OutboxEmail.objects.filter(status="SENT").count(), 6)
+        self.assertEqual(outbox.send_pending(self.mailer), 0)
+
+    def test_failures_back_off_then_give_up(self):
+        outbox.queue_email("bounce@example.com", "OTP", "code")
+        outbox.queue_email("ok@example.com", "OTP", "code")
+        outbox.send_pending(self.mailer)
+
+        bounced = OutboxEmail.objects.get(to="bounce@example.com")
+        self.assertEqual((bounced.status, bounced.attempts), ("PENDING", 1))
+        self.assertGreater(bounced.next_attempt_at, timezone.now() + datetime.timedelta(seconds=50))
+        self.assertEqual(OutboxEmail.objects.get(to="ok@example.com").status, "SENT")
+        # a refused recipient does not cost the connection
+        self.assertEqual(self.server.connections, 1)
+        self.assertEqual(outbox.send_pending(self.mailer), 0)
+
+        OutboxEmail.objects.filter(id=bounced.id).update(next_attempt_at=timezone.now())
+        with self.assertLogs("verify_user.outbox", "ERROR"):
+            outbox.send_pending(self.mailer)
+        self.assertEqual(OutboxEmail.objects.get(id=bounced.id).status, "FAILED")
+
+    def test_claimed_rows_are_not_sent_twice(self):
+        outbox.queue_email("a@example.com", "OTP", "code")
+        self.assertEqual(len(outbox._claim()), 1)
+        self.assertEqual(outbox.send_pending(self.mailer), 0)
+        self.assertEqual(self.server.messages, [])
+
+
+# -------------------------------------------------------
+#               LOAD TEST
+# -------------------------------------------------------
+
+class LoadReportTests(SimpleTestCase):
+    def _run(self, samples, elapsed=2.0):
+        from benchmarks.load import Corpus, LoadRun
+
+        run = LoadRun("http://127.0.0.1:1/", {"quality_score": 1}, rate=1, duration=1, corpus=Corpus(0))
+        run.samples = samples
+        return run.report(elapsed)
+
+    def test_percentile_is_nearest_rank(self):
+        from benchmarks.load import percentile
+
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 50), 50)
+        self.assertEqual(percentile(values, 95), 95)
+        self.assertEqual(percentile(values, 99), 99)
+        self.assertEqual(percentile(values, 100), 100)
+        self.assertEqual(percentile(values, 0), 1)
+        self.assertEqual(percentile([0.2, 0.4, 0.9], 50), 0.4)
+        self.assertEqual(percentile([0.7], 99), 0.7)
+        self.assertIsNone(percentile([], 50))
+
+    def test_report_counts_errors_and_shed_requests(self):
+        samples = [("quality_score", (i + 1) / 100, 200, None) for i in range(6)]
+        samples += [
+            ("quality_score", 0.5, 503, None),
+            ("quality_score", 0.6, 429, None),
+            ("quality_score", 0.7, 500, None),
+            ("quality_score", 2.0, None, "ConnectTimeout"),
+            ("passport_ids", 0.01, 200, None),
+        ]
+        report = self._run(samples)
+
+        self.assertEqual(report["requests"], 11)
+        self.assertEqual(report["throughput_rps"], 5.5)
+        self.assertEqual(report["config"]["base_url"], "http://127.0.0.1:1")
+        self.assertEqual(list(report["endpoints"]), ["passport_ids", "quality_score"])
+
+        quality = report["endpoints"]["quality_score"]
+        self.assertEqual(quality["requests"], 10)
+        self.assertEqual(quality["throughput_rps"], 5.0)
+        self.assertEqual(quality["p50_ms"], 50.0)
+        self.assertEqual(quality["p95_ms"], 2000.0)
+        self.assertEqual(quality["error_rate"], 0.2)
+        self.assertEqual(quality["shed_rate"], 0.2)
+        self.assertEqual(quality["statuses"], {"200": 6, "503": 1, "429": 1, "500": 1, "ConnectTimeout": 1})
+
+    def test_printed_report_and_comparison(self):
+        from verify_user.management.commands.loadtest import Command
+
+        before = self._run([("quality_score", 0.1, 200, None)] * 4)
+        after = self._run([("quality_score", 0.2, 200, None)] * 3 + [("quality_score", 0.3, 500, None)])
+        before["label"] = "before"
+        out = io.StringIO()
+        command = Command(stdout=out)
+        command._print(after)
+        command._compare(before, after)
+
+        lines = out.getvalue().splitlines()
+        row = next(line for line in lines if line.startswith("quality_score"))
+        self.assertEqual(row.split(), ["quality_score", "4", "2.00", "200.0", "300.0", "300.0", "25.0%", "0.0%"])
+        self.assertIn("total 4 requests, 2.0 rps over 2.0s", lines)
+        self.assertIn(
+            "quality_score        p95 100.0 -> 300.0 ms, p99 100.0 -> 300.0 ms, errors 0.0% -> 25.0%", lines
+        )
+
+    def test_a_target_is_required(self):
+        with self.assertRaisesMessage(CommandError, "one of the arguments --url --serve is required"):
+            call_command("loadtest")
+
+    def test_serve_uses_a_throwaway_database(self):
+        from verify_user.management.commands import loadtest
+
+        calls = []
+
+        def run(args, env, **kwargs):
+            calls.append(env)
+            self.assertTrue(os.path.isdir(os.path.dirname(env["OCR_DATABASE_PATH"])))
+            return subprocess.CompletedProcess(args, 1, "", "no such table")
+
+        with mock.patch.object(loadtest.subprocess, "run", run):
+            with self.assertRaisesMessage(CommandError, "no such table"):
+                call_command("loadtest", "--serve")
+
+        workdir = os.path.dirname(calls[0]["OCR_DATABASE_PATH"])
+        self.assertEqual(os.path.dirname(workdir), tempfile.gettempdir())
+        self.assertEqual(calls[0]["OCR_MEDIA_ROOT"], os.path.join(workdir, "media"))
+        self.assertFalse(os.path.exists(workdir))
@@ -1,16 +1,39 @@
 from django.urls import path
 from .views import * 
+from .async_views import (
+    aadhar_ocr_async_view,
+    handwritten_ocr_async_view,
+    aadhar_detect_async_view,
+    quality_score_async_view,
+)
 
 urlpatterns = [
     path('passport/create/',PassportRecordCreateView.as_view(),name='passport-create'),
+    path('passport/',passport_list_view,name='passport-list'),
+    path('passport/bulk/',bulk_create_records,name='passport-bulk-create'),
+    path('passport/bulk/status/',bulk_update_status,name='passport-bulk-status'),
     path('passport/ids/',passport_ids_view,name='passport-ids'),
+    path('passport/search/',passport_search_view,name='passport-search'),
+    path('passport/export/<str:fmt>/',passport_export_view,name='passport-export'),
     path('passport/<int:id>/toggle-status/',update_passport_status),
+    path('passport/<int:id>/duplicates/',passport_duplicates_view,name='passport-duplicates'),
     path('passport/<int:id>/',PassportRecordDetailView.as_view(),name='passport-detail'),
+    path('review-queue/',review_queue_view,name='review-queue'),
     path('send-otp/',send_otp),
     path('verify-otp/',verify_otp),
     path("aadhar/ocr/", aadhar_ocr_view),
     path("handwritten/ocr/", handwritten_ocr_view),
+    path("handwritten/ocr/stream/", handwritten_ocr_stream_view),
     path("verify-documents/", DocumentVerifyView.as_view(), name="verify-documents"),
+    path("verify-documents/reverify/", DocumentReverifyView.as_view(), name="reverify-documents"),
     path("aadhaar-detect/", AadharDetectView,name="is-valid-aadhar"),
     path("quality-score/", quality_score_view),
+    path("near-duplicates/", near_duplicates_view, name="near-duplicates"),
+    path("metrics/", metrics_view),
+    path("profiles/", profiles_view),
+    # async (ASGI) variants
+    path("async/aadhar/ocr/", aadhar_ocr_async_view),
+    path("async/handwritten/ocr/", handwritten_ocr_async_view),
+    path("async/aadhaar-detect/", aadhar_detect_async_view),
+    path("async/quality-score/", quality_score_async_view),
 ]
\ No newline at end of file
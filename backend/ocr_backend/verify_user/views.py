@@ -8,15 +8,28 @@ from .models import PassportRecord
 from .serializers import PassportReportSerializer
 from django.shortcuts import get_object_or_404
 
-from django.core.mail import send_mail
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from django.db import transaction
+import json
 import random
-import tempfile
-import os
 
 from rest_framework.response import Response
-from rest_framework.decorators import api_view
-from .models import EmailOTP
-from .serializers import EmailSerializer, OTPVerifySerializer
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAdminUser
+from .models import EmailOTP, RequestProfile
+from .serializers import EmailSerializer, OTPVerifySerializer, PassportSearchSerializer, ReviewQueueSerializer
+from .documents import read_proof, proof_lines, stored_lines, user_details
+from .tasks import enqueue, enqueue_upload, enrich_passport_record
+from .storage import staging_enabled
+from .spool import spool, SpooledUpload, SpoolFull
+from .admission import admission_controlled
+from .review import queue_page, queue_records
+from .pagination import batch_ids, csv_lines, export_rows, filtered_records, int_param, keyset_page, ndjson_lines
+from .search import search_records
+from .outbox import queue_email
+from .bulk import create_records, update_status
+from . import degradation, duplicates, metrics
 
 
 # -------------------------------------------------------
@@ -28,6 +41,15 @@ class PassportRecordCreateView(CreateAPIView):
     serializer_class = PassportReportSerializer
     parser_classes = (MultiPartParser, FormParser)
 
+    def perform_create(self, serializer):
+        # proofs land on local disk; the remote upload runs after commit
+        staged = staging_enabled()
+        record = serializer.save(media_status="STAGED" if staged else "STORED")
+        if staged:
+            enqueue_upload(record.id)
+        if settings.OCR_BACKGROUND_ENRICHMENT:
+            enqueue(enrich_passport_record, record.id)
+
 
 # -------------------------------------------------------
 #                        OTP VIEWS
@@ -40,14 +62,14 @@ def send_otp(req):
     email = serializer.validated_data['email']
 
     otp = str(random.randint(100000, 999999))
-    EmailOTP.objects.create(email=email, otp=otp)
-
-    send_mail(
-        subject="Your Login OTP",
-        message=f"Your OTP is {otp}. It is valid for 10 minutes.",
-        from_email=None,
-        recipient_list=[email],
-    )
+    # sent by the outbox thread once both rows are committed
+    with transaction.atomic():
+        EmailOTP.objects.create(email=email, otp=otp)
+        queue_email(
+            email,
+            subject="Your Login OTP",
+            body=f"Your OTP is {otp}. It is valid for 10 minutes.",
+        )
 
     return Response({"message": "OTP sent successfully!"})
 
@@ -79,55 +101,105 @@ def verify_otp(req):
 # -------------------------------------------------------
 
 @api_view(['POST'])
+@admission_controlled("aadhar_ocr")
 def aadhar_ocr_view(request):
-    from ML.aadhar_ocr import extract_aadhar_smart
+    from ml.aadhar_ocr import extract_aadhar_smart
 
     # Case 1: Cloudinary URL
     if "url" in request.data:
-        import requests
-        image_url = request.data["url"]
+        from .fetch import fetch, FetchError, FetchTooLarge
+        try:
+            source, name = fetch(request.data["url"]), "download.jpg"
+        except FetchTooLarge as e:
+            return Response({"error": str(e)}, status=413)
+        except FetchError as e:
+            return Response({"error": str(e)}, status=502)
 
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".jpg") as temp_file:
-            resp = requests.get(image_url)
-            temp_file.write(resp.content)
-            temp_path = temp_file.name
+    # Case 2: File upload
+    else:
+        file = request.FILES.get("file")
+        if not file:
+            return Response({"error": "Upload a file or provide URL"}, status=400)
+        source, name = file, file.name
 
-        result = extract_aadhar_smart(temp_path)
-        return Response(result)
+    try:
+        # extract_aadhar_smart only takes paths; the spooled copy is
+        # removed as soon as it returns
+        with spool(source, name) as upload, upload.path() as path:
+            result = extract_aadhar_smart(path)
+    except SpoolFull as e:
+        return Response({"error": str(e)}, status=503)
+
+    return Response(result)
+
+
+@api_view(['POST'])
+@admission_controlled("handwritten_ocr")
+def handwritten_ocr_view(request):
+    from ml.handwritten_ocr import handwritten_extract
 
-    # Case 2: File upload
     file = request.FILES.get("file")
     if not file:
-        return Response({"error": "Upload a file or provide URL"}, status=400)
+        return Response({"error": "Upload a file"}, status=400)
+
+    tier = degradation.controller.current_tier()
 
-    suffix = os.path.splitext(file.name)[1]
+    try:
+        with spool(file) as upload:
+            result = handwritten_extract(upload.read(), tier, settings.OCR_DECODING_PROFILES["handwritten_ocr"])
+    except SpoolFull as e:
+        return Response({"error": str(e)}, status=503)
 
-    with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as temp_file:
-        for chunk in file.chunks():
-            temp_file.write(chunk)
-        temp_path = temp_file.name
+    result["quality_tier"] = tier
+    return Response(result, headers={"X-OCR-Quality-Tier": tier})
 
-    result = extract_aadhar_smart(temp_path)
-    return Response(result)
+
+def _encode_event(kind, payload, fmt):
+    if fmt == "ndjson":
+        return json.dumps({"event": kind, "data": payload}) + "\n"
+    return f"event: {kind}\ndata: {json.dumps(payload)}\n\n"
 
 
 @api_view(['POST'])
-def handwritten_ocr_view(request):
-    from ML.handwritten_ocr import handwritten_extract
+@admission_controlled("handwritten_ocr")
+def handwritten_ocr_stream_view(request):
+    """
+    Handwritten OCR as a stream: the quality tier, the detected line
+    boxes, then each recognised line, then the extracted fields. Server-sent events by
+    default, NDJSON with ?mode=ndjson (?format is taken by DRF).
+    """
+    from ml.handwritten_ocr import iter_handwritten_extract
 
     file = request.FILES.get("file")
     if not file:
         return Response({"error": "Upload a file"}, status=400)
 
-    suffix = os.path.splitext(file.name)[1]
+    fmt = request.query_params.get("mode", "sse")
 
-    with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as temp_file:
-        for chunk in file.chunks():
-            temp_file.write(chunk)
-        temp_path = temp_file.name
+    try:
+        upload = SpooledUpload(file)
+    except SpoolFull as e:
+        return Response({"error": str(e)}, status=503)
 
-    result = handwritten_extract(temp_path)
-    return Response(result)
+    tier = degradation.controller.current_tier()
+
+    def events():
+        yield _encode_event("tier", tier, fmt)
+        decoding = settings.OCR_DECODING_PROFILES["handwritten_ocr"]
+        for kind, payload in iter_handwritten_extract(upload.read(), tier, decoding):
+            yield _encode_event(kind, payload, fmt)
+
+    response = StreamingHttpResponse(
+        events(),
+        content_type="application/x-ndjson" if fmt == "ndjson" else "text/event-stream",
+    )
+    # closed with the response: a generator that never started would
+    # not run a finally block
+    response._resource_closers.append(upload.close)
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    response["X-OCR-Quality-Tier"] = tier
+    return response
 
 
 # -------------------------------------------------------
@@ -135,8 +207,9 @@ def handwritten_ocr_view(request):
 # -------------------------------------------------------
 
 class DocumentVerifyView(APIView):
+    @admission_controlled("verify_documents")
     def post(self, request):
-        from ML.doc_verification import DocumentVerifier
+        from ml.doc_verification import DocumentVerifier
         from .serializers import DocumentVerifySerializer
 
         serializer = DocumentVerifySerializer(data=request.data)
@@ -147,63 +220,40 @@ class DocumentVerifyView(APIView):
         data = serializer.validated_data
 
         # ---------------------------
-        # Save DOB Proof Document
-        # ---------------------------
-        dob_file = data["dob_proof"]
-        dob_ext = os.path.splitext(dob_file.name)[1] or ".pdf"
-
-        with tempfile.NamedTemporaryFile(delete=False, suffix=dob_ext) as tmp:
-            tmp.write(dob_file.read())
-            dob_path = tmp.name
-
-        # ---------------------------
-        # Save ID Proof Document
+        # Read the three proof documents
+        # (byte-identical uploads are OCR'd once)
         # ---------------------------
-        id_file = data["name_gender_proof"]
-        id_ext = os.path.splitext(id_file.name)[1] or ".pdf"
-
-        with tempfile.NamedTemporaryFile(delete=False, suffix=id_ext) as tmp:
-            tmp.write(id_file.read())
-            id_path = tmp.name
-
-        # ---------------------------
-        # Save Address Proof Document
-        # ---------------------------
-        address_file = data["address_proof"]
-        address_ext = os.path.splitext(address_file.name)[1] or ".pdf"
-
-        with tempfile.NamedTemporaryFile(delete=False, suffix=address_ext) as tmp:
-            tmp.write(address_file.read())
-            address_path = tmp.name
+        proofs = {}
+        dob_hash = read_proof(data["dob_proof"], proofs)
+        id_hash = read_proof(data["name_gender_proof"], proofs)
+        address_hash = read_proof(data["address_proof"], proofs)
 
-        # ---------------------------
-        # User details dictionary
-        # ---------------------------
-        user_details = {
-            "first_name": data["first_name"],
-            "middle_name": data.get("middle_name", ""),
-            "last_name": data["last_name"],
-            "gender": data["gender"],
-            "dob": data["dob"],
-            "address_line": data["permanent_address_line"],
-            "city": data["permanent_city"],
-            "state": data["permanent_state"],
-            "pincode": data["permanent_pincode"],
-            "country": data["permanent_country"],
-        }
+        details = user_details(data)
+        tier = degradation.controller.current_tier()
 
         try:
             verifier = DocumentVerifier()
-            result = verifier.verify_documents(
-                dob_path,
-                id_path,
-                address_path,
-                user_details
+            lines = proof_lines(verifier, proofs, tier, settings.OCR_DECODING_PROFILES["verify_documents"])
+            result = verifier.match_details(
+                lines[dob_hash],
+                lines[id_hash],
+                lines[address_hash],
+                details
             )
 
             return Response(
-                {"status": "success", "verification_result": result},
+                {
+                    "status": "success",
+                    "verification_result": result,
+                    "documents": {
+                        "dob_proof_hash": dob_hash,
+                        "name_gender_proof_hash": id_hash,
+                        "address_proof_hash": address_hash,
+                    },
+                    "quality_tier": tier,
+                },
                 status=status.HTTP_200_OK,
+                headers={"X-OCR-Quality-Tier": tier},
             )
 
         except Exception as e:
@@ -213,26 +263,63 @@ class DocumentVerifyView(APIView):
             )
 
 
+class DocumentReverifyView(APIView):
+    """
+    Re-run matching for corrected form details against the OCR
+    lines stored by DocumentVerifyView; no documents, no OCR.
+    """
+    def post(self, request):
+        from ml.doc_verification import DocumentVerifier
+        from .serializers import DocumentReverifySerializer
+
+        serializer = DocumentReverifySerializer(data=request.data)
+
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        data = serializer.validated_data
+        hashes = [
+            data["dob_proof_hash"],
+            data["name_gender_proof_hash"],
+            data["address_proof_hash"],
+        ]
+
+        lines = stored_lines(hashes)
+        missing = [h for h in hashes if h not in lines]
+        if missing:
+            return Response(
+                {"status": "error", "message": "Unknown document hash", "missing": missing},
+                status=status.HTTP_404_NOT_FOUND,
+            )
+
+        result = DocumentVerifier().match_details(
+            *(lines[h] for h in hashes), user_details(data)
+        )
+
+        return Response(
+            {"status": "success", "verification_result": result},
+            status=status.HTTP_200_OK,
+        )
+
+
 # -------------------------------------------------------
 #           AADHAAR DETECTION (YOLO)
 # -------------------------------------------------------
 
 @api_view(['POST'])
+@admission_controlled("aadhaar_detect")
 def AadharDetectView(request):
-    from ML.aadhaar_detector import is_aadhaar  
+    from ml.aadhaar_detector import is_aadhaar  
 
     file = request.FILES.get("file")
     if not file:
         return Response({"error": "Upload a file"}, status=400)
 
-    suffix = os.path.splitext(file.name)[1]
-
-    with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as temp_file:
-        for chunk in file.chunks():
-            temp_file.write(chunk)
-        temp_path = temp_file.name
-
-    result = is_aadhaar(temp_path)
+    try:
+        with spool(file) as upload:
+            result = is_aadhaar(upload.read())
+    except SpoolFull as e:
+        return Response({"error": str(e)}, status=503)
 
     return Response({
         "is_aadhaar": result,
@@ -245,8 +332,9 @@ def AadharDetectView(request):
 # -------------------------------------------------------
 
 @api_view(['POST'])
+@admission_controlled("quality_score")
 def quality_score_view(request):
-    from ML.quality_score import process_uploaded_file, calc_scores
+    from ml.quality_score import process_uploaded_file, calc_scores
 
     file = request.FILES.get("file")
     if not file:
@@ -262,12 +350,83 @@ def quality_score_view(request):
     
 @api_view(['GET'])
 def passport_ids_view(req):
-    ids=PassportRecord.objects.values_list('id',flat=True)
+    """
+    Record ids in id order, one page at a time: ?after=<id>&limit=<n>
+    (default 1000). `next_after` is null on the last page.
+    """
+    records=filtered_records(req).values_list('id',flat=True)
+    ids,next_after=keyset_page(records,req,default_limit=1000,max_limit=10000)
     return Response({
-        "count":ids.count(),
-        "ids":list(ids)
+        "ids":ids,
+        "next_after":next_after
     })
 
+@api_view(['GET'])
+def passport_list_view(req):
+    """
+    Records in id order, paged like passport_ids_view (default 100),
+    or the records of ?ids=1,2,3 in one round trip.
+    """
+    ids=batch_ids(req)
+    if ids is not None:
+        found=PassportRecord.objects.in_bulk(ids)
+        return Response({
+            "results":PassportReportSerializer([found[i] for i in ids if i in found],many=True).data,
+            "missing":[i for i in ids if i not in found],
+        })
+
+    records,next_after=keyset_page(filtered_records(req),req,default_limit=100,max_limit=500)
+    return Response({
+        "results":PassportReportSerializer(records,many=True).data,
+        "next_after":next_after
+    })
+
+@api_view(['GET'])
+def passport_search_view(req):
+    """
+    Records matching every word of ?q= (as word prefixes) in their
+    names, cities or addresses, best first, at most ?limit= (20).
+    """
+    query=req.query_params.get('q','')
+    if not query.strip():
+        return Response({"error":"q is required"},status=400)
+    limit=int_param(req,'limit',20,minimum=1,maximum=100)
+    results=[]
+    for record,score in search_records(query,limit):
+        results.append({**PassportSearchSerializer(record).data,"score":score})
+    return Response({"results":results})
+
+@api_view(['GET'])
+def review_queue_view(req):
+    """
+    Records awaiting review, oldest first: ?status= (default PENDING),
+    ?state=, ?outcome=, ?from= / ?to= dates, paged with ?after=<id>.
+    """
+    records,next_after=queue_page(queue_records(req),req)
+    return Response({
+        "results":ReviewQueueSerializer(records,many=True).data,
+        "next_after":next_after
+    })
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def passport_export_view(req,fmt):
+    """
+    Every record (?status=, ?ocr_status=, ?after=<id> to resume) as
+    NDJSON or CSV, streamed while the table is read.
+    """
+    if fmt not in ('ndjson','csv'):
+        return Response({"error":"Format must be ndjson or csv"},status=404)
+    records=filtered_records(req).filter(id__gt=int_param(req,'after',0))
+    rows=export_rows(records)
+
+    if fmt=='csv':
+        response=StreamingHttpResponse(csv_lines(rows),content_type="text/csv")
+    else:
+        response=StreamingHttpResponse(ndjson_lines(rows),content_type="application/x-ndjson")
+    response["Content-Disposition"]=f'attachment; filename="passport_records.{fmt}"'
+    return response
+
 class PassportRecordDetailView(RetrieveAPIView):
     queryset=PassportRecord.objects.all()
     serializer_class=PassportReportSerializer
@@ -282,3 +441,136 @@ def update_passport_status(req,id):
     record.status=new_status
     record.save(update_fields=['status'])
     return Response({"id": record.id, "status": record.status})
+
+@api_view(['PATCH'])
+@permission_classes([IsAdminUser])
+def bulk_update_status(req):
+    """
+    {"ids": [...], "status": "..."}: one UPDATE for every record, and
+    per id whether it was updated, unchanged or not found.
+    """
+    results=update_status(req.data.get('ids'),req.data.get('status'))
+    return Response({
+        "status":req.data['status'],
+        "updated":sum(1 for r in results if r["result"]=="updated"),
+        "results":results
+    })
+
+@api_view(['POST'])
+@permission_classes([IsAdminUser])
+def bulk_create_records(req):
+    """
+    {"records": [...]} with proofs as URLs: the valid records are
+    created at once and their proofs downloaded in the background.
+    Per record, its id or its validation errors.
+    """
+    results=create_records(req.data.get('records'))
+    created=sum(1 for r in results if "id" in r)
+    return Response({
+        "created":created,
+        "results":results
+    },status=status.HTTP_201_CREATED if created else status.HTTP_400_BAD_REQUEST)
+
+
+# -------------------------------------------------------
+#           NEAR-DUPLICATE DOCUMENTS
+# -------------------------------------------------------
+
+def _distance_param(req):
+    from ml.perceptual_hash import MAX_RADIUS
+
+    value = req.query_params.get('distance')
+    if value is None:
+        return settings.OCR_NEAR_DUPLICATE_DISTANCE
+    distance = int(value)
+    if not 0 <= distance <= MAX_RADIUS:
+        raise ValueError
+    return distance
+
+
+@api_view(['POST'])
+def near_duplicates_view(req):
+    """
+    Earlier uploads that look like the posted `file`.
+    """
+    file = req.FILES.get("file")
+    if not file:
+        return Response({"error": "Upload a file"}, status=400)
+    try:
+        distance = _distance_param(req)
+    except ValueError:
+        return Response({"error": "distance must be an integer from 0 to 15"}, status=400)
+
+    proofs = {}
+    digest = read_proof(file, proofs)
+    phash = duplicates.proof_phash(digest, proofs[digest][1])
+    if phash is None:
+        return Response({"error": "File could not be read as an image"}, status=400)
+
+    matches = duplicates.near_duplicates(phash, distance)
+    return Response({
+        "content_hash": digest,
+        "matches": duplicates.describe(matches),
+    })
+
+
+@api_view(['GET'])
+def passport_duplicates_view(req, id):
+    """
+    Other records whose proofs look like this record's.
+    """
+    record = get_object_or_404(PassportRecord, id=id)
+    try:
+        distance = _distance_param(req)
+    except ValueError:
+        return Response({"error": "distance must be an integer from 0 to 15"}, status=400)
+
+    return Response({
+        "id": record.id,
+        "duplicates": duplicates.record_duplicates(record, distance),
+    })
+
+
+# -------------------------------------------------------
+#           METRICS
+# -------------------------------------------------------
+
+@api_view(['GET'])
+def metrics_view(req):
+    from ocr_backend.model_sharing import memory_usage
+
+    # memory of the worker serving this request; shared includes
+    # preloaded model weights (OCR_PRELOAD_MODELS)
+    usage = memory_usage()
+    if usage:
+        for key, value in usage.items():
+            metrics.set_gauge(f"memory.{key}_bytes", value)
+    return Response(metrics.snapshot())
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def profiles_view(req):
+    """
+    Newest sampled request profiles (verify_user/profiling.py).
+    ?path= narrows to a path prefix, ?limit= (default 50, max 500).
+    """
+    try:
+        limit = min(max(int(req.GET.get('limit', 50)), 1), 500)
+    except ValueError:
+        return Response({"error": "limit must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
+
+    profiles = RequestProfile.objects.order_by('-id')
+    if req.GET.get('path'):
+        profiles = profiles.filter(path__startswith=req.GET['path'])
+    return Response([
+        {
+            "id": p.id,
+            "method": p.method,
+            "path": p.path,
+            "status_code": p.status_code,
+            "created_at": p.created_at,
+            **p.data,
+        }
+        for p in profiles[:limit]
+    ])
@@ -16,10 +16,17 @@ import api from './api';
 const FetchDropdownOptions = async () => {
     try {
         // 1. Fetch data from the actual API endpoint
-        const response = await api.get('/api/passport/ids');
-        
-        // The API response data structure, based on your image, is { count: N, ids: [1, 2, ...] }
-        const rawIds = response.data.ids;
+        // The API pages the ids: { ids: [1, 2, ...], next_after: <id> | null }
+        // Keep asking for the page after the last one until next_after is null
+        const rawIds = [];
+        let after = null;
+        do {
+            const response = await api.get('/api/passport/ids', {
+                params: after === null ? {} : { after },
+            });
+            rawIds.push(...response.data.ids);
+            after = response.data.next_after;
+        } while (after !== null && after !== undefined);
         
         console.log('Successfully fetched Passport IDs:', rawIds);
 